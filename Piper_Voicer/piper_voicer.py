@@ -1,12 +1,172 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import json
+import re
 import sys
 import wave
 from pathlib import Path
 
 from piper import PiperVoice, SynthesisConfig
 
+DEFAULT_MODEL = Path("Piper_Voicer/pt_BR-faber-medium.onnx")
+
+# o espeak separa sentenças em . ! ?; o cache de fonemas usa o mesmo corte
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# nível de otimização de grafo do onnxruntime por nome (config.PIPER_GRAPH_OPT)
+GRAPH_OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+# =========================
+# SESSÃO ONNXRUNTIME
+# =========================
+# PiperVoice.load() cria a sessão com as opções padrão (onnxruntime usa
+# todos os núcleos numa sessão só). Aqui a sessão é montada com threads
+# intra/inter-op e nível de otimização escolhidos, para o pool decidir entre
+# muitas sessões de 1 thread ou poucas de várias (model_pool.py). Com
+# optimized_dir, o grafo otimizado é salvo em disco na primeira carga e as
+# próximas carregam esse arquivo sem otimizar de novo.
+def optimized_model_path(model, graph_opt, optimized_dir) -> Path:
+    import onnxruntime
+
+    model = Path(model)
+    st = model.stat()
+    h = hashlib.sha1(f"{model.resolve()}|{st.st_size}|{int(st.st_mtime)}|{graph_opt}|{onnxruntime.__version__}".encode("utf-8"))
+    return Path(optimized_dir) / f"{model.stem}.{h.hexdigest()[:12]}.onnx"
+
+
+def session_options(intra_threads=0, inter_threads=0, graph_opt="all"):
+    import onnxruntime
+
+    if graph_opt not in GRAPH_OPT_LEVELS:
+        raise ValueError(f"nível de otimização desconhecido: {graph_opt} (use {', '.join(GRAPH_OPT_LEVELS)})")
+    opts = onnxruntime.SessionOptions()
+    opts.intra_op_num_threads = intra_threads
+    opts.inter_op_num_threads = inter_threads
+    opts.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel, GRAPH_OPT_LEVELS[graph_opt])
+    return opts
+
+
+def load_voice(model, intra_threads=0, inter_threads=0, graph_opt="all", optimized_dir=None) -> PiperVoice:
+    # mesmo que PiperVoice.load(model), com a sessão configurada
+    import onnxruntime
+    from piper.config import PiperConfig
+
+    model = Path(model)
+    with open(f"{model}.json", "r", encoding="utf-8") as config_file:
+        config = PiperConfig.from_dict(json.load(config_file))
+
+    opts = session_options(intra_threads, inter_threads, graph_opt)
+    source = model
+    saving = None
+    if optimized_dir and graph_opt != "disable":
+        optimized = optimized_model_path(model, graph_opt, optimized_dir)
+        if optimized.exists():
+            # grafo já otimizado: só carrega
+            source = optimized
+            opts.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL
+        else:
+            optimized.parent.mkdir(parents=True, exist_ok=True)
+            saving = optimized.with_name(optimized.name + ".tmp")
+            opts.optimized_model_filepath = str(saving)
+
+    session = onnxruntime.InferenceSession(str(source), sess_options=opts, providers=["CPUExecutionProvider"])
+    if saving is not None and saving.exists():
+        saving.replace(optimized)
+    return PiperVoice(session=session, config=config)
+
+
+# =========================
+# ENGINE (voz carregada uma única vez)
+# =========================
+class PiperEngine:
+    """Mantém o modelo Piper carregado e sintetiza vários textos no mesmo processo."""
+
+    batch_size = 1
+
+    def __init__(self, model=DEFAULT_MODEL, volume=1.0, speed=1.2,
+                 noise_scale=1.0, noise_w_scale=1.0, phoneme_cache=None,
+                 intra_threads=0, inter_threads=0, graph_opt="all", optimized_dir=None):
+        self.model = Path(model)
+        # opcional: objeto com key(voz, sentença)/get/put (synth_cache.PhonemeCache)
+        self.phoneme_cache = phoneme_cache
+
+        # Carrega voz (onnxruntime + .onnx) apenas uma vez
+        self.voice = load_voice(self.model, intra_threads, inter_threads, graph_opt, optimized_dir)
+
+        # Configuração de síntese
+        self.syn_config = SynthesisConfig(
+            volume=volume,
+            length_scale=speed,
+            noise_scale=noise_scale,
+            noise_w_scale=noise_w_scale,
+            normalize_audio=False,
+        )
+
+    @property
+    def sample_rate(self) -> int:
+        return self.voice.config.sample_rate
+
+    def phonemize(self, text: str):
+        # fonemas por sentença; com cache, o espeak só roda para sentenças novas
+        cache = self.phoneme_cache
+        if cache is None:
+            return self.voice.phonemize(text)
+
+        voice_id = f"{self.voice.config.espeak_voice}|{self.voice.config.phoneme_type}"
+        result = []
+        for sentence in SENTENCE_END.split(text.strip()):
+            if not sentence:
+                continue
+            key = cache.key(voice_id, sentence)
+            phonemes = cache.get(key)
+            if phonemes is None:
+                phonemes = self.voice.phonemize(sentence)
+                cache.put(key, phonemes)
+            result.extend(phonemes)
+        return result
+
+    def synthesize(self, text: str):
+        # Gera PCM 16-bit mono em blocos (um por sentença do Piper)
+        if self.phoneme_cache is None:
+            for chunk in self.voice.synthesize(text, syn_config=self.syn_config):
+                yield chunk.audio_int16_bytes
+            return
+
+        # mesmo caminho do PiperVoice.synthesize, com os fonemas vindos do cache
+        import numpy as np
+
+        cfg = self.syn_config
+        for phonemes in self.phonemize(text):
+            audio = self.voice.phoneme_ids_to_audio(self.voice.phonemes_to_ids(phonemes), cfg)
+            if cfg.normalize_audio:
+                peak = np.max(np.abs(audio)) if len(audio) else 0.0
+                audio = audio / peak if peak > 1e-8 else np.zeros_like(audio)
+            if cfg.volume != 1.0:
+                audio = audio * cfg.volume
+            yield (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+    def synthesize_batch(self, texts):
+        return [b"".join(self.synthesize(text)) for text in texts]
+
+    def synthesize_wav(self, text: str, output: Path):
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+        with wave.open(str(output), "wb") as wav_file:
+            self.voice.synthesize_wav(
+                text,
+                wav_file,
+                syn_config=self.syn_config
+            )
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -35,7 +195,7 @@ def main():
     parser.add_argument(
         "--model",
         type=Path,
-        default=Path("Piper_Voicer/pt_BR-faber-medium.onnx"),
+        default=DEFAULT_MODEL,
         help="Caminho para o modelo Piper (.onnx)"
     )
 
@@ -67,27 +227,10 @@ def main():
     else:
         text = args.text
 
-    # Carrega voz
-    voice = PiperVoice.load(args.model)
-
-    # Configuração de síntese
-    syn_config = SynthesisConfig(
-        volume=args.volume,
-        length_scale=args.speed,
-        noise_scale=1.0,
-        noise_w_scale=1.0,
-        normalize_audio=False,
-    )
+    engine = PiperEngine(args.model, volume=args.volume, speed=args.speed)
 
     # Geração do WAV
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-
-    with wave.open(str(args.output), "wb") as wav_file:
-        voice.synthesize_wav(
-            text,
-            wav_file,
-            syn_config=syn_config
-        )
+    engine.synthesize_wav(text, args.output)
 
     print(f"Áudio gerado com sucesso: {args.output}")
 
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+
+import metrics
+from audio import AudioChain
+
+# ==========================
+# STREAMING ASSEMBLY
+# ==========================
+# Um único ffmpeg por capítulo recebe PCM 16-bit mono pelo stdin e grava o mp3
+# final: sem chunk wavs intermediários, sem wav_list.txt e sem chapter.wav.
+# ChapterWriter passa cada chunk pelo AudioChain (audio.py) antes do ffmpeg.
+# O mp3 é escrito em "chapter.mp3.<aleatório>.part" e só é renomeado no fim,
+# então um capítulo interrompido nunca parece concluído e é refeito na
+# próxima execução. Cada encoder tem o seu .part: o abort de um stream que
+# falhou não apaga o arquivo da montagem que o substituiu.
+
+
+class ChapterEncoder:
+    def __init__(self, output_mp3, sample_rate: int, speed=1.0, bitrate="24k"):
+        self.output = Path(output_mp3)
+        fd, tmp = tempfile.mkstemp(dir=self.output.parent, prefix=self.output.name + ".", suffix=".part")
+        os.close(fd)
+        self.tmp = Path(tmp)
+        # velocidade normalmente já vem aplicada pelo AudioChain (speed=1.0)
+        tempo = ["-filter:a", f"atempo={speed}"] if speed != 1.0 else []
+        self.proc = subprocess.Popen([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "s16le", "-ar", str(sample_rate), "-ac", "1",
+            "-i", "pipe:0",
+            *tempo,
+            "-ab", bitrate,
+            "-f", "mp3", str(self.tmp)
+        ], stdin=subprocess.PIPE)
+
+    def write(self, pcm: bytes):
+        self.proc.stdin.write(pcm)
+
+    def close(self):
+        self.proc.stdin.close()
+        code = self.proc.wait()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg terminou com código {code}")
+        os.replace(self.tmp, self.output)
+
+    def abort(self):
+        try:
+            self.proc.stdin.close()
+        except Exception:
+            pass
+        self.proc.kill()
+        self.proc.wait()
+        try:
+            self.tmp.unlink()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+class ChapterWriter:
+    # chunk a chunk: AudioChain (reamostragem, volume, silêncio, velocidade)
+    # no próprio processo, e o ffmpeg só para codificar o mp3
+    def __init__(self, output_mp3, sample_rate: int, speed=1.0, gap_ms=0.0,
+                 normalize_dbfs=None, bitrate="24k"):
+        self.label = Path(output_mp3).parent.name
+        self.chain = AudioChain(sample_rate, speed=speed, gap_ms=gap_ms, normalize_dbfs=normalize_dbfs)
+        self.encoder = ChapterEncoder(output_mp3, sample_rate, speed=1.0, bitrate=bitrate)
+
+    def write_chunk(self, pcm: bytes, sample_rate: int = None):
+        with metrics.span("concat", chapter=self.label):
+            pcm = self.chain.process_chunk(pcm, sample_rate)
+        with metrics.span("encode", chapter=self.label, bytes=len(pcm)):
+            self.encoder.write(pcm)
+
+    def close(self):
+        with metrics.span("concat", chapter=self.label):
+            tail = self.chain.flush()
+        with metrics.span("encode_finish", chapter=self.label):
+            self.encoder.write(tail)
+            self.encoder.close()
+
+    def abort(self):
+        self.encoder.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
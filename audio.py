@@ -0,0 +1,133 @@
+import numpy as np
+
+# ==========================
+# AUDIO ENGINE (numpy/soxr)
+# ==========================
+# Pós-processamento no próprio processo, em blocos, antes do encoder:
+#   - reamostragem por chunk (soxr) quando a taxa difere da saída;
+#   - normalização de volume por chunk (RMS das partes com voz + limite de pico);
+#   - silêncio entre chunks;
+#   - mudança de velocidade sem alterar o tom (WSOLA em streaming), no lugar
+#     do atempo do ffmpeg.
+# O ffmpeg só entra no fim, para codificar o mp3.
+
+
+def pcm_to_float(pcm: bytes) -> np.ndarray:
+    return np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def float_to_pcm(wav: np.ndarray) -> bytes:
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def resample(wav: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    if in_rate == out_rate:
+        return wav
+    import soxr
+
+    return soxr.resample(wav, in_rate, out_rate).astype(np.float32, copy=False)
+
+
+def normalize_loudness(wav: np.ndarray, sample_rate: int, target_dbfs: float,
+                       max_gain_db: float = 12.0, gate_dbfs: float = -50.0) -> np.ndarray:
+    # ganho pelo RMS dos trechos de 20 ms acima do gate (ignora silêncio),
+    # limitado a ±max_gain_db e reduzido se o pico passar de -0.3 dBFS
+    frame = max(1, sample_rate // 50)
+    n = len(wav) // frame * frame
+    if n == 0:
+        return wav
+    rms = np.sqrt(np.mean(wav[:n].reshape(-1, frame) ** 2, axis=1) + 1e-12)
+    voiced = rms[rms > 10 ** (gate_dbfs / 20)]
+    if len(voiced) == 0:
+        return wav
+
+    level = 20 * np.log10(np.sqrt(np.mean(voiced ** 2)))
+    gain = 10 ** (np.clip(target_dbfs - level, -max_gain_db, max_gain_db) / 20)
+    peak = float(np.max(np.abs(wav))) * gain
+    if peak > 0.966:
+        gain *= 0.966 / peak
+    return wav * np.float32(gain)
+
+
+class TimeStretcher:
+    # WSOLA: quadros de 40 ms com 50% de sobreposição (janela de Hann); cada
+    # quadro é buscado a ±tolerância da posição nominal para casar a forma de
+    # onda com a continuação natural do anterior. Processa em blocos e mantém
+    # o estado entre chamadas, então serve para streaming.
+    def __init__(self, sample_rate: int, speed: float, frame_ms: float = 40.0):
+        self.speed = speed
+        self.n = int(sample_rate * frame_ms / 1000) // 2 * 2
+        self.hop = self.n // 2
+        self.tol = self.hop // 2
+        self.window = np.hanning(self.n + 1)[:-1].astype(np.float32)
+        self.buf = np.zeros(self.tol, dtype=np.float32)  # folga para a busca à esquerda
+        self.base = 0          # posição absoluta de buf[0]
+        self.pos = float(self.tol)  # posição nominal (absoluta) do próximo quadro
+        self.prev = None       # início absoluto do último quadro escolhido
+        self.acc = np.zeros(self.n, dtype=np.float32)
+
+    def _best_start(self, nominal: int) -> int:
+        if self.prev is None:
+            return nominal
+        natural = self.buf[self.prev + self.hop - self.base:self.prev + self.hop - self.base + self.n]
+        lo = nominal - self.tol - self.base
+        seg = self.buf[lo:lo + self.n + 2 * self.tol]
+        size = 1 << int(np.ceil(np.log2(len(seg) + self.n)))
+        corr = np.fft.irfft(np.fft.rfft(seg, size) * np.conj(np.fft.rfft(natural, size)), size)
+        return nominal - self.tol + int(np.argmax(corr[:2 * self.tol + 1]))
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        if self.speed == 1.0:
+            return x
+        self.buf = np.concatenate([self.buf, x.astype(np.float32, copy=False)])
+        out = []
+        while True:
+            nominal = int(self.pos)
+            end = self.base + len(self.buf)
+            need = max(nominal + self.tol + self.n, (self.prev or 0) + self.hop + self.n)
+            if need > end:
+                break
+            start = self._best_start(nominal)
+            frame = self.buf[start - self.base:start - self.base + self.n] * self.window
+            self.acc += frame
+            out.append(self.acc[:self.hop].copy())
+            self.acc = np.concatenate([self.acc[self.hop:], np.zeros(self.hop, dtype=np.float32)])
+            self.prev = start
+            self.pos += self.hop * self.speed
+
+        # descarta do buffer o que nenhum quadro futuro vai usar
+        keep_from = min(int(self.pos) - self.tol, self.prev if self.prev is not None else 0) - self.base
+        if keep_from > 0:
+            self.buf = self.buf[keep_from:]
+            self.base += keep_from
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+    def flush(self) -> np.ndarray:
+        if self.speed == 1.0:
+            return np.zeros(0, dtype=np.float32)
+        tail = self.process(np.zeros(self.n + 2 * self.tol, dtype=np.float32))
+        return np.concatenate([tail, self.acc[:self.hop]])
+
+
+class AudioChain:
+    # um chunk de PCM 16-bit por chamada -> PCM 16-bit pronto para o encoder
+    def __init__(self, out_rate: int, speed: float = 1.0, gap_ms: float = 0.0,
+                 normalize_dbfs=None):
+        self.out_rate = out_rate
+        self.gap = np.zeros(int(out_rate * gap_ms / 1000), dtype=np.float32)
+        self.normalize_dbfs = normalize_dbfs
+        self.stretcher = TimeStretcher(out_rate, speed)
+        self.started = False
+
+    def process_chunk(self, pcm: bytes, sample_rate: int = None) -> bytes:
+        wav = resample(pcm_to_float(pcm), sample_rate or self.out_rate, self.out_rate)
+        if self.normalize_dbfs is not None:
+            wav = normalize_loudness(wav, self.out_rate, self.normalize_dbfs)
+        if self.started and len(self.gap):
+            wav = np.concatenate([self.gap, wav])
+        self.started = True
+        return float_to_pcm(self.stretcher.process(wav))
+
+    def flush(self) -> bytes:
+        return float_to_pcm(self.stretcher.flush())
+
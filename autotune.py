@@ -0,0 +1,130 @@
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+
+from chunking import iter_chunks
+from normalize import normalize_text
+
+# ==========================
+# AUTO-TUNE DO TAMANHO DE CHUNK
+# ==========================
+# Chunk curto = muitas chamadas ao engine (overhead fixo por chamada: sessão
+# onnx, GPT do XTTS, etc.); chunk longo = menos chamadas, mas prosódia pior e
+# retomada menos granular. Aqui a mesma amostra do livro é sintetizada com
+# vários tamanhos de chunk e medimos segundos de áudio por segundo de relógio.
+# Fica o menor tamanho a até TOLERANCE da melhor vazão, nunca acima do limite
+# de qualidade do backend. O perfil é guardado por voz (identidade do engine)
+# e reaproveitado nas próximas execuções.
+#
+#   python autotune.py [cache/chunk_profiles.json]   # lista os perfis salvos
+
+CANDIDATES = (60, 100, 150, 200, 300, 400, 600, 800)
+TOLERANCE = 0.05
+ROUNDS = 2
+
+
+def profile_key(identity: dict) -> str:
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_profiles(path) -> dict:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def load_profile(path, identity: dict, max_chars: int):
+    profile = load_profiles(path).get(profile_key(identity))
+    if profile and profile.get("max_chars") == max_chars:
+        return profile
+    return None
+
+
+def save_profile(path, identity: dict, profile: dict):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiles = load_profiles(path)
+    profiles[profile_key(identity)] = profile
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(profiles, indent=2, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _measure(engine, texts):
+    # (segundos de relógio, segundos de áudio) sintetizando todos os textos
+    batch = max(1, getattr(engine, "batch_size", 1))
+    wall = audio = 0.0
+    for start in range(0, len(texts), batch):
+        t0 = time.perf_counter()
+        pcms = engine.synthesize_batch(texts[start:start + batch])
+        wall += time.perf_counter() - t0
+        audio += sum(len(pcm) for pcm in pcms) / 2 / engine.sample_rate
+    return wall, audio
+
+
+def tune(engine, sample: str, max_chars: int, identity: dict) -> dict:
+    sizes = [size for size in CANDIDATES if size <= max_chars] or [max_chars]
+    plans = {
+        size: [t for t in (normalize_text(c) for c in iter_chunks(sample, size, hard_limit=None)) if t]
+        for size in sizes
+    }
+    if not plans[sizes[0]]:
+        raise ValueError("amostra sem texto para medir")
+
+    # aquecimento: primeira chamada paga inicialização de sessão/caches
+    engine.synthesize_batch([plans[sizes[0]][0]])
+
+    best_wall = {size: None for size in sizes}
+    audio_of = {}
+    for _ in range(ROUNDS):
+        for size in sizes:
+            wall, audio = _measure(engine, plans[size])
+            if best_wall[size] is None or wall < best_wall[size]:
+                best_wall[size] = wall
+            audio_of[size] = audio
+
+    measurements = []
+    for size in sizes:
+        wall = best_wall[size] or 1e-9
+        measurements.append({
+            "chunk_size": size,
+            "chunks": len(plans[size]),
+            "wall_seconds": round(wall, 4),
+            "audio_seconds": round(audio_of[size], 3),
+            "audio_per_second": round(audio_of[size] / wall, 3),
+            "seconds_per_call": round(wall / len(plans[size]), 4),
+        })
+
+    top = max(m["audio_per_second"] for m in measurements)
+    chosen = next(m for m in measurements if m["audio_per_second"] >= top * (1 - TOLERANCE))
+    return {
+        "chunk_size": chosen["chunk_size"],
+        "max_chars": max_chars,
+        "sample_chars": len(sample),
+        "identity": identity,
+        "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "measurements": measurements,
+    }
+
+
+def format_profile(profile: dict) -> str:
+    lines = [f"chunk_size escolhido: {profile['chunk_size']} (limite {profile['max_chars']}, {profile['measured_at']})"]
+    for m in profile["measurements"]:
+        mark = "  ←" if m["chunk_size"] == profile["chunk_size"] else ""
+        lines.append(
+            f"  {m['chunk_size']:>5} chars: {m['audio_per_second']:>8.2f} s áudio/s, "
+            f"{m['seconds_per_call'] * 1000:>8.1f} ms/chamada ({m['chunks']} chunks){mark}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from config import CHUNK_PROFILE_FILE
+
+    path = sys.argv[1] if len(sys.argv) > 1 else CHUNK_PROFILE_FILE
+    for key, profile in load_profiles(path).items():
+        print(f"[{profile['identity'].get('backend')}] {key[:12]}")
+        print(format_profile(profile))
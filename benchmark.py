@@ -0,0 +1,233 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+from chunking import synthetic_text
+from config import MANIFEST_FILE, PIPER_MODEL
+from manifest import JobManifest
+
+# ==========================
+# BENCHMARK (livro inteiro)
+# ==========================
+# Roda o pipeline completo (capítulos -> chunks -> síntese -> áudio -> mp3)
+# num livro sintético determinístico, com cache e saída novos num diretório
+# temporário, e mede chars/s, fator de tempo real, latência por estágio
+# (p50/p90/p99) e pico de RSS. O backend "null" gera um tom com ruído, sem
+# modelo, então mede o custo do pipeline em si; piper/coqui entram quando
+# estão instalados. Os resultados vão para um JSON em benchmarks/ para
+# comparar entre commits (--compare).
+#
+#   python benchmark.py                      # backend null, 1 MB
+#   python benchmark.py --backend all --mb 0.2
+#   python benchmark.py --compare benchmarks/<anterior>.json
+
+RESULTS_DIR = "benchmarks"
+
+_NUMBERS = ["Um", "Dois", "Tres", "Quatro", "Cinco", "Seis", "Sete", "Oito", "Nove", "Dez"]
+
+
+def book_corpus(n_bytes: int, chapters: int = 10, seed: int = 42) -> str:
+    # capítulos com título numerado ("3. Capitulo Tres Do Livro") e texto sintético
+    size = max(1, n_bytes // chapters)
+    parts = []
+    for k in range(chapters):
+        name = _NUMBERS[k] if k < len(_NUMBERS) else str(k + 1)
+        parts.append(f"{k + 1}. Capitulo {name} Do Livro\n\n")
+        parts.append(synthetic_text(size, seed + k))
+        parts.append("\n\n")
+    return "".join(parts)
+
+
+def available_backends():
+    found = ["null"]
+    if importlib.util.find_spec("piper") and Path(PIPER_MODEL).exists():
+        found.append("piper")
+    if importlib.util.find_spec("TTS"):
+        found.append("coqui")
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def peak_rss_mb(who) -> float:
+    # ru_maxrss: KB no Linux, bytes no macOS. RUSAGE_CHILDREN = maior filho
+    # (workers do pool, ffmpeg)
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_backend(backend, corpus, workers, verbose=False) -> dict:
+    import pipeline
+
+    workdir = Path(tempfile.mkdtemp(prefix="audiobk-bench-"))
+    saved = pipeline.INPUT_TXT, pipeline.OUTPUT_DIR
+    log = io.StringIO()
+    try:
+        book = workdir / "book.txt"
+        book.write_text(corpus, encoding="utf-8")
+        output = workdir / "output"
+
+        # o pipeline lê INPUT_TXT/OUTPUT_DIR do próprio módulo (restaurados no fim)
+        pipeline.INPUT_TXT = str(book)
+        pipeline.OUTPUT_DIR = str(output)
+        argv = ["--backend", backend, "--workers", str(workers), "--cache-db", str(workdir / "cache.sqlite")]
+
+        metrics.enable()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(sys.stdout if verbose else log):
+            pipeline.main(argv)
+        wall = time.perf_counter() - t0
+        stages = metrics.summary()
+
+        manifest = JobManifest(output / MANIFEST_FILE)
+        p = manifest.progress()
+        manifest.close()
+    finally:
+        metrics.disable()
+        metrics.close()
+        pipeline.INPUT_TXT, pipeline.OUTPUT_DIR = saved
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if not p["chunks_done"]:
+        tail = "\n".join(log.getvalue().splitlines()[-5:])
+        raise RuntimeError(f"nenhum chunk sintetizado com o backend {backend}:\n{tail}")
+
+    audio = p["audio_seconds"]
+    return {
+        "backend": backend,
+        "workers": workers,
+        "chapters": p["chapters"],
+        "chapters_done": p["chapters_done"],
+        "chunks": p["chunks"],
+        "chunks_failed": p["chunks_failed"],
+        "chars": p["chars_done"],
+        "wall_seconds": wall,
+        "audio_seconds": audio,
+        "chars_per_second": p["chars_done"] / wall if wall else 0.0,
+        # segundos de processamento por segundo de áudio (< 1 = mais rápido que tempo real)
+        "rtf": wall / audio if audio else None,
+        "synthesis_rtf": p["synthesis_seconds"] / audio if audio else None,
+        "stages": stages,
+    }
+
+
+def format_run(run: dict) -> str:
+    lines = [
+        f"[{run['backend']}] {run['chars']} chars, {run['chunks']} chunks, "
+        f"{run['chapters_done']}/{run['chapters']} capítulos em {run['wall_seconds']:.2f}s",
+        f"  {run['chars_per_second']:.0f} chars/s | RTF {run['rtf']:.4f} "
+        f"(síntese {run['synthesis_rtf']:.4f}) | {run['audio_seconds'] / 60:.1f} min de áudio",
+        f"  {'estágio':<18}{'n':>7}{'total s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for name, s in run["stages"].items():
+        lines.append(
+            f"  {name:<18}{s['count']:>7}{s['total']:>10.3f}{s['p50'] * 1e3:>10.2f}"
+            f"{s['p90'] * 1e3:>10.2f}{s['p99'] * 1e3:>10.2f}{s['max'] * 1e3:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def compare(current: dict, previous: dict) -> str:
+    # variação relativa das métricas principais, por backend
+    def delta(new, old):
+        if not old or new is None:
+            return "   n/d"
+        return f"{100.0 * (new - old) / old:+6.1f}%"
+
+    old_runs = {r["backend"]: r for r in previous.get("runs", [])}
+    lines = [f"Comparação com {previous.get('commit')} ({previous.get('timestamp')}):"]
+    for run in current["runs"]:
+        old = old_runs.get(run["backend"])
+        if old is None:
+            continue
+        lines.append(
+            f"  [{run['backend']}] chars/s {delta(run['chars_per_second'], old['chars_per_second'])}"
+            f" | RTF {delta(run['rtf'], old['rtf'])}"
+        )
+        for name, s in run["stages"].items():
+            o = old["stages"].get(name)
+            if o:
+                lines.append(f"    {name:<18} p50 {delta(s['p50'], o['p50'])}  p90 {delta(s['p90'], o['p90'])}")
+    lines.append(f"  pico RSS {delta(current['peak_rss_mb']['self'], previous['peak_rss_mb']['self'])}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline completo num livro sintético")
+    parser.add_argument("--backend", action="append", help="null, piper, coqui ou all (repetível; padrão: null)")
+    parser.add_argument("--mb", type=float, default=1.0, help="Tamanho do livro sintético em MB")
+    parser.add_argument("--chapters", type=int, default=10, help="Número de capítulos do livro sintético")
+    parser.add_argument("--workers", type=int, default=1, help="Processos de síntese (repassado ao pipeline)")
+    parser.add_argument("--output", help=f"Arquivo JSON de resultados (padrão: {RESULTS_DIR}/<data>_<commit>.json)")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--verbose", action="store_true", help="Mostra a saída do pipeline")
+    args = parser.parse_args()
+
+    backends = args.backend or ["null"]
+    if "all" in backends:
+        backends = available_backends()
+
+    corpus = book_corpus(int(args.mb * 1024 * 1024), args.chapters)
+    print(f"INFO: Livro sintético: {len(corpus)} chars, {args.chapters} capítulos")
+
+    runs = []
+    for backend in backends:
+        print(f"INFO: Rodando backend {backend}...")
+        try:
+            run = run_backend(backend, corpus, args.workers, args.verbose)
+        except Exception as e:
+            print(f"ERRO: {e}")
+            continue
+        runs.append(run)
+        print(format_run(run))
+
+    if not runs:
+        sys.exit(1)
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus_chars": len(corpus),
+        "runs": runs,
+        "peak_rss_mb": {
+            "self": peak_rss_mb(resource.RUSAGE_SELF),
+            "children": peak_rss_mb(resource.RUSAGE_CHILDREN),
+        },
+    }
+    print(f"Pico de RSS: {results['peak_rss_mb']['self']:.0f} MB (maior processo filho: {results['peak_rss_mb']['children']:.0f} MB)")
+
+    output = Path(args.output) if args.output else Path(RESULTS_DIR) / f"{datetime.now():%Y%m%d-%H%M%S}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"INFO: Resultados em {output}")
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(compare(results, previous))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# ==========================
+# CHAPTER DETECTION (GOLD)
+# ==========================
+# Módulo único usado por pipeline.py e split_chapters.py: mesma pontuação de
+# título, mesmo limiar e mesma junção de capítulos curtos, então os dois
+# produzem exatamente os mesmos capítulos. Capítulos são intervalos [start, end)
+# de offsets no documento; o texto só é montado quando alguém pede (ingest.py).
+
+TITLE_THRESHOLD = 0.6
+MIN_CHAPTER_CHARS = 2000
+INTRO_TITLE = "Introducao"
+
+_NUMBERED = re.compile(r"\d+\.")
+_NUMBERED_OR_ROMAN = re.compile(r"(?:\d+|[IVXLCDM]+)[\.\s]+")
+_LINE = re.compile(r"\r\n|\r|\n")
+_BLANK_LINES = re.compile(r"\n[ \t]*\n(?:[ \t]*\n)+")
+
+
+def title_score(line: str) -> float:
+    line = line.strip()
+    if not line:
+        return 0.0
+
+    score = 0.0
+    words = line.split()
+
+    # Numeração explícita (arábica ou romana)
+    if _NUMBERED.match(line):
+        score += 0.5
+
+    if _NUMBERED_OR_ROMAN.match(line):
+        score += 0.4
+
+    # Dois-pontos ou subtítulo (contagem de palavras a partir da mesma tokenização)
+    if ":" in line:
+        for k, w in enumerate(words):
+            colon = w.find(":")
+            if colon >= 0:
+                left = k + (1 if colon > 0 else 0)
+                right = len(words) - k - 1 + (1 if colon < len(w) - 1 else 0)
+                break
+
+        if 2 <= left <= 6:
+            score += 0.3
+
+        if right <= 8:
+            score += 0.2
+
+    # Capitalização
+    cap_ratio = sum(1 for w in words if w[0].isupper()) / len(words)
+    if cap_ratio >= 0.5:
+        score += 0.2
+
+    # Comprimento tolerante
+    if 3 <= len(words) <= 14:
+        score += 0.2
+
+    # Penalidades leves
+    if line.endswith((".", ",", ";")):
+        score -= 0.2
+
+    return min(max(score, 0.0), 1.0)
+
+
+def normalize_chapter_text(text: str) -> str:
+    # \r\n -> \n e no máximo uma linha em branco seguida
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def iter_text_records(text: str) -> Iterator[Tuple[int, int, str]]:
+    # (início, fim, linha) de um texto já em memória; offsets em caracteres
+    pos = 0
+    for m in _LINE.finditer(text):
+        yield pos, m.end(), text[pos:m.start()]
+        pos = m.end()
+    if pos < len(text):
+        yield pos, len(text), text[pos:]
+
+
+def plan_chapters(records: Iterable[Tuple[int, int, str]], min_chars: int = MIN_CHAPTER_CHARS) -> List[Dict]:
+    # records: (início, fim, linha) em ordem, com offsets no documento (bytes
+    # do arquivo mapeado ou caracteres de uma string). Só as linhas que parecem
+    # título ficam guardadas; o resultado são intervalos [start, end) do
+    # conteúdo de cada capítulo (sem a linha do título).
+    candidates = []
+    intro_content = False
+    origin = None
+    total = 0
+    for start, end, line in records:
+        if origin is None:
+            origin = start
+        total = end
+        confidence = title_score(line)
+        if confidence >= TITLE_THRESHOLD:
+            candidates.append((start, end, line.strip(), confidence))
+        elif not candidates and line.strip():
+            intro_content = True
+
+    ranges = []
+    if intro_content:
+        first = candidates[0][0] if candidates else total
+        ranges.append([INTRO_TITLE, 0.4 if candidates else 0.3, origin, first])
+
+    for k, (line_start, line_end, title, conf) in enumerate(candidates):
+        end = candidates[k + 1][0] if k + 1 < len(candidates) else total
+        ranges.append([title, conf, line_end, end])
+
+    # Validação de tamanho mínimo: capítulo curto é absorvido pelo anterior
+    # (incluindo a linha do título dele), só estendendo o intervalo
+    validated = []
+    for title, conf, start, end in ranges:
+        if validated and end - start < min_chars:
+            validated[-1][3] = end
+        else:
+            validated.append([title, conf, start, end])
+
+    # abertura curta (antes do primeiro título) vai para o início do capítulo seguinte
+    if len(validated) > 1 and validated[0][3] - validated[0][2] < min_chars:
+        validated[1][2] = validated[0][2]
+        del validated[0]
+
+    return [
+        {"index": i, "title": title, "confidence": conf, "start": start, "end": end}
+        for i, (title, conf, start, end) in enumerate(validated, 1)
+    ]
+
+
+def split_text_chapters(text: str, min_chars: int = MIN_CHAPTER_CHARS) -> List[Dict]:
+    # versão para textos em memória (trechos curtos, testes)
+    chapters = plan_chapters(iter_text_records(text), min_chars)
+    for ch in chapters:
+        ch["text"] = normalize_chapter_text(text[ch["start"]:ch["end"]])
+    return chapters
@@ -0,0 +1,179 @@
+import io
+import mmap
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# ==========================
+# CHUNK STORE (um arquivo por capítulo)
+# ==========================
+# O áudio de cada chunk de um capítulo é anexado, na ordem em que fica
+# pronto, a um único arquivo de dados (chunks.store), e cada bloco ganha uma
+# linha no índice (chunks.idx: chave, offset, tamanho, codec, sample rate).
+# A montagem do capítulo lê os blocos pelo índice num mmap, sem uma consulta
+# ao SQLite por chunk; a retomada acha os chunks já feitos pela chave
+# (acesso aleatório). Nada é apagado no lugar: chunk regravado vira espaço
+# morto, que some junto com o store quando o capítulo fica pronto.
+#
+# O store é só o trabalho em andamento do capítulo: o cache de síntese
+# continua sendo a cópia durável (sem fsync aqui), e remove_store() apaga o
+# store quando o chapter.mp3 fica pronto, para o áudio não ficar duas vezes
+# no disco. Depois de uma queda, linhas do índice que apontam além do fim
+# dos dados (ou truncadas) são ignoradas e esses chunks voltam a vir do cache.
+#
+# Codecs por bloco: "pcm" (cru), "flac" (sem perdas, ~2x menor) e "opus"
+# (com perdas, ~10x menor; só nas taxas do Opus, senão o bloco vai em FLAC).
+# Bloco com perdas só é usado na montagem se o cache não tiver mais o PCM
+# (get(key, lossless=True)). flac/opus usam o soundfile, importado só
+# quando pedido.
+#
+#   python chunk_store.py output/01_Capitulo/   # resumo do store do capítulo
+
+DATA_FILE = "chunks.store"
+INDEX_FILE = "chunks.idx"
+CODECS = ("pcm", "flac", "opus")
+LOSSLESS = ("pcm", "flac")
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def _encode(codec, pcm: bytes, sample_rate: int):
+    if codec == "pcm":
+        return codec, pcm
+    import soundfile as sf
+
+    if codec == "opus" and sample_rate not in OPUS_RATES:
+        codec = "flac"
+    buf = io.BytesIO()
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if codec == "opus":
+        sf.write(buf, samples, sample_rate, format="OGG", subtype="OPUS")
+    else:
+        sf.write(buf, samples, sample_rate, format="FLAC", subtype="PCM_16")
+    return codec, buf.getvalue()
+
+
+def _decode(codec, data: bytes) -> bytes:
+    if codec == "pcm":
+        return bytes(data)
+    import soundfile as sf
+
+    samples, _ = sf.read(io.BytesIO(data), dtype="int16")
+    return samples.tobytes()
+
+
+class ChunkStore:
+    # um escritor por vez (a síntese do capítulo ou a montagem dele)
+    def __init__(self, directory, codec="pcm"):
+        if codec not in CODECS:
+            raise ValueError(f"codec desconhecido: {codec} (use {', '.join(CODECS)})")
+        self.dir = Path(directory)
+        self.codec = codec
+        self.data_path = self.dir / DATA_FILE
+        self.index_path = self.dir / INDEX_FILE
+        self.index = {}          # chave -> (offset, tamanho, codec, sample_rate)
+        self._data = None
+        self._index = None
+        self._map = None
+        self._load()
+
+    def _load(self):
+        try:
+            size = self.data_path.stat().st_size
+            lines = self.index_path.read_text(encoding="ascii", errors="replace").splitlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            parts = line.split(" ")
+            if len(parts) != 5 or parts[3] not in CODECS:
+                continue
+            try:
+                key, offset, length, codec, rate = parts[0], int(parts[1]), int(parts[2]), parts[3], int(parts[4])
+            except ValueError:
+                continue
+            if offset + length > size:
+                continue
+            self.index[key] = (offset, length, codec, rate)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def live_bytes(self) -> int:
+        return sum(entry[1] for entry in self.index.values())
+
+    def data_bytes(self) -> int:
+        try:
+            return self.data_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def append(self, key, sample_rate: int, pcm: bytes):
+        codec, block = _encode(self.codec, pcm, sample_rate)
+        if self._data is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._data = open(self.data_path, "ab")
+            self._index = open(self.index_path, "a", encoding="ascii")
+        offset = self._data.seek(0, os.SEEK_END)
+        self._data.write(block)
+        self._data.flush()
+        # índice depois dos dados: linha presente = bloco completo no arquivo
+        self._index.write(f"{key} {offset} {len(block)} {codec} {sample_rate}\n")
+        self._index.flush()
+        self.index[key] = (offset, len(block), codec, sample_rate)
+
+    def get(self, key, lossless=False):
+        # (sample_rate, pcm) ou None; lossless=True ignora blocos opus
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        offset, length, codec, rate = entry
+        if lossless and codec not in LOSSLESS:
+            return None
+        if not length:
+            return rate, b""
+        if self._map is None or len(self._map) < offset + length:
+            self._remap()
+        return rate, _decode(codec, self._map[offset:offset + length])
+
+    def _remap(self):
+        if self._map is not None:
+            self._map.close()
+        with open(self.data_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for f in (self._data, self._index, self._map):
+            if f is not None:
+                f.close()
+        self._data = self._index = self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def remove_store(directory):
+    # capítulo pronto: o áudio dele está no mp3 e no cache de síntese
+    for name in (DATA_FILE, INDEX_FILE):
+        try:
+            (Path(directory) / name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    store = ChunkStore(sys.argv[1] if len(sys.argv) > 1 else ".")
+    codecs = {}
+    for _, _, codec, _ in store.index.values():
+        codecs[codec] = codecs.get(codec, 0) + 1
+    live = store.live_bytes()
+    print(f"{len(store)} chunks, {live / 1e6:.1f} MB indexados, {(store.data_bytes() - live) / 1e6:.1f} MB mortos, "
+          f"codecs: {codecs or '-'}")
+    store.close()
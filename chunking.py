@@ -0,0 +1,170 @@
+import re
+from functools import lru_cache
+
+# ==========================
+# TEXT CHUNKER
+# ==========================
+# Trabalha só com offsets no texto original: sentenças, palavras e chunks são
+# pares (início, fim) e o texto do chunk é um único fatiamento no final.
+# Um único algoritmo cobre as duas estratégias que existiam no projeto:
+#   - min_size=None: empacota sentenças enquanto couberem (pipeline.py)
+#   - min_size=N:    só junta peças quando uma delas tem menos de N chars (main.py)
+# Sentenças maiores que o limite são divididas por palavras, e palavras maiores
+# que o limite são fatiadas.
+
+PIPELINE_SEPARATORS = ",.!?"
+HARD_LIMIT = 200
+
+_WORD = re.compile(r"\S+")
+
+
+@lru_cache(maxsize=None)
+def _boundary(separators: str):
+    # fim de sentença: separador seguido de espaço (não quebra "3,5" nem "U.S.A")
+    return re.compile(r"(?<=[" + re.escape(separators) + r"])\s+")
+
+
+def _strip(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def iter_sentence_spans(text, separators=PIPELINE_SEPARATORS, start=0, end=None):
+    end = len(text) if end is None else end
+    pos = start
+    for m in _boundary(separators).finditer(text, start, end):
+        s, e = _strip(text, pos, m.start())
+        if s < e:
+            yield s, e
+        pos = m.end()
+    s, e = _strip(text, pos, end)
+    if s < e:
+        yield s, e
+
+
+def _iter_pieces(text, max_size, separators, start, end):
+    # sentenças que cabem no limite; as maiores viram palavras / fatias
+    for s, e in iter_sentence_spans(text, separators, start, end):
+        if e - s <= max_size:
+            yield s, e, False
+            continue
+        for m in _WORD.finditer(text, s, e):
+            ws, we = m.span()
+            if we - ws <= max_size:
+                yield ws, we, False
+            else:
+                # palavra maior que o limite: fatiar; cada fatia é um chunk isolado
+                for i in range(ws, we, max_size):
+                    yield i, min(i + max_size, we), True
+
+
+def iter_chunk_spans(text, size=150, hard_limit=HARD_LIMIT, min_size=None,
+                     separators=PIPELINE_SEPARATORS, start=0, end=None):
+    # gera (início, fim) de cada chunk, preguiçosamente; fim - início <= limite
+    max_size = size if hard_limit is None else min(size, hard_limit)
+    end = len(text) if end is None else end
+
+    cur_start = cur_end = None
+    for s, e, isolated in _iter_pieces(text, max_size, separators, start, end):
+        if isolated:
+            if cur_start is not None:
+                yield cur_start, cur_end
+                cur_start = None
+            yield s, e
+            continue
+
+        if cur_start is None:
+            cur_start, cur_end = s, e
+            continue
+
+        fits = e - cur_start <= max_size
+        if min_size is not None:
+            fits = fits and (cur_end - cur_start < min_size or e - s < min_size)
+
+        if fits:
+            cur_end = e
+        else:
+            yield cur_start, cur_end
+            cur_start, cur_end = s, e
+
+    if cur_start is not None:
+        yield cur_start, cur_end
+
+
+def _follows(text, pos, chunk) -> bool:
+    # chunk começa em pos, depois de espaço em branco
+    while pos < len(text) and text[pos].isspace():
+        pos += 1
+    return text.startswith(chunk, pos)
+
+
+def align_chunk_spans(text, previous, size=150, hard_limit=HARD_LIMIT,
+                      separators=PIPELINE_SEPARATORS, anchor_min=40):
+    # Chunking de uma versão editada do texto que mantém os chunks da versão
+    # anterior (previous: textos originais dos chunks, em ordem) onde o texto
+    # não mudou. O empacotamento guloso recomeçado do zero desloca todas as
+    # fronteiras depois de uma edição; aqui cada chunk antigo achado no texto
+    # novo vira âncora e só os trechos entre âncoras (as edições) são
+    # divididos de novo. Âncora curta só vale se o chunk antigo seguinte vem
+    # logo depois dela (evita casar um "Sim." qualquer lá na frente).
+    pos = 0
+    for k, chunk in enumerate(previous):
+        at = text.find(chunk, pos)
+        if at < 0:
+            continue
+        end = at + len(chunk)
+        if len(chunk) < anchor_min and k + 1 < len(previous) and not _follows(text, end, previous[k + 1]):
+            continue
+        if text[pos:at].strip():
+            yield from iter_chunk_spans(text, size, hard_limit, separators=separators, start=pos, end=at)
+        yield at, end
+        pos = end
+    if text[pos:].strip():
+        yield from iter_chunk_spans(text, size, hard_limit, separators=separators, start=pos)
+
+
+def iter_chunks(text, size=150, **options):
+    for s, e in iter_chunk_spans(text, size, **options):
+        yield text[s:e]
+
+
+def chunk_text(text, size=150, **options):
+    return list(iter_chunks(text, size, **options))
+
+
+# ==========================
+# TEXTO SINTÉTICO
+# ==========================
+# Português sintético (com palavras patológicas) para os testes e o
+# benchmark: python -m pytest tests/test_chunking.py confere limites, ordem
+# e o realinhamento e mede a vazão em alguns MB.
+
+_WORDS = (
+    "o a de que e do da em um para com não uma os no se na por mais as dos "
+    "como mas foi ao ele das tem à seu sua ou ser quando muito há nos já está "
+    "eu também só pelo pela até isso ela entre era depois sem mesmo aos ter "
+    "história humanidade informação redes poder democracia algoritmos "
+    "civilização tecnologia inteligência artificial burocracia mitologia"
+).split()
+
+
+def synthetic_text(n_bytes: int, seed: int = 42) -> str:
+    import random
+
+    rnd = random.Random(seed)
+    parts = []
+    size = 0
+    while size < n_bytes:
+        sentence = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(3, 40)))
+        if rnd.random() < 0.01:
+            # palavras patológicas (urls, sequências sem espaço)
+            sentence += " " + "x" * rnd.randint(150, 700)
+        sentence = sentence[0].upper() + sentence[1:] + rnd.choice(".,!?;")
+        parts.append(sentence)
+        parts.append("\n\n" if rnd.random() < 0.1 else " ")
+        size += len(sentence) + 1
+    return "".join(parts)
+
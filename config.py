@@ -8,8 +8,12 @@ INPUT_TXT = "texto.txt"
 OUTPUT_DIR = "output"
 
 # Chunking / TTS
-CHUNK_SIZE = 150
-MP3_SPEED = 1.0
+CHUNK_SIZE = 150  # ou "auto": mede a vazão do backend/modelo e escolhe (autotune.py)
+MP3_SPEED = 1.0  # aplicada no próprio processo (WSOLA), sem alterar o tom
+
+# Pós-processamento de áudio (audio.py), aplicado chunk a chunk antes do encoder
+CHUNK_GAP_MS = 0  # silêncio inserido entre chunks
+NORMALIZE_DBFS = None  # ex.: -20.0 para igualar o volume dos chunks
 
 # Backend padrão: 'piper' ou 'coqui'
 DEFAULT_BACKEND = "piper"
@@ -23,5 +27,81 @@ DEFAULT_BACKEND = "piper"
 DEFAULT_MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
 DEFAULT_LANGUAGE = "pt"
 DEFAULT_SPEAKER_WAV = "ModelVoices/Yuval_Harari.wav"  # caminho para wav de speaker
+COQUI_BATCH_SIZE = 4  # chunks por lote de inferência no XTTS
+COQUI_LATENTS_DIR = "cache/xtts_latents"  # latentes do speaker, por hash do wav
+
+# Defaults para Piper (só usados quando backend == 'piper')
+PIPER_MODEL = "Piper_Voicer/pt_BR-faber-medium.onnx"
+PIPER_VOLUME = 1.0
+PIPER_SPEED = 1.2  # length_scale do Piper
+PIPER_NOISE_SCALE = 1.0
+PIPER_NOISE_W_SCALE = 1.0
+
+# Várias vozes por livro (voices.py): JSON com as vozes e quem fala o quê; "" = uma voz só
+VOICE_MAP_FILE = ""
+
+# Sessões onnxruntime do Piper (model_pool.py mede a melhor divisão)
+PIPER_INTRA_THREADS = 0  # threads por sessão; 0 = núcleos / processos de síntese
+PIPER_INTER_THREADS = 1
+PIPER_GRAPH_OPT = "all"  # disable | basic | extended | all
+PIPER_OPTIMIZED_DIR = "cache/onnx_optimized"  # grafo otimizado salvo em disco ("" desativa)
+POOL_PROFILE_FILE = "cache/pool_profiles.json"
+
+# Cache de fonemas do Piper (espeak) por sentença normalizada; None desliga
+PHONEME_CACHE_DB = "cache/phonemes.sqlite"
+
+# Auto-tune do tamanho de chunk (CHUNK_SIZE = "auto" ou --chunk-size auto):
+# limite de qualidade por backend (chars; chunks maiores degradam a prosódia /
+# estouram o limite do XTTS), tamanho da amostra do livro usada na medição e
+# arquivo com o perfil medido de cada voz
+AUTOTUNE_MAX_CHARS = {"piper": 400, "coqui": 200, "null": 800}
+AUTOTUNE_SAMPLE_CHARS = 3000
+CHUNK_PROFILE_FILE = "cache/chunk_profiles.json"
+
+# Áudio dos chunks do capítulo em andamento num único arquivo (chunk_store.py,
+# apagado quando o mp3 fica pronto): "pcm", "flac" (sem perdas) ou "opus" (com
+# perdas, só usado se o cache não tiver o chunk); flac/opus usam o soundfile
+CHUNK_STORE_CODEC = "pcm"
+
+# Cache de síntese (áudio por chunk, endereçado pelo texto + voz + parâmetros)
+CACHE_DB = "cache/tts_chunks.sqlite"
+CACHE_MAX_MB = 2048
+
+# Manifesto do job (estado de capítulos/chunks, dentro de OUTPUT_DIR)
+MANIFEST_FILE = "manifest.sqlite"
+# Retentativas de chunks com falha (backoff exponencial a partir de RETRY_BACKOFF s)
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 2.0
+
+# Estágios do pipeline: capítulos preparados à frente da síntese, threads de
+# encode (ffmpeg) em paralelo e tamanho da fila de PCM por capítulo
+PREP_AHEAD = 2
+ENCODE_WORKERS = 2
+ENCODE_QUEUE = 64
+
+# Modo distribuído (pipeline.py --coordinator + python distributed.py <work_dir>):
+# workers renovam o lease a cada HEARTBEAT_SECONDS; lease parado por mais de
+# LEASE_SECONDS é considerado de um worker morto e o chunk volta para a fila
+HEARTBEAT_SECONDS = 10
+LEASE_SECONDS = 60
+
+# Streaming (stream.py / POST /stream no server.py): primeiro chunk curto para
+# o áudio começar logo, e quantos chunks são sintetizados à frente da reprodução
+STREAM_FIRST_CHUNK = 60
+STREAM_LOOKAHEAD = 3
+
+# Servidor local de jobs (server.py): endereço, pasta dos jobs, limite de
+# tamanho para um texto ser tratado como trecho curto (passa à frente dos
+# livros) e quantos jobs terminados ficam em memória (os mais antigos saem)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_JOBS_DIR = "output/jobs"
+SHORT_JOB_CHARS = 2000
+SERVER_KEEP_JOBS = 200
+
+# Tracing/métricas (metrics.py): JSON lines com um span por etapa/chunk e
+# arquivo de métricas no formato texto do Prometheus. None = desligado.
+TRACE_FILE = None
+METRICS_FILE = None
 
 # Opcional: adicione outras configurações aqui
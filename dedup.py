@@ -0,0 +1,108 @@
+import argparse
+from pathlib import Path
+
+from config import CHUNK_SIZE, INPUT_TXT, MANIFEST_FILE, OUTPUT_DIR
+
+# ==========================
+# DEDUPLICAÇÃO DE CHUNKS
+# ==========================
+# Livros repetem cabeçalhos, epígrafes, títulos, marcadores de nota e frases
+# feitas. O cache de síntese é endereçado pelo texto normalizado + voz, então
+# cada chunk único é sintetizado uma vez e as outras posições recebem o mesmo
+# áudio (PendingChunks agrupa as repetições antes de mandar para o pool, e
+# library.LibraryPending as repetições entre livros; no modo sequencial a
+# segunda ocorrência já sai do cache). Este módulo conta
+# as repetições do plano (livro ou biblioteca inteira) e estima o tempo de
+# síntese economizado com o custo por caractere medido no manifesto.
+#
+#   python dedup.py [livro.txt ...] [--chunk-size N]   # só o plano, sem sintetizar
+
+
+class DedupPlan:
+    def __init__(self):
+        self.keys = {}    # chave -> [ocorrências, chars, texto]
+        self.chunks = 0
+
+    def add(self, jobs):
+        # jobs: (índice, texto, chave) de um capítulo
+        for _, text, key in jobs:
+            self.chunks += 1
+            entry = self.keys.get(key)
+            if entry is None:
+                self.keys[key] = [1, len(text), text]
+            else:
+                entry[0] += 1
+
+    def tap(self, plan):
+        # repassa os itens de pipeline.iter_plan contando os chunks
+        for item in plan:
+            self.add(item[3])
+            yield item
+
+    def summary(self, top=5) -> dict:
+        repeated = [entry for entry in self.keys.values() if entry[0] > 1]
+        repeated.sort(key=lambda e: (e[0] - 1) * e[1], reverse=True)
+        return {
+            "chunks": self.chunks,
+            "unique": len(self.keys),
+            "repeated_chunks": sum(n - 1 for n, _, _ in repeated),
+            "repeated_chars": sum((n - 1) * chars for n, chars, _ in repeated),
+            "chars": sum(n * chars for n, chars, _ in self.keys.values()),
+            "top": [(n, text) for n, _, text in repeated[:top]],
+        }
+
+
+def seconds_per_char(progress: dict):
+    # custo médio de síntese medido (manifest.progress()); None sem medição
+    if not progress.get("synthesis_chars"):
+        return None
+    return progress["synthesis_seconds"] / progress["synthesis_chars"]
+
+
+def format_report(s: dict, per_char=None) -> str:
+    if not s["chunks"]:
+        return "Dedup: nenhum chunk no plano"
+    pct = 100.0 * s["repeated_chars"] / s["chars"] if s["chars"] else 0.0
+    lines = [
+        f"Dedup: {s['chunks']} chunks, {s['unique']} únicos; {s['repeated_chunks']} repetições "
+        f"({s['repeated_chars']} chars, {pct:.1f}% do texto) reaproveitam o áudio da primeira"
+    ]
+    if per_char is not None and s["repeated_chars"]:
+        lines.append(f"  Síntese economizada (estimada): {s['repeated_chars'] * per_char:.1f}s")
+    for n, text in s["top"]:
+        lines.append(f"  {n}x {text[:70]!r}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Conta chunks repetidos de um ou mais livros (sem sintetizar)")
+    parser.add_argument("books", nargs="*", default=[INPUT_TXT], help="Book text files (default: INPUT_TXT); repeats are counted across all of them")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE if str(CHUNK_SIZE).isdigit() else 150, help="Chunk length in chars")
+    parser.add_argument("--manifest", default=str(Path(OUTPUT_DIR) / MANIFEST_FILE), help="Manifest used to estimate seconds of synthesis per char")
+    args = parser.parse_args(argv)
+
+    from chunking import HARD_LIMIT, iter_chunks
+    from ingest import Book
+    from manifest import JobManifest
+    from normalize import normalize_text
+    from synth_cache import cache_key
+
+    plan = DedupPlan()
+    size = min(args.chunk_size, HARD_LIMIT)
+    for path in args.books:
+        with Book(path) as book:
+            for ch in book.chapters():
+                texts = [t for t in (normalize_text(c) for c in iter_chunks(ch.text(), size, hard_limit=None)) if t]
+                # a voz não muda a contagem: chave só pelo texto
+                plan.add([(i, text, cache_key(text, {})) for i, text in enumerate(texts)])
+
+    per_char = None
+    if Path(args.manifest).exists():
+        manifest = JobManifest(args.manifest)
+        per_char = seconds_per_char(manifest.progress())
+        manifest.close()
+    print(format_report(plan.summary(), per_char))
+
+
+if __name__ == "__main__":
+    main()
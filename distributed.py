@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+from pathlib import Path
+
+from config import HEARTBEAT_SECONDS, LEASE_SECONDS
+
+# ==========================
+# MODO DISTRIBUÍDO (fila em arquivos)
+# ==========================
+# Coordenador (pipeline.py --coordinator) e workers (python distributed.py
+# <work_dir>) conversam só por arquivos num diretório compartilhado (disco
+# local ou NFS/SMB entre máquinas):
+#
+#   coordinator.json   backend + opções do engine; mtime = heartbeat do coordenador
+#   tasks/<chave>.json um chunk pendente (texto já normalizado)
+#   leases/<chave>     criado com O_EXCL por quem pegou o chunk; o worker
+#                      atualiza o mtime (heartbeat) enquanto sintetiza
+#   done/<chave>.wav   resultado (gravado em .tmp e renomeado) + <chave>.json
+#   failed/<chave>.json erro; o coordenador decide se retenta
+#   STOP               fim do trabalho: workers saem
+#
+# Lease sem heartbeat há mais de LEASE_SECONDS (worker morto, máquina caiu)
+# é quebrado e o chunk volta para a fila. Um worker lento que termina depois
+# de perder o lease só regrava o mesmo resultado (idempotente). O
+# coordenador é o único que escreve no cache SQLite e no manifesto e monta
+# os capítulos à medida que os chunks chegam.
+
+
+def _write_json(path: Path, data: dict):
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _unlink(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class WorkQueue:
+    poll_interval = 0.2
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.tasks = self.root / "tasks"
+        self.leases = self.root / "leases"
+        self.done = self.root / "done"
+        self.failed = self.root / "failed"
+        self.info = self.root / "coordinator.json"
+        self.stop_file = self.root / "STOP"
+
+    # --------------------------
+    # coordenador
+    # --------------------------
+    def open(self, backend, options):
+        # fila nova a cada execução: o que já foi feito está no cache do coordenador
+        for d in (self.tasks, self.leases, self.done, self.failed):
+            d.mkdir(parents=True, exist_ok=True)
+            for f in d.iterdir():
+                _unlink(f)
+        _unlink(self.stop_file)
+        _write_json(self.info, {"backend": backend, "options": options, "host": socket.gethostname(), "pid": os.getpid()})
+
+    def add(self, key, text):
+        _write_json(self.tasks / f"{key}.json", {"key": key, "text": text})
+
+    def heartbeat(self):
+        os.utime(self.info)
+
+    def reap_leases(self):
+        for lease in self.leases.iterdir():
+            if _stale(lease):
+                _break_lease(lease)
+
+    def leased(self) -> bool:
+        # algum worker (local ou remoto) com chunk em andamento
+        return any(not lease.name.startswith(".") for lease in self.leases.iterdir())
+
+    def poll(self):
+        # (chave, erro, segundos de síntese, segundos de áudio, (sample_rate, pcm))
+        for wav_path in self.done.glob("*.wav"):
+            key = wav_path.stem
+            meta = _read_json(self.done / f"{key}.json") or {}
+            with wave.open(str(wav_path), "rb") as w:
+                audio = (w.getframerate(), w.readframes(w.getnframes()))
+            yield key, None, meta.get("seconds"), meta.get("audio_seconds"), audio
+
+        for fail_path in self.failed.glob("*.json"):
+            meta = _read_json(fail_path)
+            if meta is None or meta.get("seen"):
+                continue
+            # marcado como visto: fica bloqueando o chunk até release()
+            meta["seen"] = True
+            _write_json(fail_path, meta)
+            yield fail_path.stem, meta.get("error") or "erro desconhecido", None, None, None
+
+    def release(self, key):
+        # chunk com falha volta a ficar disponível para os workers
+        _unlink(self.failed / f"{key}.json")
+        _unlink(self.leases / key)
+
+    def remove(self, key):
+        for path in (self.tasks / f"{key}.json", self.done / f"{key}.wav",
+                     self.done / f"{key}.json", self.failed / f"{key}.json", self.leases / key):
+            _unlink(path)
+
+    def spawn_local(self, n):
+        # workers nesta máquina, como subprocessos (mesmo comando de um worker remoto)
+        script = Path(__file__).resolve()
+        return [
+            subprocess.Popen([sys.executable, str(script), str(self.root), "--id", f"{socket.gethostname()}-local{k}"])
+            for k in range(n)
+        ]
+
+    def close(self):
+        self.stop_file.touch()
+
+
+def _read_json(path: Path):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _stale(path: Path) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime > LEASE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+def _break_lease(lease: Path):
+    # rename é atômico: se dois processos tentam quebrar o mesmo lease, só um consegue
+    broken = lease.with_name(f".{lease.name}.{uuid.uuid4().hex}.broken")
+    try:
+        os.rename(lease, broken)
+    except FileNotFoundError:
+        return
+    print(f"WARN: lease expirado, chunk {lease.name[:12]} volta para a fila")
+    _unlink(broken)
+
+
+# --------------------------
+# worker
+# --------------------------
+class _Heartbeat:
+    # mantém os leases do lote atual vivos enquanto o engine sintetiza
+    def __init__(self):
+        self.leases = []
+        self.event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="heartbeat", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.event.wait(HEARTBEAT_SECONDS):
+            for lease in list(self.leases):
+                try:
+                    os.utime(lease)
+                except FileNotFoundError:
+                    pass
+
+    def stop(self):
+        self.event.set()
+
+
+def _claim(queue: WorkQueue, key: str, worker_id: str):
+    lease = queue.leases / key
+    if _stale(lease):
+        _break_lease(lease)
+    try:
+        fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return None
+    os.write(fd, json.dumps({"worker": worker_id, "since": time.time()}).encode("utf-8"))
+    os.close(fd)
+    # pode ter terminado/falhado entre a listagem e o lease
+    if (queue.done / f"{key}.wav").exists() or (queue.failed / f"{key}.json").exists():
+        _unlink(lease)
+        return None
+    return lease
+
+
+def _claim_batch(queue: WorkQueue, worker_id: str, size: int):
+    batch = []
+    for task in sorted(queue.tasks.glob("*.json")):
+        key = task.stem
+        if (queue.done / f"{key}.wav").exists() or (queue.failed / f"{key}.json").exists():
+            continue
+        lease = _claim(queue, key, worker_id)
+        if lease is None:
+            continue
+        data = _read_json(task)
+        if data is None:
+            # tarefa removida pelo coordenador nesse meio-tempo
+            _unlink(lease)
+            continue
+        batch.append((key, data["text"], lease))
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def run_worker(root, worker_id=None):
+    from engines import backend_batch_size, make_engine
+
+    queue = WorkQueue(root)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+    info = None
+    while info is None:
+        if queue.stop_file.exists():
+            return
+        info = _read_json(queue.info)
+        if info is None:
+            time.sleep(1.0)
+
+    backend, options = info["backend"], info["options"]
+    print(f"INFO: [{worker_id}] carregando backend {backend}...")
+    engine = make_engine(backend, options)
+    batch_size = backend_batch_size(backend, options)
+    heartbeat = _Heartbeat()
+    print(f"INFO: [{worker_id}] pronto")
+
+    idle = 0.0
+    try:
+        while not queue.stop_file.exists():
+            batch = _claim_batch(queue, worker_id, batch_size)
+            if not batch:
+                # coordenador sumiu (sem heartbeat): não fica esperando para sempre
+                if time.time() - queue.info.stat().st_mtime > 2 * LEASE_SECONDS:
+                    print(f"WARN: [{worker_id}] coordenador sem sinal, saindo")
+                    return
+                idle = min(idle + 0.2, 2.0)
+                time.sleep(idle)
+                continue
+            idle = 0.0
+
+            heartbeat.leases = [lease for _, _, lease in batch]
+            texts = [text for _, text, _ in batch]
+            t0 = time.perf_counter()
+            try:
+                pcms = engine.synthesize_batch(texts)
+            except Exception as e:
+                print(f"ERRO: [{worker_id}] falha em {len(batch)} chunk(s): {e}")
+                for key, _, lease in batch:
+                    _write_json(queue.failed / f"{key}.json", {"error": str(e), "worker": worker_id})
+                    _unlink(lease)
+                continue
+            finally:
+                heartbeat.leases = []
+            elapsed = time.perf_counter() - t0
+
+            chars = sum(len(t) for t in texts) or 1
+            for (key, text, lease), pcm in zip(batch, pcms):
+                audio_seconds = len(pcm) / 2 / engine.sample_rate
+                _write_json(queue.done / f"{key}.json", {
+                    "worker": worker_id,
+                    "seconds": elapsed * len(text) / chars,
+                    "audio_seconds": audio_seconds,
+                })
+                tmp = queue.done / f".{key}.{uuid.uuid4().hex}.tmp"
+                with wave.open(str(tmp), "wb") as w:
+                    w.setnchannels(1)
+                    w.setsampwidth(2)
+                    w.setframerate(engine.sample_rate)
+                    w.writeframes(pcm)
+                os.replace(tmp, queue.done / f"{key}.wav")
+                _unlink(lease)
+            print(f"INFO: [{worker_id}] {len(batch)} chunk(s) gerado(s)")
+    finally:
+        heartbeat.stop()
+
+
+if __name__ == "__main__":
+    # python distributed.py output/work [--id maquina-2]
+    parser = argparse.ArgumentParser(description="Worker do modo distribuído (fila em diretório compartilhado)")
+    parser.add_argument("work_dir", help="Diretório da fila publicado pelo coordenador (pipeline.py --coordinator)")
+    parser.add_argument("--id", help="Identificação do worker nos leases/logs")
+    args = parser.parse_args()
+    run_worker(args.work_dir, args.id)
@@ -0,0 +1,419 @@
+import copy
+import hashlib
+import os
+from pathlib import Path
+
+# ==========================
+# TTS ENGINES
+# ==========================
+# Cada engine carrega o modelo uma única vez no construtor e expõe
+# sample_rate, batch_size, synthesize_batch(texts) -> um PCM 16-bit mono por
+# texto (a interface usada pelo pipeline), synthesize(text) -> blocos de PCM
+# e synthesize_wav(text, output). make_engine() é usado tanto pelo processo
+# principal quanto pelos workers do pool (cada worker carrega o seu).
+# Este módulo não importa torch/TTS/piper: cada backend importa o que
+# precisa só quando é carregado (ver REGISTRO DE BACKENDS no fim).
+
+
+def to_pcm16(wav) -> bytes:
+    import numpy as np
+
+    wav = np.clip(np.asarray(wav, dtype=np.float32), -1.0, 1.0)
+    return (wav * 32767).astype(np.int16).tobytes()
+
+
+def load_speaker_latents(model, model_name, speaker_wav, cache_dir):
+    # latentes de condicionamento do XTTS (GPT + speaker embedding) são
+    # calculados uma vez por arquivo de speaker e guardados pelo hash do wav
+    import torch
+
+    h = hashlib.sha256(model_name.encode("utf-8"))
+    h.update(Path(speaker_wav).read_bytes())
+    path = Path(cache_dir) / f"{h.hexdigest()}.pt"
+
+    if path.exists():
+        data = torch.load(path, map_location="cpu")
+        return data["gpt_cond_latent"], data["speaker_embedding"]
+
+    gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+        audio_path=[speaker_wav],
+        gpt_cond_len=model.config.gpt_cond_len,
+        max_ref_length=model.config.max_ref_len,
+        sound_norm_refs=model.config.sound_norm_refs,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    torch.save({
+        "gpt_cond_latent": gpt_cond_latent.cpu(),
+        "speaker_embedding": speaker_embedding.cpu(),
+    }, path)
+    return gpt_cond_latent, speaker_embedding
+
+
+class CoquiEngine:
+    def __init__(self, model_name, language, speaker_wav, device="cpu",
+                 batch_size=1, latents_dir="cache/xtts_latents"):
+        import torch
+        from TTS.api import TTS
+        from TTS.tts.configs.xtts_config import XttsConfig
+
+        # segurança PyTorch 2.6+ (torch.load com weights_only)
+        if hasattr(torch.serialization, "add_safe_globals"):
+            torch.serialization.add_safe_globals([XttsConfig])
+
+        self.model_name = model_name
+        self.language = language
+        self.speaker_wav = speaker_wav
+        self.latents_dir = latents_dir
+        self.batch_size = max(1, batch_size)
+        # amostragem do GPT (False = greedy, determinístico; usado na conferência do lote)
+        self.do_sample = True
+        self.tts = TTS(model_name, progress_bar=False).to(device)
+
+        # XTTS: latentes do speaker calculados/carregados uma vez só
+        self.model = self.tts.synthesizer.tts_model
+        self.latents = None
+        if speaker_wav and hasattr(self.model, "get_conditioning_latents"):
+            self.latents = load_speaker_latents(self.model, model_name, speaker_wav, latents_dir)
+
+    def with_speaker(self, speaker_wav, language=None):
+        # outra voz sobre o mesmo modelo carregado (ModelPool): só os latentes
+        # do speaker e o idioma mudam
+        engine = copy.copy(self)
+        engine.speaker_wav = speaker_wav
+        engine.language = language or self.language
+        engine.latents = None
+        if speaker_wav and hasattr(self.model, "get_conditioning_latents"):
+            engine.latents = load_speaker_latents(self.model, self.model_name, speaker_wav, self.latents_dir)
+        return engine
+
+    @property
+    def sample_rate(self) -> int:
+        return self.tts.synthesizer.output_sample_rate
+
+    def synthesize_arrays(self, texts):
+        # um array float32 por texto, na ordem recebida
+        import numpy as np
+
+        if self.latents is None:
+            return [
+                np.asarray(self.tts.tts(text=t, speaker_wav=self.speaker_wav, language=self.language), dtype=np.float32)
+                for t in texts
+            ]
+
+        # agrupa textos de tamanho parecido para reduzir o padding de cada lote
+        out = [None] * len(texts)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            group = order[start:start + self.batch_size]
+            for i, wav in zip(group, self._xtts_batch([texts[i] for i in group])):
+                out[i] = wav
+        return out
+
+    def _xtts_batch(self, texts):
+        import torch
+
+        model = self.model
+        cfg = model.config
+        device = model.device
+        lang = self.language.split("-")[0]
+        gpt_cond_latent = self.latents[0].to(device)
+        speaker_embedding = self.latents[1].to(device)
+
+        tokens = [model.tokenizer.encode(t.strip().lower(), lang=lang) for t in texts]
+        width = max(len(t) for t in tokens)
+        pad = model.gpt.stop_text_token
+        text_inputs = torch.IntTensor([t + [pad] * (width - len(t)) for t in tokens]).to(device)
+
+        # prefixo do GPT: latentes | start_text | texto | stop_text | padding | start_audio.
+        # O padding fica fora da atenção, então cada item vê exatamente o
+        # prefixo que teria sozinho (o GPT do XTTS não usa posição absoluta;
+        # a posição dos tokens de áudio é relativa ao fim do prefixo)
+        cond_len = gpt_cond_latent.shape[1]
+        attention_mask = torch.ones(len(texts), cond_len + width + 3, dtype=torch.long, device=device)
+        for row, toks in enumerate(tokens):
+            first_pad = cond_len + 1 + len(toks) + 1
+            attention_mask[row, first_pad:first_pad + width - len(toks)] = 0
+
+        wavs = []
+        with torch.no_grad():
+            # geração GPT do lote inteiro numa única chamada
+            codes = model.gpt.generate(
+                cond_latents=gpt_cond_latent.expand(len(texts), -1, -1),
+                text_inputs=text_inputs,
+                input_tokens=None,
+                attention_mask=attention_mask,
+                do_sample=self.do_sample,
+                top_p=cfg.top_p,
+                top_k=cfg.top_k,
+                temperature=cfg.temperature,
+                num_return_sequences=1,
+                num_beams=1,
+                length_penalty=cfg.length_penalty,
+                repetition_penalty=cfg.repetition_penalty,
+                output_attentions=False,
+            )
+
+            for row, toks in zip(codes, tokens):
+                # corta o padding de áudio de cada item no primeiro token de parada
+                stop = (row == model.gpt.stop_audio_token).nonzero()
+                if len(stop):
+                    row = row[:stop[0, 0]]
+                row = row.unsqueeze(0)
+
+                text_tokens = torch.IntTensor(toks).unsqueeze(0).to(device)
+                latents = model.gpt(
+                    text_tokens,
+                    torch.tensor([text_tokens.shape[-1]], device=device),
+                    row,
+                    torch.tensor([row.shape[-1] * model.gpt.code_stride_len], device=device),
+                    cond_latents=gpt_cond_latent,
+                    return_attentions=False,
+                    return_latent=True,
+                )
+                wav = model.hifigan_decoder(latents, g=speaker_embedding)
+                wavs.append(wav.cpu().squeeze().numpy())
+
+        return wavs
+
+    def synthesize_batch(self, texts):
+        return [to_pcm16(wav) for wav in self.synthesize_arrays(texts)]
+
+    def synthesize(self, text):
+        yield self.synthesize_batch([text])[0]
+
+    def synthesize_wav(self, text, output):
+        import wave
+
+        pcm = self.synthesize_batch([text])[0]
+        with wave.open(str(output), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm)
+
+
+class NullEngine:
+    # backend de teste/benchmark: sem modelo, gera um tom com ruído
+    # determinístico (mesmo texto -> mesmo áudio) com duração proporcional
+    # ao texto, ~15 caracteres por segundo de fala
+    batch_size = 1
+
+    def __init__(self, sample_rate=22050, chars_per_second=15.0):
+        self._sample_rate = sample_rate
+        self.chars_per_second = chars_per_second
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    def _render(self, text):
+        import zlib
+
+        import numpy as np
+
+        seed = zlib.crc32(text.encode("utf-8"))
+        n = int(len(text) / self.chars_per_second * self._sample_rate)
+        t = np.arange(n, dtype=np.float32) / self._sample_rate
+        rng = np.random.default_rng(seed)
+        wav = 0.3 * np.sin(2 * np.pi * (110 + seed % 200) * t)
+        wav += 0.02 * rng.standard_normal(n).astype(np.float32)
+        return to_pcm16(wav)
+
+    def synthesize_batch(self, texts):
+        return [self._render(text) for text in texts]
+
+    def synthesize(self, text):
+        yield self._render(text)
+
+    def synthesize_wav(self, text, output):
+        import wave
+
+        with wave.open(str(output), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self._render(text))
+
+
+# ==========================
+# REGISTRO DE BACKENDS
+# ==========================
+# nome -> load(options) (importa a biblioteca do backend só aqui dentro),
+# identity(options) (tudo que altera o áudio, para a chave do cache) e
+# batch_size(options). Um backend novo só precisa de register_backend();
+# o pipeline, o pool de workers e o benchmark usam o registro.
+
+BACKENDS = {}
+
+
+def register_backend(name, load, identity, batch_size=None, help="", internal=False):
+    # internal=True: montado pelo próprio pipeline (ex.: "voices"), fora do --backend
+    BACKENDS[name] = {
+        "load": load,
+        "identity": identity,
+        "batch_size": batch_size or (lambda options: 1),
+        "help": help,
+        "internal": internal,
+    }
+
+
+def backend_choices():
+    # backends que podem ser escolhidos com --backend
+    return sorted(name for name, b in BACKENDS.items() if not b["internal"])
+
+
+def _backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Backend desconhecido: {name}") from None
+
+
+def make_engine(backend: str, options: dict):
+    return _backend(backend)["load"](options)
+
+
+def engine_identity(backend: str, options: dict) -> dict:
+    # tudo que altera o áudio gerado entra na chave do cache de síntese
+    return _backend(backend)["identity"](options)
+
+
+def backend_batch_size(backend: str, options: dict) -> int:
+    return _backend(backend)["batch_size"](options)
+
+
+def _file_signature(path):
+    # tamanho + mtime: detecta troca do arquivo sem precisar ler o conteúdo
+    try:
+        st = os.stat(path)
+        return [str(path), st.st_size, int(st.st_mtime)]
+    except OSError:
+        return [str(path), None, None]
+
+
+# --------------------------
+# piper
+# --------------------------
+def _load_piper(options):
+    from Piper_Voicer.piper_voicer import PiperEngine
+    from synth_cache import PhonemeCache
+
+    phoneme_db = options.get("phoneme_cache_db")
+    return PiperEngine(
+        options["piper_model"],
+        volume=options["piper_volume"],
+        speed=options["piper_speed"],
+        noise_scale=options["piper_noise_scale"],
+        noise_w_scale=options["piper_noise_w_scale"],
+        phoneme_cache=PhonemeCache(phoneme_db) if phoneme_db else None,
+        # sessão onnxruntime: não altera o áudio, fica fora da identidade
+        intra_threads=options.get("piper_intra_threads", 0),
+        inter_threads=options.get("piper_inter_threads", 0),
+        graph_opt=options.get("piper_graph_opt", "all"),
+        optimized_dir=options.get("piper_optimized_dir") or None,
+    )
+
+
+def _piper_identity(options):
+    return {
+        "backend": "piper",
+        "model": _file_signature(options["piper_model"]),
+        "volume": options["piper_volume"],
+        "length_scale": options["piper_speed"],
+        "noise_scale": options["piper_noise_scale"],
+        "noise_w_scale": options["piper_noise_w_scale"],
+    }
+
+
+register_backend("piper", _load_piper, _piper_identity, help="Piper (onnxruntime), rápido")
+
+
+# --------------------------
+# coqui
+# --------------------------
+def _load_coqui(options):
+    return CoquiEngine(
+        options["model_name"],
+        options["language"],
+        options["speaker_wav"],
+        device=options.get("device", "cpu"),
+        batch_size=options.get("coqui_batch_size", 1),
+        latents_dir=options.get("coqui_latents_dir", "cache/xtts_latents"),
+    )
+
+
+def _coqui_identity(options):
+    return {
+        "backend": "coqui",
+        "model": options["model_name"],
+        "language": options["language"],
+        "speaker_wav": _file_signature(options["speaker_wav"]) if options["speaker_wav"] else None,
+    }
+
+
+register_backend(
+    "coqui", _load_coqui, _coqui_identity,
+    batch_size=lambda options: options.get("coqui_batch_size", 1),
+    help="Coqui TTS / XTTS (torch), clonagem de voz",
+)
+
+
+# --------------------------
+# voices (várias vozes de um backend, ver voices.py)
+# --------------------------
+def _voice_backend(options):
+    # opções montadas por VoiceMap.engine_options (pipeline.apply_voices)
+    if "voice_backend" not in options:
+        raise ValueError("o backend voices não é escolhido direto: use --backend <backend> --voices vozes.json")
+    return options["voice_backend"]
+
+
+def _load_voices(options):
+    from voices import VoiceEngine
+
+    return VoiceEngine(_voice_backend(options), options, options["voices"])
+
+
+register_backend(
+    "voices", _load_voices,
+    # identidade da voz padrão: as outras vozes vão na marca de cada texto
+    lambda options: engine_identity(_voice_backend(options), options),
+    batch_size=lambda options: backend_batch_size(_voice_backend(options), options),
+    help="várias vozes do mesmo backend (--voices)",
+    internal=True,
+)
+
+
+# --------------------------
+# null (teste/benchmark)
+# --------------------------
+register_backend(
+    "null", lambda options: NullEngine(), lambda options: {"backend": "null"},
+    help="tom de teste, sem modelo",
+)
+
+
+def _check_xtts_batch(model_name, language, speaker_wav, batch_size):
+    # com GPT greedy, o lote tem que gerar os mesmos códigos que cada texto sozinho
+    texts = ["Sim.", "Ela abriu a janela e olhou para a rua vazia.",
+             "Depois de muito tempo, o reino voltou a dormir em paz, sem medo do escuro."]
+    engine = CoquiEngine(model_name, language, speaker_wav, batch_size=batch_size)
+    engine.do_sample = False
+    batched = engine.synthesize_arrays(texts)
+    engine.batch_size = 1
+    single = engine.synthesize_arrays(texts)
+    for text, a, b in zip(texts, batched, single):
+        same = len(a) == len(b) and float(abs(a - b).max(initial=0.0)) < 1e-3
+        print(f"{'✔' if same else '✘'} {len(a)} / {len(b)} amostras: {text[:40]!r}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Confere o lote do XTTS contra a síntese texto a texto")
+    parser.add_argument("--model-name", default="tts_models/multilingual/multi-dataset/xtts_v2")
+    parser.add_argument("--language", default="pt")
+    parser.add_argument("--speaker-wav", required=True)
+    parser.add_argument("--batch-size", type=int, default=3)
+    args = parser.parse_args()
+    _check_xtts_batch(args.model_name, args.language, args.speaker_wav, args.batch_size)
@@ -0,0 +1,80 @@
+import mmap
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from chapters import MIN_CHAPTER_CHARS, normalize_chapter_text, plan_chapters
+
+# ==========================
+# INGESTÃO (arquivo mapeado em memória)
+# ==========================
+# O livro nunca é lido inteiro para uma string: o arquivo é mapeado (mmap),
+# os títulos são detectados linha a linha guardando só offsets em bytes, e
+# cada capítulo é uma visão [start, end) que só decodifica o próprio texto
+# quando o chunker pede. O pico de memória fica limitado ao maior capítulo,
+# não ao tamanho do livro. Obs.: com offsets em bytes, o tamanho mínimo de
+# capítulo (MIN_CHAPTER_CHARS) é medido em bytes UTF-8.
+
+
+class ChapterView:
+    def __init__(self, book, index, title, confidence, start, end):
+        self.book = book
+        self.index = index
+        self.title = title
+        self.confidence = confidence
+        self.start = start
+        self.end = end
+
+    @property
+    def size(self) -> int:
+        return self.end - self.start
+
+    def text(self) -> str:
+        # decodifica só este capítulo; a string é descartada pelo chamador
+        raw = self.book.buffer[self.start:self.end]
+        return normalize_chapter_text(raw.decode("utf-8", errors="replace"))
+
+    def __repr__(self):
+        return f"ChapterView({self.index}, {self.title!r}, {self.start}:{self.end})"
+
+
+class Book:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        try:
+            self.buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # arquivo vazio não pode ser mapeado
+            self.buffer = b""
+
+    def iter_records(self) -> Iterator[Tuple[int, int, str]]:
+        # (início, fim, linha) com offsets em bytes; só uma linha decodificada por vez
+        buf = self.buffer
+        n = len(buf)
+        pos = 0
+        if buf[:3] == b"\xef\xbb\xbf":
+            pos = 3
+        while pos < n:
+            nl = buf.find(b"\n", pos)
+            end = n if nl < 0 else nl + 1
+            line = buf[pos:end].decode("utf-8", errors="replace").rstrip("\r\n")
+            yield pos, end, line
+            pos = end
+
+    def chapters(self, min_chars: int = MIN_CHAPTER_CHARS) -> List[ChapterView]:
+        return [
+            ChapterView(self, ch["index"], ch["title"], ch["confidence"], ch["start"], ch["end"])
+            for ch in plan_chapters(self.iter_records(), min_chars)
+        ]
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
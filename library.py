@@ -0,0 +1,323 @@
+import argparse
+import contextlib
+import json
+import re
+from pathlib import Path
+
+import metrics
+import pipeline
+from config import (
+    CACHE_DB,
+    CACHE_MAX_MB,
+    CHUNK_SIZE,
+    DEFAULT_BACKEND,
+    DEFAULT_LANGUAGE,
+    DEFAULT_MODEL_NAME,
+    DEFAULT_SPEAKER_WAV,
+    ENCODE_QUEUE,
+    ENCODE_WORKERS,
+    MANIFEST_FILE,
+    METRICS_FILE,
+    OUTPUT_DIR,
+    PIPER_MODEL,
+    PREP_AHEAD,
+    TRACE_FILE,
+    VOICE_MAP_FILE,
+)
+from dedup import DedupPlan, format_report
+from engines import backend_batch_size, backend_choices, engine_identity
+from ingest import Book
+from manifest import JobManifest, format_progress
+from stages import EncodeStage, prefetch
+from synth_cache import SynthesisCache
+
+# ==========================
+# MODO BIBLIOTECA (vários livros, um processo)
+# ==========================
+# Recebe um diretório com livros (*.txt) ou um arquivo com a lista deles e
+# converte todos num único processo: os modelos são carregados uma vez (no
+# próprio processo ou no pool de --workers) e os capítulos de todos os
+# livros disputam o mesmo pool. Cada livro tem a sua árvore de saída
+# (<output-root>/<nome>/NN_titulo/chapter.mp3) e o seu manifesto; o cache
+# de síntese é um só (frase repetida entre livros é sintetizada uma vez).
+#
+# Escalonamento:
+#   fair      um capítulo de cada livro por rodada (round-robin): todos os
+#             livros avançam juntos e os curtos terminam cedo
+#   priority  livros de maior prioridade primeiro; empates em round-robin
+#
+# Lista de livros: JSON ([{"path": ..., "name": ..., "priority": 2}, ...] ou
+# só caminhos) ou texto, uma linha "caminho [prioridade]" por livro (# comenta).
+# Caminhos relativos são resolvidos a partir do arquivo da lista.
+#
+#   python library.py livros/ --workers 4
+#   python library.py noite.json --schedule priority --output-root output/biblioteca
+
+SCHEDULES = ("fair", "priority")
+
+
+class LibraryBook:
+    def __init__(self, name, path, output_dir, priority=0):
+        self.name = name
+        self.path = Path(path)
+        self.output_dir = Path(output_dir)
+        self.priority = priority
+        self.manifest = None
+        self.plan = None
+
+    def __repr__(self):
+        return f"LibraryBook({self.name!r}, priority={self.priority})"
+
+
+def _entries(source: Path):
+    # (caminho, nome ou None, prioridade)
+    if source.is_dir():
+        return [(p, None, 0) for p in sorted(source.glob("*.txt"))]
+
+    text = source.read_text(encoding="utf-8")
+    if source.suffix == ".json":
+        entries = []
+        for item in json.loads(text):
+            if isinstance(item, str):
+                item = {"path": item}
+            entries.append((source.parent / item["path"], item.get("name"), int(item.get("priority", 0))))
+        return entries
+
+    entries = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        path, _, priority = line.rpartition(" ")
+        if not path or not re.fullmatch(r"-?\d+", priority):
+            path, priority = line, "0"
+        entries.append((source.parent / path.strip(), None, int(priority)))
+    return entries
+
+
+def discover_books(source, output_root) -> list:
+    source = Path(source)
+    books = []
+    names = set()
+    for path, name, priority in _entries(source):
+        if not path.exists():
+            print(f"WARN: livro não encontrado, ignorado: {path}")
+            continue
+        base = re.sub(r"[^\w]+", "_", name or path.stem).strip("_")[:60] or "livro"
+        # nomes repetidos (mesmo arquivo em pastas diferentes) ganham sufixo
+        name, n = base, 2
+        while name in names:
+            name, n = f"{base}_{n}", n + 1
+        names.add(name)
+        books.append(LibraryBook(name, path, Path(output_root) / name, priority))
+    return books
+
+
+def schedule(books, policy="fair"):
+    # intercala os planos (geradores de capítulos) dos livros; preguiçoso:
+    # cada capítulo só é preparado quando chega a vez dele
+    if policy == "priority":
+        levels = sorted({book.priority for book in books}, reverse=True)
+        groups = [[book for book in books if book.priority == level] for level in levels]
+    else:
+        groups = [list(books)]
+
+    for group in groups:
+        active = list(group)
+        while active:
+            for book in list(active):
+                item = next(book.plan, None)
+                if item is None:
+                    active.remove(book)
+                    continue
+                yield book, item
+
+
+class LibraryPending:
+    # junta os PendingChunks de cada livro numa fila só para o pool; ids
+    # das tarefas ganham o número do livro na frente. Chunk repetido entre
+    # livros vira uma tarefa só (a do primeiro livro na ordem do
+    # escalonamento) e o resultado vai para todos os livros que o usam
+    def __init__(self, scheduled, cache, encode_stage):
+        by_book = {}
+        for book, item in scheduled:
+            by_book.setdefault(book, []).append(item)
+
+        self.pendings = {}
+        chapter_tasks = {}
+        for b, (book, items) in enumerate(by_book.items()):
+            pending = pipeline.PendingChunks(items, cache, book.manifest, encode_stage)
+            self.pendings[b] = pending
+            for task_id, text, key in pending.tasks:
+                chapter_tasks.setdefault((book, task_id[0]), []).append(((b, task_id), text, key))
+
+        # ordem do escalonamento, capítulo a capítulo
+        self.tasks = []
+        self.owners = {}     # chave -> ids (livro, tarefa) de todos os livros com o chunk
+        for book, (idx, _, _, _) in scheduled:
+            for task in chapter_tasks.get((book, idx), ()):
+                owners = self.owners.setdefault(task[2], [])
+                if not owners:
+                    self.tasks.append(task)
+                owners.append(task[0])
+        self.by_id = {task[0]: task for task in self.tasks}
+
+    def start(self):
+        for pending in self.pendings.values():
+            pending.start()
+
+    def failure(self, task_id, error, final):
+        for b, inner in self.owners[self.by_id[task_id][2]]:
+            self.pendings[b].failure(inner, error, final)
+
+    def success(self, task_id, duration, audio_seconds):
+        # o tempo de síntese conta uma vez; nos outros livros o chunk veio do cache
+        for owner in self.owners[self.by_id[task_id][2]]:
+            b, inner = owner
+            if owner == task_id:
+                self.pendings[b].success(inner, duration, audio_seconds)
+            else:
+                self.pendings[b].success(inner, None, None)
+
+
+def print_status(books):
+    for book in books:
+        path = book.output_dir / MANIFEST_FILE
+        print(f"== {book.name} ({book.path})")
+        if not path.exists():
+            print("Ainda não iniciado")
+            continue
+        manifest = JobManifest(path)
+        print(format_progress(manifest.progress()))
+        manifest.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converte vários livros num único processo, com um pool de modelos compartilhado")
+    parser.add_argument("source", help="Directory with *.txt books, or a JSON/text file listing them (path [priority] per line)")
+    parser.add_argument("--output-root", default=OUTPUT_DIR, help="Each book is written to OUTPUT_ROOT/<book name>")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="fair", help="fair = one chapter of each book per round; priority = higher priority books first")
+    parser.add_argument("--backend", choices=backend_choices(), default=DEFAULT_BACKEND, help="TTS backend to use")
+    parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Coqui TTS model name (used only when --backend coqui)")
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE, help="Language for Coqui TTS")
+    parser.add_argument("--speaker-wav", default=DEFAULT_SPEAKER_WAV, help="Path to speaker wav for Coqui TTS (optional)")
+    parser.add_argument("--piper-model", default=PIPER_MODEL, help="Path to Piper .onnx model (used only when --backend piper)")
+    parser.add_argument("--voices", default=VOICE_MAP_FILE, help="JSON voice map applied to every book (see voices.py)")
+    parser.add_argument("--chunk-size", default=str(CHUNK_SIZE), help="Chunk length in chars, or 'auto' (see pipeline.py)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of synthesis processes shared by all books")
+    parser.add_argument("--cache-db", default=CACHE_DB, help="SQLite file used as the per-chunk synthesis cache")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_MB, help="Cache size limit in MB")
+    parser.add_argument("--status", action="store_true", help="Print progress of every book and exit")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Write one JSON line per span to this file")
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="Write Prometheus text-format metrics to this file")
+    args = parser.parse_args(argv)
+
+    books = discover_books(args.source, args.output_root)
+    if not books:
+        print(f"ERRO: nenhum livro encontrado em {args.source}")
+        return
+    print(f"INFO: {len(books)} livro(s): " + ", ".join(book.name for book in books))
+    if args.status:
+        print_status(books)
+        return
+
+    metrics.configure(args.trace, args.metrics_file)
+    cache = None
+    try:
+        try:
+            voice_map, backend, options = pipeline.apply_voices(args.voices, args.backend, pipeline.engine_options(args))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERRO: mapa de vozes inválido ({args.voices}): {e}")
+            return
+        identity = engine_identity(backend, options)
+        cache = SynthesisCache(args.cache_db, args.cache_max_mb * 1024 * 1024)
+
+        engine = None
+        if args.workers <= 1:
+            print("INFO: Carregando modelo TTS (pode demorar)...")
+            try:
+                from engines import make_engine
+                with metrics.span("model_load", backend=backend):
+                    engine = make_engine(backend, options)
+            except Exception as e:
+                print(f"ERRO: falha ao inicializar backend {backend}: {e}")
+                return
+
+        with contextlib.ExitStack() as stack:
+            chunk_size = None
+            for book in books:
+                opened = stack.enter_context(Book(book.path))
+                with metrics.span("chapter_detection", book=book.name, bytes=len(opened.buffer)) as span:
+                    chapters = opened.chapters()
+                    span.set(chapters=len(chapters))
+                print(f"INFO: [{book.name}] {len(chapters)} capítulos detectados")
+
+                if chunk_size is None:
+                    # um tamanho de chunk para a biblioteca (mesma voz em todos os livros)
+                    try:
+                        chunk_size = pipeline.resolve_chunk_size(args.chunk_size, backend, options, identity,
+                                                                 engine, chapters)
+                    except Exception as e:
+                        print(f"ERRO: falha ao definir o tamanho de chunk: {e}")
+                        return
+
+                book.output_dir.mkdir(parents=True, exist_ok=True)
+                book.manifest = JobManifest(book.output_dir / MANIFEST_FILE)
+                stack.callback(book.manifest.close)
+                book.plan = pipeline.iter_plan(chapters, identity, book.manifest, chunk_size, book.output_dir, voice_map)
+
+            # repetições contadas na biblioteca inteira: o cache é compartilhado e
+        # LibraryPending manda cada chunk repetido entre livros uma vez ao pool
+            dedup = DedupPlan()
+
+            def counted(scheduled):
+                for book, item in scheduled:
+                    dedup.add(item[3])
+                    yield book, item
+
+            with EncodeStage(ENCODE_WORKERS, ENCODE_QUEUE) as encode_stage:
+                scheduled = counted(schedule(books, args.schedule))
+                if args.workers > 1:
+                    scheduled = list(scheduled)
+                    pending = LibraryPending(scheduled, cache, encode_stage)
+                    print(f"INFO: {len(pending.tasks)} chunks pendentes de {len(books)} livro(s) em {args.workers} workers")
+                    pending.start()
+                    if pending.tasks:
+                        from synth_pool import SynthesisPool
+
+                        try:
+                            pool = SynthesisPool(backend, options, args.workers, cache.path, cache.max_bytes,
+                                                 backend_batch_size(backend, options), trace=metrics.settings())
+                        except RuntimeError as e:
+                            print(f"ERRO: {e}")
+                            pipeline.fail_tasks(pending, [task_id for task_id, _, _ in pending.tasks], str(e))
+                        else:
+                            with pool:
+                                pipeline.run_pool(pool, pending.tasks, pending)
+                else:
+                    for book, (idx, title, chapter_dir, jobs) in prefetch(scheduled, PREP_AHEAD):
+                        print(f"INFO: [{book.name}] capítulo {idx}")
+                        pipeline.synthesize_chapter(engine, idx, chapter_dir, jobs, cache, book.manifest, encode_stage)
+                        cache.evict()
+
+            synthesis_seconds = synthesis_chars = 0
+            for book in books:
+                progress = book.manifest.progress()
+                synthesis_seconds += progress["synthesis_seconds"]
+                synthesis_chars += progress["synthesis_chars"]
+                print(f"== {book.name}")
+                print(format_progress(progress))
+            if dedup.chunks:
+                print(format_report(dedup.summary(), synthesis_seconds / synthesis_chars if synthesis_chars else None))
+
+        cache.evict()
+        print("✅ BIBLIOTECA FINALIZADA")
+    finally:
+        # todos os caminhos de saída (inclusive os de erro) fecham o que abriram
+        if cache is not None:
+            cache.close()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    main()
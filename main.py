@@ -5,19 +5,13 @@
 import os
 os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"  # 🔥 ESSENCIAL no Mac
 
-import re
-import glob
 import time
 import logging
-import subprocess
-import numpy as np
 import soundfile as sf
-import torch
-from TTS.api import TTS
-from TTS.tts.configs.xtts_config import XttsConfig
 
-# segurança PyTorch 2.6+
-torch.serialization.add_safe_globals([XttsConfig])
+from assembly import ChapterWriter
+from chunking import chunk_text
+from engines import CoquiEngine, to_pcm16
 
 # =========================
 # CONFIG
@@ -33,9 +27,9 @@ LANGUAGE = "pt"
 
 MAX_CHARS = 800
 MIN_CHARS = 50
+BATCH_SIZE = 4
 SLEEP = 0.05
 
-FINAL_WAV = f"{OUT_DIR}/audiobook.wav"
 FINAL_MP3 = f"{OUT_DIR}/audiobook_1.25x.mp3"
 MP3_SPEED = 1.25
 MP3_BITRATE = "96k"
@@ -50,75 +44,34 @@ log = logging.getLogger("XTTS")
 # UTILS
 # =========================
 def split_text(text, max_chars, min_chars):
-    parts = [p.strip() for p in re.split(r"[.,]", text) if p.strip()]
-    chunks, current = [], ""
+    # mesma lógica de chunking do pipeline.py, só juntando peças curtas
+    return chunk_text(text, max_chars, hard_limit=None, min_size=min_chars, separators=".,")
 
-    for p in parts:
-        if not current:
-            current = p
-            continue
 
-        if len(current) < min_chars or len(p) < min_chars:
-            if len(current) + len(p) <= max_chars:
-                current += " " + p
-            else:
-                chunks.append(current)
-                current = p
-        else:
-            chunks.append(current)
-            current = p
+def chunk_path(i):
+    return f"{CHUNK_PREFIX}_{i}.wav"
 
-        if len(current) > max_chars:
-            chunks.append(current[:max_chars])
-            current = current[max_chars:]
 
-    if current:
-        chunks.append(current)
-
-    return chunks
-
-
-def merge_wavs(pattern, output):
-    files = sorted(
-        glob.glob(pattern),
-        key=lambda x: int(re.search(r"_(\d+)\.wav$", x).group(1))
-    )
-
-    if not files:
-        raise RuntimeError("Nenhum WAV encontrado para merge.")
-
-    data_all, sr = [], None
-    for f in files:
-        data, rate = sf.read(f)
-        sr = sr or rate
-        data_all.append(data)
-
-    combined = np.concatenate(data_all)
-    sf.write(output, combined, sr)
-    log.info(f"WAV final gerado: {output}")
-
-
-def wav_to_mp3_speed(wav, mp3, speed, bitrate):
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-i", wav,
-        "-filter:a", f"atempo={speed}",
-        "-b:a", bitrate,
-        mp3
-    ], check=True)
-
-    log.info(f"MP3 final ({speed}x) gerado: {mp3}")
+def read_chunk(path):
+    # (pcm 16-bit mono, sample rate) de um chunk já gerado
+    data, rate = sf.read(path, dtype="int16")
+    if data.ndim > 1:
+        data = data.mean(axis=1).astype("int16")
+    return data.tobytes(), rate
 
 # =========================
 # MAIN
 # =========================
 def main():
+    import torch  # só aqui: importar o módulo não carrega torch
+
     os.makedirs(OUT_DIR, exist_ok=True)
 
     device = "mps" if torch.backends.mps.is_available() else "cpu"
     log.info(f"Device: {device}")
 
-    tts = TTS(MODEL_NAME, progress_bar=False).to(device)
+    # latentes do speaker calculados uma vez (cache em disco por hash do wav)
+    engine = CoquiEngine(MODEL_NAME, LANGUAGE, SPEAKER_WAV, device=device, batch_size=BATCH_SIZE)
 
     with open(INPUT_TXT, "r", encoding="utf-8") as f:
         text = f.read().strip()
@@ -126,22 +79,31 @@ def main():
     chunks = split_text(text, MAX_CHARS, MIN_CHARS)
     log.info(f"Texto dividido em {len(chunks)} chunks")
 
-    for i, chunk in enumerate(chunks, 1):
-        out = f"{CHUNK_PREFIX}_{i}.wav"
-        if os.path.exists(out):
-            continue
-
-        log.info(f"Gerando chunk {i}/{len(chunks)} ({len(chunk)} chars)")
-        tts.tts_to_file(
-            text=chunk,
-            speaker_wav=SPEAKER_WAV,
-            language=LANGUAGE,
-            file_path=out
-        )
-        time.sleep(SLEEP)
-
-    merge_wavs(f"{CHUNK_PREFIX}_*.wav", FINAL_WAV)
-    wav_to_mp3_speed(FINAL_WAV, FINAL_MP3, MP3_SPEED, MP3_BITRATE)
+    # uma passada só: cada lote é sintetizado (ou lido, se já existe de uma
+    # execução anterior) e vai em ordem direto para o encoder; velocidade
+    # (WSOLA, sem mudar o tom) e reamostragem em blocos no próprio processo,
+    # sem WAV do livro inteiro. Os WAVs por chunk ficam só para a retomada.
+    chunks = list(enumerate(chunks, 1))
+    with ChapterWriter(FINAL_MP3, engine.sample_rate, speed=MP3_SPEED, bitrate=MP3_BITRATE) as writer:
+        for start in range(0, len(chunks), BATCH_SIZE):
+            batch = chunks[start:start + BATCH_SIZE]
+            todo = [(i, chunk) for i, chunk in batch if not os.path.exists(chunk_path(i))]
+
+            fresh = {}
+            if todo:
+                chars = sum(len(chunk) for _, chunk in todo)
+                log.info(f"Gerando chunks {todo[0][0]}-{todo[-1][0]}/{len(chunks)} ({chars} chars)")
+                wavs = engine.synthesize_arrays([chunk for _, chunk in todo])
+                for (i, _), wav in zip(todo, wavs):
+                    sf.write(chunk_path(i), wav, engine.sample_rate, subtype="PCM_16")
+                    fresh[i] = (to_pcm16(wav), engine.sample_rate)
+                time.sleep(SLEEP)
+
+            for i, _ in batch:
+                pcm, rate = fresh[i] if i in fresh else read_chunk(chunk_path(i))
+                writer.write_chunk(pcm, rate)
+
+    log.info(f"MP3 final ({MP3_SPEED}x) gerado: {FINAL_MP3}")
 
 
 if __name__ == "__main__":
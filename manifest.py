@@ -0,0 +1,214 @@
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+# ==========================
+# MANIFESTO DO JOB
+# ==========================
+# Um arquivo SQLite por livro (OUTPUT_DIR/manifest.sqlite) com cada capítulo
+# e cada chunk: hash do texto, status, tentativas, tempo de síntese, duração
+# do áudio e último erro. A retomada consulta o manifesto em vez de varrer
+# diretórios, e progresso/ETA saem de uma única consulta.
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class JobManifest:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # conexão compartilhada entre as threads do pipeline, serializada pelo lock
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chapters (
+                idx INTEGER PRIMARY KEY,
+                title TEXT NOT NULL,
+                dir TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                chunks INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                chapter INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                chars INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                duration REAL,
+                audio_seconds REAL,
+                error TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (chapter, position)
+            );
+        """)
+        self.db.commit()
+
+    # --------------------------
+    # capítulos
+    # --------------------------
+    def chapter_state(self, idx):
+        # (status, text_hash) ou None se o capítulo ainda não foi visto
+        with self.lock:
+            return self.db.execute(
+                "SELECT status, text_hash FROM chapters WHERE idx = ?", (idx,)
+            ).fetchone()
+
+    def sync_chapter(self, idx, title, chapter_dir, chapter_hash, jobs):
+        # registra o capítulo e seus chunks; se o texto mudou, zera o estado antigo
+        with self.lock:
+            state = self.chapter_state(idx)
+            now = time.time()
+            if state is None or state[1] != chapter_hash:
+                self.db.execute("DELETE FROM chunks WHERE chapter = ?", (idx,))
+                self.db.execute(
+                    "INSERT OR REPLACE INTO chapters (idx, title, dir, text_hash, status, chunks, error, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, NULL, ?)",
+                    (idx, title, str(chapter_dir), chapter_hash, PENDING, len(jobs), now)
+                )
+            else:
+                self.db.execute(
+                    "UPDATE chapters SET title = ?, dir = ?, chunks = ?, updated = ? WHERE idx = ?",
+                    (title, str(chapter_dir), len(jobs), now, idx)
+                )
+
+            # chunk cuja chave mudou (mesma posição, outro texto) volta a pendente
+            self.db.executemany(
+                "INSERT INTO chunks (chapter, position, text_hash, chars, status, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (chapter, position) DO UPDATE SET "
+                "text_hash = excluded.text_hash, chars = excluded.chars, status = excluded.status, "
+                "attempts = 0, duration = NULL, audio_seconds = NULL, error = NULL, updated = excluded.updated "
+                "WHERE chunks.text_hash != excluded.text_hash",
+                [(idx, i, key, len(text), PENDING, now) for i, text, key in jobs]
+            )
+            positions = [i for i, _, _ in jobs]
+            self.db.execute(
+                f"DELETE FROM chunks WHERE chapter = ? AND position NOT IN ({','.join('?' * len(positions))})",
+                (idx, *positions)
+            )
+            self.db.commit()
+
+    def mark_chapter(self, idx, status, error=None):
+        with self.lock:
+            self.db.execute(
+                "UPDATE chapters SET status = ?, error = ?, updated = ? WHERE idx = ?",
+                (status, error, time.time(), idx)
+            )
+            self.db.commit()
+
+    # --------------------------
+    # chunks
+    # --------------------------
+    def chunk_done(self, chapter, position, duration, audio_seconds):
+        with self.lock:
+            self.db.execute(
+                "UPDATE chunks SET status = ?, attempts = attempts + 1, duration = ?, audio_seconds = ?, "
+                "error = NULL, updated = ? WHERE chapter = ? AND position = ?",
+                (DONE, duration, audio_seconds, time.time(), chapter, position)
+            )
+            self.db.commit()
+
+    def chunk_cached(self, chapter, position):
+        # áudio já estava no cache de síntese: conta como feito, sem nova tentativa
+        with self.lock:
+            self.db.execute(
+                "UPDATE chunks SET status = ?, error = NULL, updated = ? "
+                "WHERE chapter = ? AND position = ? AND status != ?",
+                (DONE, time.time(), chapter, position, DONE)
+            )
+            self.db.commit()
+
+    def chunk_failed(self, chapter, position, error):
+        with self.lock:
+            self.db.execute(
+                "UPDATE chunks SET status = ?, attempts = attempts + 1, error = ?, updated = ? "
+                "WHERE chapter = ? AND position = ?",
+                (FAILED, str(error), time.time(), chapter, position)
+            )
+            self.db.commit()
+
+    # --------------------------
+    # progresso
+    # --------------------------
+    def progress(self) -> dict:
+        with self.lock:
+            chapters = dict(self.db.execute("SELECT status, COUNT(*) FROM chapters GROUP BY status").fetchall())
+            row = self.db.execute("""
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(status = 'done'), 0),
+                    COALESCE(SUM(status = 'failed'), 0),
+                    COALESCE(SUM(chars), 0),
+                    COALESCE(SUM(CASE WHEN status = 'done' THEN chars END), 0),
+                    COALESCE(SUM(duration), 0),
+                    COALESCE(SUM(CASE WHEN duration IS NOT NULL THEN chars END), 0),
+                    COALESCE(SUM(audio_seconds), 0)
+                FROM chunks
+            """).fetchone()
+            total, done, failed, chars, chars_done, synth_time, timed_chars, audio = row
+
+            # ETA: caracteres restantes x tempo médio de síntese por caractere
+            eta = None
+            if timed_chars:
+                eta = (chars - chars_done) * synth_time / timed_chars
+
+            return {
+                "chapters": sum(chapters.values()),
+                "chapters_done": chapters.get(DONE, 0),
+                "chunks": total,
+                "chunks_done": done,
+                "chunks_failed": failed,
+                "chars": chars,
+                "chars_done": chars_done,
+                "synthesis_seconds": synth_time,
+                "synthesis_chars": timed_chars,
+                "audio_seconds": audio,
+                "eta_seconds": eta,
+            }
+
+    def failed_chunks(self, limit=20):
+        with self.lock:
+            return self.db.execute(
+                "SELECT chapter, position, attempts, error FROM chunks WHERE status = ? "
+                "ORDER BY chapter, position LIMIT ?", (FAILED, limit)
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+def format_progress(p: dict) -> str:
+    pct = 100.0 * p["chars_done"] / p["chars"] if p["chars"] else 0.0
+    lines = [
+        f"Capítulos: {p['chapters_done']}/{p['chapters']} concluídos",
+        f"Chunks: {p['chunks_done']}/{p['chunks']} ({p['chunks_failed']} com falha)",
+        f"Texto: {p['chars_done']}/{p['chars']} chars ({pct:.1f}%)",
+        f"Áudio gerado: {p['audio_seconds'] / 60:.1f} min em {p['synthesis_seconds'] / 60:.1f} min de síntese",
+    ]
+    if p["eta_seconds"] is not None:
+        lines.append(f"ETA: {p['eta_seconds'] / 60:.1f} min")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python manifest.py [output/manifest.sqlite]
+    path = sys.argv[1] if len(sys.argv) > 1 else "output/manifest.sqlite"
+    manifest = JobManifest(path)
+    print(format_progress(manifest.progress()))
+    for chapter, position, attempts, error in manifest.failed_chunks():
+        print(f"  ✖ capítulo {chapter}, chunk {position + 1} ({attempts} tentativas): {error}")
+    manifest.close()
@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+
+# ==========================
+# TRACING E MÉTRICAS
+# ==========================
+# Spans nos pontos quentes do pipeline (carga do modelo, detecção de
+# capítulos, chunking, síntese de cada chunk, concat/pós-processamento,
+# encode). Cada span pode ir para:
+#   - um arquivo JSON lines (--trace), uma linha por span com duração e
+#     atributos (capítulo, chunk, chars, segundos de áudio, RTF, erro);
+#   - um arquivo de métricas no formato texto do Prometheus (--metrics-file),
+#     reescrito a cada poucos segundos (histograma de duração por span,
+#     totais de chars/áudio e contagem de erros);
+#   - a coleta em memória do benchmark.py (enable()/summary()).
+# Desligado (padrão), span() devolve um objeto vazio compartilhado e
+# event() retorna na primeira linha: custo de uma chamada de função.
+
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROM_INTERVAL = 5.0
+
+_enabled = False
+_stages = None        # nome -> durações (benchmark)
+_trace_path = None
+_trace_fd = None
+_prom_path = None
+_prom = {}            # nome -> [contagem por bucket, soma, total, chars, áudio, erros]
+_prom_written = 0.0
+_lock = threading.Lock()
+
+
+def _refresh():
+    global _enabled
+    _enabled = _stages is not None or _trace_fd is not None or _prom_path is not None
+
+
+def configure(trace_file=None, metrics_file=None):
+    global _trace_path, _trace_fd, _prom_path
+    close()
+    if trace_file:
+        # O_APPEND: linhas de processos diferentes (workers) não se misturam
+        _trace_path = str(trace_file)
+        _trace_fd = os.open(_trace_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    _prom_path = str(metrics_file) if metrics_file else None
+    _refresh()
+
+
+def settings() -> dict:
+    # repassado aos workers do pool (só o trace; as métricas ficam no principal)
+    return {"trace_file": _trace_path}
+
+
+def close():
+    global _trace_path, _trace_fd, _prom_path
+    if _prom_path is not None:
+        write_prometheus()
+    if _trace_fd is not None:
+        os.close(_trace_fd)
+    _trace_path = _trace_fd = _prom_path = None
+    _prom.clear()
+    _refresh()
+
+
+def enable():
+    global _stages
+    _stages = defaultdict(list)
+    _refresh()
+
+
+def disable():
+    global _stages
+    _stages = None
+    _refresh()
+
+
+# --------------------------
+# spans
+# --------------------------
+class Span:
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = str(exc) or exc_type.__name__
+        _finish(self.name, time.perf_counter() - self.start, self.attrs)
+        return False
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def event(name: str, seconds: float, **attrs):
+    # span já medido em outro lugar (ex.: duração devolvida por um worker)
+    if _enabled:
+        _finish(name, seconds, attrs)
+
+
+def _finish(name, seconds, attrs):
+    audio = attrs.get("audio_seconds")
+    if audio:
+        attrs["rtf"] = round(seconds / audio, 4)
+
+    if _stages is not None:
+        _stages[name].append(seconds)
+
+    if _trace_fd is not None:
+        line = json.dumps({
+            "ts": round(time.time(), 6),
+            "span": name,
+            "seconds": round(seconds, 6),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+            **attrs,
+        }, ensure_ascii=False, default=str)
+        os.write(_trace_fd, (line + "\n").encode("utf-8"))
+
+    if _prom_path is not None:
+        _observe(name, seconds, attrs)
+
+
+# --------------------------
+# Prometheus (formato texto)
+# --------------------------
+def _observe(name, seconds, attrs):
+    global _prom_written
+    with _lock:
+        m = _prom.get(name)
+        if m is None:
+            m = _prom[name] = [[0] * len(BUCKETS), 0.0, 0, 0, 0.0, 0]
+        for k, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                m[0][k] += 1
+        m[1] += seconds
+        m[2] += 1
+        m[3] += attrs.get("chars") or 0
+        m[4] += attrs.get("audio_seconds") or 0.0
+        m[5] += 1 if "error" in attrs else 0
+        due = time.monotonic() - _prom_written >= PROM_INTERVAL
+    if due:
+        write_prometheus()
+
+
+def format_prometheus() -> str:
+    with _lock:
+        items = sorted((name, [list(m[0]), *m[1:]]) for name, m in _prom.items())
+
+    lines = [
+        "# HELP audiobk_span_seconds Duração dos spans do pipeline.",
+        "# TYPE audiobk_span_seconds histogram",
+    ]
+    for name, (buckets, total, count, _, _, _) in items:
+        for bound, n in zip(BUCKETS, buckets):
+            lines.append(f'audiobk_span_seconds_bucket{{span="{name}",le="{bound}"}} {n}')
+        lines.append(f'audiobk_span_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+        lines.append(f'audiobk_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'audiobk_span_seconds_count{{span="{name}"}} {count}')
+
+    for metric, pos, help_text in (
+        ("audiobk_chars_total", 3, "Caracteres processados."),
+        ("audiobk_audio_seconds_total", 4, "Segundos de áudio gerados."),
+        ("audiobk_errors_total", 5, "Spans que terminaram com erro."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, m in items:
+            lines.append(f'{metric}{{span="{name}"}} {m[pos]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus():
+    # escrita atômica (tmp + rename), como espera o textfile collector
+    global _prom_written
+    path = _prom_path
+    if path is None:
+        return
+    _prom_written = time.monotonic()
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(format_prometheus())
+    os.replace(tmp, path)
+
+
+# --------------------------
+# resumo (benchmark)
+# --------------------------
+def percentile(values, q: float) -> float:
+    # nearest-rank sobre valores ordenados
+    if not values:
+        return 0.0
+    k = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[k]
+
+
+def summary() -> dict:
+    result = {}
+    for stage, values in sorted((_stages or {}).items()):
+        values = sorted(values)
+        result[stage] = {
+            "count": len(values),
+            "total": sum(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+        }
+    return result
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import metrics
+from autotune import load_profiles, profile_key, save_profile
+from chunking import iter_chunks
+from engines import make_engine
+from normalize import normalize_text
+
+# ==========================
+# POOL DE MODELOS (vozes carregadas + divisão dos núcleos)
+# ==========================
+# ModelPool mantém uma ou mais vozes carregadas no processo (cada uma carrega
+# o modelo uma vez só, na primeira vez que é pedida ou em warm()); os workers
+# do synth_pool usam um ModelPool cada. Vozes do Coqui que só mudam o
+# speaker_wav/idioma dividem o mesmo modelo (latentes próprios por voz).
+#
+# Com Piper, a vazão depende de como os núcleos são divididos: muitas
+# sessões onnxruntime de 1 thread (um processo cada, paralelismo entre
+# chunks) ou poucas sessões de várias threads (paralelismo dentro de cada
+# chunk, menos memória). tune_layout() mede chunks/s de cada divisão
+# (processos x threads = núcleos) com chunks do próprio livro e fica com a
+# que usa menos processos a até TOLERANCE da melhor. O perfil é guardado por
+# voz, núcleos e tamanho de chunk (POOL_PROFILE_FILE). Só o Piper é medido:
+# os outros backends não têm threads de sessão para dividir.
+#
+#   python pipeline.py --workers auto
+#   python model_pool.py                          # núcleos e perfis salvos
+#   python model_pool.py --tune --backend piper   # mede de novo com texto.txt
+
+TOLERANCE = 0.05
+MIN_SAMPLE_CHUNKS = 16
+
+
+def host_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def layouts(cores: int):
+    # (processos, threads por sessão) ocupando todos os núcleos, do maior
+    # número de processos para o menor
+    out = []
+    threads = 1
+    while threads <= cores:
+        out.append((cores // threads, threads))
+        threads *= 2
+    return out
+
+
+def with_threads(options: dict, workers: int, cores=None) -> dict:
+    # intra-op 0 com vários processos: divide os núcleos entre eles, em vez
+    # de cada sessão abrir uma thread por núcleo da máquina
+    if options.get("piper_intra_threads") or workers <= 1:
+        return options
+    return dict(options, piper_intra_threads=max(1, (cores or host_cores()) // workers))
+
+
+class ModelPool:
+    # voice=None é a voz das opções; as outras são opções que mudam em cima
+    # delas (ex.: {"narrador": {"piper_model": "vozes/a.onnx"}})
+    def __init__(self, backend, options, voices=None):
+        self.backend = backend
+        self.options = options
+        self.voices = dict(voices or {})
+        self.engines = {}
+        self.models = {}        # opções sem speaker_wav/idioma -> engine carregado
+
+    def options_for(self, voice=None) -> dict:
+        if voice is None:
+            return self.options
+        try:
+            return dict(self.options, **self.voices[voice])
+        except KeyError:
+            raise ValueError(f"voz desconhecida: {voice}") from None
+
+    def engine(self, voice=None):
+        engine = self.engines.get(voice)
+        if engine is None:
+            options = self.options_for(voice)
+            model_key = json.dumps({k: v for k, v in options.items() if k not in ("speaker_wav", "language")},
+                                   sort_keys=True, default=str)
+            loaded = self.models.get(model_key)
+            if loaded is not None and hasattr(loaded, "with_speaker"):
+                with metrics.span("speaker_load", backend=self.backend, voice=voice or "default"):
+                    engine = loaded.with_speaker(options.get("speaker_wav"), options.get("language"))
+            else:
+                with metrics.span("model_load", backend=self.backend, voice=voice or "default"):
+                    engine = make_engine(self.backend, options)
+                self.models.setdefault(model_key, engine)
+            self.engines[voice] = engine
+        return engine
+
+    def warm(self):
+        for voice in [None, *self.voices]:
+            self.engine(voice)
+        return self
+
+
+def sample_chunks(sample: str, chunk_size: int):
+    return [t for t in (normalize_text(c) for c in iter_chunks(sample, chunk_size, hard_limit=None)) if t]
+
+
+def measure_layout(backend, options, workers, threads, texts, batch_size=1) -> dict:
+    # cache temporário: nada da amostra vem pronto de outra medição
+    from synth_pool import SynthesisPool
+
+    opts = dict(options, piper_intra_threads=threads)
+    with tempfile.TemporaryDirectory() as tmp:
+        # warm=True: modelos carregados e primeira chamada feita em cada worker
+        with SynthesisPool(backend, opts, workers, os.path.join(tmp, "layout.sqlite"), 1 << 40, batch_size,
+                           warm=True) as pool:
+            tasks = [(i, text, f"sample-{i}") for i, text in enumerate(texts)]
+            t0 = time.perf_counter()
+            results = list(pool.run(tasks))
+            wall = time.perf_counter() - t0
+    errors = [error for _, error, _, _ in results if error]
+    if errors:
+        raise RuntimeError(f"falha medindo {workers}x{threads}: {errors[0]}")
+    audio = sum(seconds or 0.0 for _, _, _, seconds in results)
+    return {
+        "workers": workers,
+        "threads": threads,
+        "wall_seconds": round(wall, 4),
+        "chunks_per_second": round(len(texts) / wall, 3),
+        "audio_per_second": round(audio / wall, 3),
+    }
+
+
+def tune_layout(backend, options, texts, cores, identity, batch_size=1) -> dict:
+    if not texts:
+        raise ValueError("amostra sem texto para medir")
+    measurements = []
+    for workers, threads in layouts(cores):
+        print(f"INFO: medindo {workers} processo(s) x {threads} thread(s)...")
+        measurements.append(measure_layout(backend, options, workers, threads, texts, batch_size))
+
+    top = max(m["chunks_per_second"] for m in measurements)
+    # menos processos (menos memória, menos cargas de modelo) em caso de empate
+    chosen = next(m for m in reversed(measurements) if m["chunks_per_second"] >= top * (1 - TOLERANCE))
+    return {
+        "workers": chosen["workers"],
+        "threads": chosen["threads"],
+        "cores": cores,
+        "sample_chunks": len(texts),
+        "identity": identity,
+        "measured_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "measurements": measurements,
+    }
+
+
+def layout_key(identity, cores, chunk_size) -> dict:
+    return {"identity": identity, "cores": cores, "chunk_size": chunk_size}
+
+
+def resolve_layout(backend, options, identity, sample, chunk_size, profile_file, retune=False, batch_size=1):
+    # (processos, threads por sessão) do perfil salvo, medido agora se não existe
+    cores = host_cores()
+    key = layout_key(identity, cores, chunk_size)
+    profile = None if retune else load_profiles(profile_file).get(profile_key(key))
+    if profile is None:
+        texts = sample_chunks(sample, chunk_size)[:max(MIN_SAMPLE_CHUNKS, cores * 4)]
+        print(f"INFO: Medindo divisão dos {cores} núcleos entre processos e threads ({len(texts)} chunks)...")
+        with metrics.span("layout_tune", backend=backend, cores=cores, chunks=len(texts)):
+            profile = tune_layout(backend, options, texts, cores, identity, batch_size)
+        save_profile(profile_file, key, profile)
+        print(format_layout(profile))
+    print(f"INFO: Síntese (auto): {profile['workers']} processo(s) x {profile['threads']} thread(s)")
+    return profile["workers"], profile["threads"]
+
+
+def format_layout(profile: dict) -> str:
+    lines = [f"{profile['workers']} processo(s) x {profile['threads']} thread(s) em {profile['cores']} núcleos "
+             f"({profile['measured_at']})"]
+    for m in profile["measurements"]:
+        mark = "  ←" if (m["workers"], m["threads"]) == (profile["workers"], profile["threads"]) else ""
+        lines.append(f"  {m['workers']:>3} x {m['threads']:<3} {m['chunks_per_second']:>8.2f} chunks/s, "
+                     f"{m['audio_per_second']:>8.2f} s áudio/s{mark}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from config import (
+        AUTOTUNE_SAMPLE_CHARS,
+        INPUT_TXT,
+        PIPER_MODEL,
+        POOL_PROFILE_FILE,
+    )
+    from engines import backend_batch_size, engine_identity
+
+    parser = argparse.ArgumentParser(description="Mede a divisão de núcleos entre processos e threads onnxruntime")
+    parser.add_argument("--tune", action="store_true", help="Measure now (otherwise just list saved profiles)")
+    parser.add_argument("--backend", choices=["piper"], default="piper", help="TTS backend to measure (only piper has session threads to split)")
+    parser.add_argument("--piper-model", default=PIPER_MODEL, help="Path to Piper .onnx model")
+    parser.add_argument("--file", default=INPUT_TXT, help="Text used as the measurement sample")
+    parser.add_argument("--chunk-size", type=int, default=150, help="Chunk length in chars of the sample")
+    parser.add_argument("--profiles", default=POOL_PROFILE_FILE, help="Profile file")
+    args = parser.parse_args(argv)
+
+    print(f"INFO: {host_cores()} núcleos disponíveis; divisões: "
+          + ", ".join(f"{w}x{t}" for w, t in layouts(host_cores())))
+    if not args.tune:
+        for key, profile in load_profiles(args.profiles).items():
+            print(f"[{profile['identity'].get('backend')}] {key[:12]}")
+            print(format_layout(profile))
+        return
+
+    import pipeline
+
+    # só Piper: as opções do Coqui não entram na identidade nem no engine
+    args.model_name = args.language = args.speaker_wav = None
+    options = pipeline.engine_options(args)
+    with open(args.file, encoding="utf-8") as f:
+        sample = f.read(AUTOTUNE_SAMPLE_CHARS * 4)
+    resolve_layout(args.backend, options, engine_identity(args.backend, options), sample, args.chunk_size,
+                   args.profiles, retune=True, batch_size=backend_batch_size(args.backend, options))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import re
+from functools import lru_cache
+
+# ==========================
+# NORMALIZAÇÃO DE TEXTO (pt-BR)
+# ==========================
+# Etapa entre o chunking e a síntese: por sentença, expande abreviações,
+# números (cardinais, decimais, milhares, ordinais, %, R$), algarismos
+# romanos em contexto (capítulo IV, século XX, Pedro II) e limpa a
+# pontuação que o TTS lê mal. O ponto final continua virando vírgula (pausa
+# curta do Piper), como no tts_text original. O resultado é determinístico:
+# o pipeline guarda os chunks normalizados por capítulo e a chave do cache de
+# síntese vem do texto já normalizado. Mudou alguma regra? Suba VERSION.
+#
+#   python normalize.py "O Dr. Silva nasceu em 1984 e viveu no séc. XX."
+
+VERSION = 3
+
+_UNITS = [
+    "zero", "um", "dois", "três", "quatro", "cinco", "seis", "sete", "oito", "nove",
+    "dez", "onze", "doze", "treze", "catorze", "quinze", "dezesseis", "dezessete",
+    "dezoito", "dezenove",
+]
+_TENS = ["", "", "vinte", "trinta", "quarenta", "cinquenta", "sessenta", "setenta", "oitenta", "noventa"]
+_HUNDREDS = [
+    "", "cento", "duzentos", "trezentos", "quatrocentos", "quinhentos",
+    "seiscentos", "setecentos", "oitocentos", "novecentos",
+]
+_SCALES = [None, None, ("milhão", "milhões"), ("bilhão", "bilhões"), ("trilhão", "trilhões")]
+
+_ORD_UNITS = ["", "primeiro", "segundo", "terceiro", "quarto", "quinto", "sexto", "sétimo", "oitavo", "nono"]
+_ORD_TENS = [
+    "", "décimo", "vigésimo", "trigésimo", "quadragésimo", "quinquagésimo",
+    "sexagésimo", "septuagésimo", "octogésimo", "nonagésimo",
+]
+_ORD_HUNDREDS = [
+    "", "centésimo", "ducentésimo", "trecentésimo", "quadringentésimo", "quingentésimo",
+    "sexcentésimo", "septingentésimo", "octingentésimo", "noningentésimo",
+]
+
+# expandidas antes da troca de ponto por vírgula. Palavra + ponto numa
+# consulta de dicionário; as de várias partes ("p. ex.") em regex próprias.
+_ABBREVIATIONS = {
+    "Sr": "Senhor", "Sra": "Senhora", "Srta": "Senhorita",
+    "Dr": "Doutor", "Dra": "Doutora",
+    "Prof": "Professor", "Profa": "Professora",
+    "Exmo": "Excelentíssimo", "Exma": "Excelentíssima",
+    "Sto": "Santo", "Sta": "Santa", "Av": "Avenida",
+    "etc": "etcétera.",
+    "pág": "página", "págs": "páginas", "Pág": "Página", "Págs": "Páginas",
+    "cap": "capítulo", "caps": "capítulos", "Cap": "Capítulo", "Caps": "Capítulos",
+    "vol": "volume", "Vol": "Volume", "séc": "século", "Séc": "Século",
+}
+_ABBREVIATION = re.compile(r"\b([A-Za-zÀ-ÿ]{2,5})\.")
+_PHRASES = [(re.compile(p), r) for p, r in [
+    (r"\bV\. ?Exa\.", "Vossa Excelência"),
+    (r"\b[Pp]\. ?ex\.", "por exemplo"),
+    (r"\bi\. ?e\.", "isto é"),
+    (r"\ba\. ?C\.", "antes de Cristo"),
+    (r"\bd\. ?C\.", "depois de Cristo"),
+    (r"\b[Nn]\.? ?[º°]", "número"),
+]]
+_PHRASE_HINT = re.compile(r"\b\w\. ?\w|[º°]")
+_HAS_DIGIT = re.compile(r"\d")
+
+_UNITS_AFTER_NUMBER = {"km": "quilômetros", "kg": "quilos", "cm": "centímetros", "mm": "milímetros"}
+
+_ROMAN = r"M{0,3}(?:CM|CD|D?C{0,3})(?:XC|XL|L?X{0,3})(?:IX|IV|V?I{0,3})"
+_ROMAN_KEYWORDS = re.compile(
+    r"\b([Cc]apítulo|[Pp]arte|[Ll]ivro|[Ss]éculo|[Vv]olume|[Tt]omo|[Aa]to|[Cc]ena|[Ss]eção)\s+(" + _ROMAN + r")\b(?![\w'])"
+)
+# nomes próprios (Pedro II, Luís XIV, Maria I): ordinal até dez, no gênero
+# do nome, e cardinal depois.
+# Palavra funcional maiúscula (início de sentença) não é nome: "Mas I think"
+# e "E V de vitória" ficam como estão.
+_ROMAN_NAME = re.compile(r"\b([A-ZÀ-Ý][a-zà-ÿ]+)\s+([IVX]+)\b(?![\w'])")
+_NOT_NAMES = frozenset("""
+    A Ao Aos As Às À Agora Ainda Ali Antes Após Aqui Assim Até Cada Com Como Contra Contudo
+    Da Das De Depois Desde Do Dos E Ela Elas Ele Eles Em Entre Então Essa Esse Esta Este Eu
+    Isso Isto Já Lá Logo Mas Meu Minha Na Nas Nem No Nos Nossa Nosso Não Nós O Onde Os Ou
+    Para Pois Por Porém Pra Quando Que Se Sem Seu Sim Sobre Sua Só Também Toda Todo Tudo
+    Um Uma Umas Uns Você Vocês
+""".split())
+# rainhas/papisas: ordinal feminino ("Maria primeira"). Nome terminado em -a
+# é feminino, fora as exceções; os femininos sem -a vêm da lista
+_FEMININE_NAMES = frozenset("Isabel Elizabeth Leonor Beatriz Inês Ester Raquel Carmen Margarida".split())
+_MASCULINE_A = frozenset("Garcia Luca Nicola Batista Costa".split())
+# "IV. Texto..." no início de linha, como o detector de capítulos reconhece
+_ROMAN_HEADING = re.compile(r"^(" + _ROMAN + r")\.(?:\s|$)")
+
+_MONEY = re.compile(r"R\$\s?(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d{2}))?")
+_PERCENT = re.compile(r"(\d+(?:,\d+)?)\s?%")
+_ORDINAL = re.compile(r"\b(\d{1,3})\s?([ºª])")
+_TIME = re.compile(r"\b([01]?\d|2[0-3])h([0-5]\d)?\b")
+_UNIT = re.compile(r"\b(\d+(?:,\d+)?)\s?(km|kg|cm|mm)\b")
+_NUMBER = re.compile(r"\b(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?\b")
+
+_QUOTES = re.compile(r"[\"“”«»„]|(?<!\w)['‘’]|['‘’](?!\w)")
+_DASH = re.compile(r"\s*[—–]\s*|\s+-\s+")
+_ELLIPSIS = re.compile(r"\.{2,}|…")
+_BRACKETS = re.compile(r"\s*[()\[\]{}]\s*")
+_PAUSE = re.compile(r"\s*[;:]\s*")
+_SYMBOLS = re.compile(r"[*_#|~^<>=+/\\]+")
+_COMMAS = re.compile(r"\s*,(?:\s*,)*\s*")
+_SPACES = re.compile(r"\s+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+# --------------------------
+# números
+# --------------------------
+def _below_thousand(n: int) -> str:
+    if n == 100:
+        return "cem"
+    hundreds, rest = divmod(n, 100)
+    parts = []
+    if hundreds:
+        parts.append(_HUNDREDS[hundreds])
+    if rest:
+        if rest < 20:
+            parts.append(_UNITS[rest])
+        else:
+            tens, units = divmod(rest, 10)
+            parts.append(_TENS[tens] + (f" e {_UNITS[units]}" if units else ""))
+    return " e ".join(parts)
+
+
+def number_words(n: int) -> str:
+    if n < 0:
+        return "menos " + number_words(-n)
+    if n < 20:
+        return _UNITS[n]
+    if n >= 1000 ** len(_SCALES):
+        return " ".join(_UNITS[int(d)] for d in str(n))
+
+    groups = []
+    k = 0
+    while n:
+        n, g = divmod(n, 1000)
+        groups.append((k, g))
+        k += 1
+
+    parts = []
+    for k, g in reversed(groups):
+        if not g:
+            continue
+        if k == 0:
+            parts.append(_below_thousand(g))
+        elif k == 1:
+            parts.append("mil" if g == 1 else f"{_below_thousand(g)} mil")
+        else:
+            singular, plural = _SCALES[k]
+            parts.append(f"{_below_thousand(g)} {singular if g == 1 else plural}")
+
+    # "mil e um", "dois milhões e quinhentos mil", mas "mil cento e um"
+    last_g = next(g for _, g in groups if g)
+    if len(parts) > 1 and (last_g < 100 or last_g % 100 == 0):
+        return " ".join(parts[:-1]) + " e " + parts[-1]
+    return " ".join(parts)
+
+
+def ordinal_words(n: int, feminine: bool = False) -> str:
+    if not 0 < n < 1000:
+        return number_words(n)
+    hundreds, rest = divmod(n, 100)
+    tens, units = divmod(rest, 10)
+    words = [w for w in (_ORD_HUNDREDS[hundreds], _ORD_TENS[tens], _ORD_UNITS[units]) if w]
+    if feminine:
+        words = [w[:-1] + "a" for w in words]
+    return " ".join(words)
+
+
+def roman_value(numeral: str) -> int:
+    values = {"I": 1, "V": 5, "X": 10, "L": 50, "C": 100, "D": 500, "M": 1000}
+    total = 0
+    for a, b in zip(numeral, numeral[1:] + " "):
+        v = values[a]
+        total += -v if values.get(b, 0) > v else v
+    return total
+
+
+def _integer(digits: str) -> int:
+    return int(digits.replace(".", ""))
+
+
+def _number(m) -> str:
+    words = number_words(_integer(m.group(1)))
+    if m.group(2):
+        decimals = m.group(2)
+        # "3,05" -> "três vírgula zero cinco"
+        zeros = len(decimals) - len(decimals.lstrip("0"))
+        tail = " ".join(["zero"] * zeros + ([number_words(int(decimals))] if decimals.strip("0") else []))
+        words += " vírgula " + tail
+    return words
+
+
+def _money(m) -> str:
+    reais = _integer(m.group(1))
+    words = f"{number_words(reais)} {'real' if reais == 1 else 'reais'}"
+    cents = int(m.group(2) or 0)
+    if cents:
+        words += f" e {number_words(cents)} {'centavo' if cents == 1 else 'centavos'}"
+    return words
+
+
+def _time(m) -> str:
+    hours = int(m.group(1))
+    words = f"{number_words(hours)} {'hora' if hours == 1 else 'horas'}"
+    if m.group(2) and int(m.group(2)):
+        words += f" e {number_words(int(m.group(2)))}"
+    return words
+
+
+def _roman_keyword(m) -> str:
+    word, numeral = m.group(1), m.group(2)
+    if not numeral:
+        return m.group(0)
+    return f"{word} {number_words(roman_value(numeral))}"
+
+
+def _roman_name(m) -> str:
+    name, numeral = m.group(1), m.group(2)
+    if name in _NOT_NAMES or not re.fullmatch(_ROMAN, numeral):
+        return m.group(0)
+    value = roman_value(numeral)
+    feminine = name in _FEMININE_NAMES or (name.endswith("a") and name not in _MASCULINE_A)
+    return f"{name} {ordinal_words(value, feminine) if value <= 10 else number_words(value)}"
+
+
+def _roman_heading(m) -> str:
+    if not m.group(1):
+        return m.group(0)
+    numeral = m.group(1)
+    return number_words(roman_value(numeral)) + m.group(0)[len(numeral):]
+
+
+# --------------------------
+# sentenças
+# --------------------------
+def iter_sentences(text: str):
+    # fronteiras de sentença (. ! ? seguidos de espaço); as abreviações já
+    # expandidas não cortam a sentença no meio
+    for sentence in _SENTENCE.split(text):
+        if sentence.strip():
+            yield sentence
+
+
+def normalize_sentence(sentence: str) -> str:
+    s = _ELLIPSIS.sub(",", sentence)
+    s = _ROMAN_HEADING.sub(_roman_heading, s)
+    s = _ROMAN_KEYWORDS.sub(_roman_keyword, s)
+    s = _ROMAN_NAME.sub(_roman_name, s)
+
+    if _HAS_DIGIT.search(s):
+        s = _MONEY.sub(_money, s)
+        s = _PERCENT.sub(lambda m: _number(_NUMBER.match(m.group(1))) + " por cento", s)
+        s = _TIME.sub(_time, s)
+        s = _ORDINAL.sub(lambda m: ordinal_words(int(m.group(1)), m.group(2) == "ª"), s)
+        s = _UNIT.sub(lambda m: f"{_number(_NUMBER.match(m.group(1)))} {_UNITS_AFTER_NUMBER[m.group(2)]}", s)
+        s = _NUMBER.sub(_number, s)
+
+    s = _QUOTES.sub("", s)
+    s = _DASH.sub(", ", s)
+    s = _BRACKETS.sub(", ", s)
+    s = _PAUSE.sub(", ", s)
+    s = s.replace("&", " e ")
+    s = _SYMBOLS.sub(" ", s)
+    # ponto final vira pausa curta (comportamento original do pipeline)
+    s = s.replace(".", ",")
+    s = _COMMAS.sub(", ", s)
+    s = _SPACES.sub(" ", s)
+    return s.strip(" ,")
+
+
+@lru_cache(maxsize=65536)
+def normalize_text(text: str) -> str:
+    # chunk -> texto enviado ao TTS; memoizado (frases repetidas no livro)
+    text = _SPACES.sub(" ", text).strip()
+    text = _ABBREVIATION.sub(lambda m: _ABBREVIATIONS.get(m.group(1), m.group(0)), text)
+    if _PHRASE_HINT.search(text):
+        for pattern, replacement in _PHRASES:
+            text = pattern.sub(replacement, text)
+    result = ""
+    for sentence in iter_sentences(text):
+        sentence = normalize_sentence(sentence)
+        if not sentence:
+            continue
+        if result:
+            # ! e ? ficam (entonação); entre as demais sentenças, vírgula
+            result += " " if result[-1] in "!?" else ", "
+        result += sentence
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(normalize_text(" ".join(sys.argv[1:]) or sys.stdin.read()))
@@ -1,16 +1,10 @@
+import json
 import os
 import re
-import subprocess
+import time
 from pathlib import Path
-# from TTS.api import TTS
-import torch
 import logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
-
 # ==========================
 # CONFIG
 # ==========================
@@ -19,294 +13,772 @@ from config import (
     OUTPUT_DIR,
     CHUNK_SIZE,
     MP3_SPEED,
+    CHUNK_GAP_MS,
+    NORMALIZE_DBFS,
     DEFAULT_BACKEND,
     DEFAULT_MODEL_NAME,
     DEFAULT_LANGUAGE,
     DEFAULT_SPEAKER_WAV,
+    COQUI_BATCH_SIZE,
+    COQUI_LATENTS_DIR,
+    PIPER_MODEL,
+    PIPER_VOLUME,
+    PIPER_SPEED,
+    PIPER_NOISE_SCALE,
+    PIPER_NOISE_W_SCALE,
+    PHONEME_CACHE_DB,
+    VOICE_MAP_FILE,
+    PIPER_INTRA_THREADS,
+    PIPER_INTER_THREADS,
+    PIPER_GRAPH_OPT,
+    PIPER_OPTIMIZED_DIR,
+    POOL_PROFILE_FILE,
+    AUTOTUNE_MAX_CHARS,
+    AUTOTUNE_SAMPLE_CHARS,
+    CHUNK_PROFILE_FILE,
+    CHUNK_STORE_CODEC,
+    CACHE_DB,
+    CACHE_MAX_MB,
+    MANIFEST_FILE,
+    MAX_ATTEMPTS,
+    RETRY_BACKOFF,
+    PREP_AHEAD,
+    ENCODE_WORKERS,
+    ENCODE_QUEUE,
+    TRACE_FILE,
+    METRICS_FILE,
 )
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# device = "mps" if torch.backends.mps.is_available() else "cpu"
+# torch só é importado pelo backend coqui (engines.py), ao carregar o modelo
 device = "cpu"
-print(f"INFO: Usando device: {device}")
 
 import argparse
 
+import metrics
+from assembly import ChapterWriter
+from ingest import Book
+from chunk_store import ChunkStore, remove_store
+from chunking import HARD_LIMIT, align_chunk_spans, iter_chunk_spans
+from dedup import DedupPlan, format_report, seconds_per_char
+from engines import BACKENDS, backend_batch_size, backend_choices, engine_identity
+from manifest import DONE, FAILED, JobManifest, format_progress, text_hash
+from normalize import VERSION as NORMALIZER_VERSION, normalize_text
+from stages import EncodeStage, prefetch
+from synth_cache import SynthesisCache, cache_key
+
 # ==========================
-# CHAPTER DETECTION (GOLD)
+# CHAPTER ASSEMBLY
 # ==========================
-def is_probable_title(line: str) -> float:
-    line = line.strip()
-    if not line:
-        return 0.0
-
-    score = 0.0
-    words = line.split()
-
-    if re.match(r"^\d+\.", line):
-        score += 0.5
-
-    if ":" in line:
-        left, right = line.split(":", 1)
-        if 2 <= len(left.split()) <= 6:
-            score += 0.3
-        if len(right.split()) <= 8:
-            score += 0.2
-
-    cap_ratio = sum(1 for w in words if w[:1].isupper()) / max(len(words), 1)
-    if cap_ratio >= 0.5:
-        score += 0.2
-
-    if 3 <= len(words) <= 14:
-        score += 0.2
-
-    if line.endswith((".", ",", ";")):
-        score -= 0.2
-
-    return min(max(score, 0.0), 1.0)
+def audio_options() -> dict:
+    # pós-processamento aplicado a cada chunk antes do encoder (audio.py)
+    return {
+        "speed": MP3_SPEED,
+        "gap_ms": CHUNK_GAP_MS,
+        "normalize_dbfs": NORMALIZE_DBFS,
+    }
+
+
+def chunk_audio(key, store, cache):
+    # (sample_rate, pcm): store do capítulo (mmap) antes do SQLite; bloco com
+    # perdas (opus) só quando o cache não tem mais a cópia sem perdas
+    return store.get(key, lossless=True) or cache.get(key) or store.get(key)
+
+
+def assemble_chapter(idx, chapter_dir: Path, jobs, cache, manifest) -> bool:
+    # monta o mp3 na ordem dos chunks, num único ffmpeg. O áudio vem do chunk
+    # store do capítulo (chunk_store.py) ou do cache de síntese; com o mp3
+    # pronto, o store é apagado (o cache continua com os chunks).
+    chapter_mp3 = chapter_dir / "chapter.mp3"
+
+    if not jobs:
+        print(f"WARN: Nenhum chunk disponível para o capítulo {idx}, pulando.")
+        return False
+
+    encoder = None
+    store = ChunkStore(chapter_dir, CHUNK_STORE_CODEC)
+    try:
+        for i, text, key in jobs:
+            entry = chunk_audio(key, store, cache)
+            if entry is None:
+                raise RuntimeError(f"chunk {i+1} ausente no cache")
+            sample_rate, pcm = entry
+            if encoder is None:
+                encoder = ChapterWriter(chapter_mp3, sample_rate, **audio_options())
+            encoder.write_chunk(pcm, sample_rate)
+        encoder.close()
+    except Exception as e:
+        store.close()
+        if encoder is not None:
+            encoder.abort()
+        print(f"ERRO: falha ao gerar mp3 do capítulo {idx}: {e}")
+        print("INFO: Chunks continuam no cache para retomar depois.")
+        manifest.mark_chapter(idx, FAILED, str(e))
+        return False
+
+    store.close()
+    remove_store(chapter_dir)
+    manifest.mark_chapter(idx, DONE)
+    print(f"INFO: Capítulo {idx} finalizado: {chapter_mp3}")
+    return True
 
 # ==========================
-# SPLIT CHAPTERS
+# SYNTHESIS
 # ==========================
-def split_chapters(text: str):
-    chapters = []
-    current_title = "Introducao"
-    current_lines = []
-
-    for line in text.splitlines():
-        score = is_probable_title(line)
-
-        if score >= 0.6:
-            if current_lines:
-                chapters.append((current_title, "\n".join(current_lines)))
-            current_title = line.strip()
-            current_lines = []
+def engine_options(args) -> dict:
+    # opções serializáveis, usadas para recriar o engine dentro de cada worker
+    return {
+        "piper_model": args.piper_model,
+        "piper_volume": PIPER_VOLUME,
+        "piper_speed": PIPER_SPEED,
+        "piper_noise_scale": PIPER_NOISE_SCALE,
+        "piper_noise_w_scale": PIPER_NOISE_W_SCALE,
+        "phoneme_cache_db": PHONEME_CACHE_DB,
+        "piper_intra_threads": PIPER_INTRA_THREADS,
+        "piper_inter_threads": PIPER_INTER_THREADS,
+        "piper_graph_opt": PIPER_GRAPH_OPT,
+        "piper_optimized_dir": PIPER_OPTIMIZED_DIR,
+        "model_name": args.model_name,
+        "language": args.language,
+        "speaker_wav": args.speaker_wav,
+        "device": device,
+        "coqui_batch_size": COQUI_BATCH_SIZE,
+        "coqui_latents_dir": COQUI_LATENTS_DIR,
+    }
+
+
+def sample_text(chapters, chars: int) -> str:
+    # começo do livro, para as medições de autotune/model_pool
+    sample = []
+    size = 0
+    for ch in chapters:
+        sample.append(ch.text())
+        size += len(sample[-1])
+        if size >= chars:
+            break
+    return "\n\n".join(sample)[:chars]
+
+
+def resolve_chunk_size(value, backend, options, identity, engine, chapters, retune=False) -> int:
+    # tamanho fixo (limitado por HARD_LIMIT) ou "auto": perfil medido desta
+    # voz em CHUNK_PROFILE_FILE, medido agora se ainda não existe
+    if str(value) != "auto":
+        return min(int(value), HARD_LIMIT)
+
+    import autotune
+
+    max_chars = AUTOTUNE_MAX_CHARS.get(options.get("voice_backend", backend), HARD_LIMIT)
+    profile = None if retune else autotune.load_profile(CHUNK_PROFILE_FILE, identity, max_chars)
+    if profile is None:
+        sample = sample_text(chapters, AUTOTUNE_SAMPLE_CHARS)
+        print(f"INFO: Medindo vazão por tamanho de chunk ({len(sample)} chars de amostra)...")
+        if engine is None:
+            # workers/coordenador: carrega um engine só para a medição
+            from engines import make_engine
+            engine = make_engine(backend, options)
+        with metrics.span("autotune", backend=backend, chars=len(sample)):
+            profile = autotune.tune(engine, sample, max_chars, identity)
+        autotune.save_profile(CHUNK_PROFILE_FILE, identity, profile)
+        print(autotune.format_profile(profile))
+    print(f"INFO: Tamanho de chunk (auto): {profile['chunk_size']}")
+    return profile["chunk_size"]
+
+
+def resolve_workers(backend, options, identity, chapters, chunk_size, retune=False):
+    # --workers auto: divisão dos núcleos entre processos e threads onnxruntime
+    # medida nesta máquina (model_pool.py); devolve (workers, opções com as threads).
+    # Só o Piper tem threads de sessão para dividir: os outros ficam com 1 processo
+    import model_pool
+
+    if options.get("voice_backend", backend) != "piper":
+        print(f"WARN: --workers auto só mede o backend piper; usando 1 processo com {backend}")
+        return 1, options
+    sample = sample_text(chapters, max(AUTOTUNE_SAMPLE_CHARS, chunk_size * model_pool.host_cores() * 4))
+    workers, threads = model_pool.resolve_layout(backend, options, identity, sample, chunk_size, POOL_PROFILE_FILE,
+                                                 retune, backend_batch_size(backend, options))
+    return workers, dict(options, piper_intra_threads=threads)
+
+
+def apply_voices(path, backend, options):
+    # --voices: o backend escolhido vira a base do backend "voices" (voices.py);
+    # devolve (voice_map ou None, backend, opções)
+    if not path:
+        return None, backend, options
+    from voices import VoiceMap
+
+    voice_map = VoiceMap.load(path).bind(backend, options)
+    print(f"INFO: Vozes: padrão + {', '.join(voice_map.voices)}")
+    return voice_map, "voices", voice_map.engine_options(backend, options)
+
+
+def load_engine(backend, options):
+    # None se o backend não carregar (erro já impresso)
+    print("INFO: Carregando modelo TTS (pode demorar)...")
+    try:
+        from engines import make_engine
+        with metrics.span("model_load", backend=backend):
+            return make_engine(backend, options)
+    except Exception as e:
+        print(f"ERRO: falha ao inicializar backend {backend}: {e}")
+        return None
+
+
+def chapter_texts(chapter_dir: Path, content: str, chapter_hash: str, chunk_size: int, voice_map=None, title=None):
+    # (índice, texto normalizado) de cada chunk válido. A normalização roda
+    # uma vez por capítulo e fica em chunks.json; reexecuções com o mesmo
+    # texto, tamanho de chunk e versão do normalize.py só leem o arquivo.
+    # Texto editado (revisão): os chunks da versão anterior ("source") são
+    # realinhados no texto novo e só os trechos alterados são divididos de
+    # novo, então só eles ficam fora do cache de síntese.
+    # Com voice_map (voices.py), cada trecho de voz é dividido à parte e o
+    # texto de cada chunk leva a marca da voz.
+    path = chapter_dir / "chunks.json"
+    stamp = {"chapter_hash": chapter_hash, "chunk_size": chunk_size, "normalizer": NORMALIZER_VERSION}
+    if voice_map is not None:
+        stamp["voices"] = voice_map.fingerprint
+    previous = None
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("stamp") == stamp:
+            return [(i, text) for i, text in data["chunks"]]
+        old = data.get("stamp") or {}
+        if (old.get("chunk_size") == chunk_size and old.get("normalizer") == NORMALIZER_VERSION
+                and voice_map is None and "voices" not in old):
+            previous = data.get("source")
+    except (OSError, ValueError):
+        pass
+
+    # chunk_size já vem limitado (HARD_LIMIT ou limite de qualidade do backend)
+    if voice_map is not None:
+        # um chunk nunca mistura vozes
+        spans = [(voice, s, e) for voice, start, end in voice_map.segments(content, title)
+                 for s, e in iter_chunk_spans(content, chunk_size, hard_limit=None, start=start, end=end)]
+    elif previous:
+        spans = [(None, s, e) for s, e in align_chunk_spans(content, previous, chunk_size, hard_limit=None)]
+    else:
+        spans = [(None, s, e) for s, e in iter_chunk_spans(content, chunk_size, hard_limit=None)]
+    source = [content[s:e] for _, s, e in spans]
+
+    texts = []
+    for i, (chunk, (voice, _, _)) in enumerate(zip(source, spans)):
+        text = normalize_text(chunk)
+        if text:
+            texts.append((i, voice_map.tag(voice, text) if voice else text))
+    if previous:
+        old = set(previous)
+        changed = sum(1 for chunk in source if chunk not in old)
+        print(f"INFO: {chapter_dir.name}: texto alterado, {changed} de {len(source)} chunks mudaram")
+    path.write_text(json.dumps({"stamp": stamp, "chunks": texts, "source": source}, ensure_ascii=False),
+                    encoding="utf-8")
+    return texts
+
+
+def chapter_jobs(texts, identity):
+    # (índice, texto enviado ao TTS, chave do cache)
+    return [(i, text, cache_key(text, identity)) for i, text in texts]
+
+
+def retry_delay(attempt: int) -> float:
+    # backoff exponencial entre rodadas de retentativa
+    return RETRY_BACKOFF * (2 ** (attempt - 1))
+
+
+def synthesize_jobs(engine, idx, jobs, cache, manifest, audio) -> bool:
+    # sintetiza um lote, grava no cache/manifesto e preenche audio[chave]
+    first, last = jobs[0][0] + 1, jobs[-1][0] + 1
+    chars = sum(len(text) for _, text, _ in jobs)
+    print(f"  - Gerando chunks {first}-{last} ({chars} chars)")
+
+    t0 = time.perf_counter()
+    try:
+        pcms = engine.synthesize_batch([text for _, text, _ in jobs])
+    except Exception as e:
+        elapsed = time.perf_counter() - t0
+        print(f"ERRO: falha ao gerar chunks {first}-{last} do capítulo {idx}: {e}")
+        for i, text, _ in jobs:
+            metrics.event("synthesis", elapsed * len(text) / max(chars, 1),
+                          chapter=idx, chunk=i, chars=len(text), batch=len(jobs), error=str(e))
+            manifest.chunk_failed(idx, i, e)
+        return False
+    elapsed = time.perf_counter() - t0
+
+    for (i, text, key), pcm in zip(jobs, pcms):
+        cache.put(key, engine.sample_rate, pcm)
+        audio[key] = pcm
+        duration = elapsed * len(text) / max(chars, 1)
+        audio_seconds = len(pcm) / 2 / engine.sample_rate
+        metrics.event("synthesis", duration, chapter=idx, chunk=i, chars=len(text),
+                      audio_seconds=audio_seconds, batch=len(jobs))
+        manifest.chunk_done(idx, i, duration, audio_seconds)
+    print("    ✔ Chunks gerados com sucesso")
+    return True
+
+
+def synthesize_chapter(engine, idx, chapter_dir: Path, jobs, cache, manifest, encode_stage) -> bool:
+    # PCM do engine (ou do cache) vai direto para o ffmpeg do capítulo; cada
+    # chunk novo é gravado no cache, então um capítulo interrompido retoma de
+    # onde parou na próxima execução. Os chunks são enviados ao engine em
+    # janelas de engine.batch_size (lotes no XTTS, 1 a 1 no Piper).
+    # Se um lote falha, o mp3 em streaming é descartado, o resto do capítulo
+    # segue para o cache e os chunks com falha são retentados com backoff;
+    # se todos saírem, o capítulo é montado a partir do cache.
+    # O encode roda no EncodeStage: esta função só enfileira PCM e retorna
+    # assim que o último chunk é sintetizado.
+    chapter_mp3 = chapter_dir / "chapter.mp3"
+    total = len(jobs)
+    if not jobs:
+        print(f"WARN: Nenhum chunk disponível para o capítulo {idx}, pulando.")
+        return False
+
+    batch_size = getattr(engine, "batch_size", 1)
+    failed = []
+
+    def on_done(ok, error):
+        if ok:
+            remove_store(chapter_dir)
+            manifest.mark_chapter(idx, DONE)
+            print(f"INFO: Capítulo {idx} finalizado: {chapter_mp3}")
         else:
-            current_lines.append(line)
-
-    if current_lines:
-        chapters.append((current_title, "\n".join(current_lines)))
+            print(f"ERRO: falha ao gerar mp3 do capítulo {idx}: {error}")
+            manifest.mark_chapter(idx, FAILED, str(error))
+
+    encoder = encode_stage.open_chapter(chapter_mp3, engine.sample_rate, on_done, **audio_options())
+    # chunks sintetizados também vão para o chunk store do capítulo
+    # (retomada e montagem depois das retentativas sem passar pelo SQLite);
+    # o store é apagado quando o mp3 fica pronto
+    store = ChunkStore(chapter_dir, CHUNK_STORE_CODEC)
+
+    try:
+        for start in range(0, total, batch_size):
+            window = jobs[start:start + batch_size]
+
+            audio = {}
+            misses = []
+            queued = set()
+            for i, text, key in window:
+                if key in audio or key in queued:
+                    continue
+                entry = chunk_audio(key, store, cache)
+                if entry is not None:
+                    print(f"  - Chunk {i+1} no cache, reaproveitando")
+                    manifest.chunk_cached(idx, i)
+                    audio[key] = entry[1]
+                else:
+                    queued.add(key)
+                    misses.append((i, text, key))
 
-    return chapters
+            if misses:
+                if synthesize_jobs(engine, idx, misses, cache, manifest, audio):
+                    for _, _, key in misses:
+                        store.append(key, engine.sample_rate, audio[key])
+                else:
+                    failed.extend(misses)
+                    if encoder is not None:
+                        encoder.abort()
+                        encoder = None
+
+            if encoder is not None:
+                for _, _, key in window:
+                    encoder.write(audio[key])
+
+        if encoder is not None:
+            encoder.close()
+            return True
+    except Exception as e:
+        # mp3 parcial é descartado; chunks prontos ficam no cache
+        if encoder is not None:
+            encoder.abort()
+        print(f"ERRO: capítulo {idx} não finalizado: {e}")
+        print("INFO: Interrompendo processamento deste capítulo. Rode novamente para continuar onde parou.")
+        manifest.mark_chapter(idx, FAILED, str(e))
+        return False
+    finally:
+        store.close()
+
+    # retentativas dos chunks com falha, um a um, com backoff
+    for attempt in range(1, MAX_ATTEMPTS):
+        if not failed:
+            break
+        delay = retry_delay(attempt)
+        print(f"INFO: {len(failed)} chunk(s) com falha no capítulo {idx}; nova tentativa em {delay:.0f}s")
+        time.sleep(delay)
+        retry, failed = failed, []
+        for job in retry:
+            if not synthesize_jobs(engine, idx, [job], cache, manifest, {}):
+                failed.append(job)
+
+    if failed:
+        print(f"ERRO: {len(failed)} chunk(s) do capítulo {idx} falharam após {MAX_ATTEMPTS} tentativas.")
+        print("INFO: Os demais chunks estão no cache. Rode novamente para continuar onde parou.")
+        manifest.mark_chapter(idx, FAILED, f"{len(failed)} chunks com falha")
+        return False
+
+    encode_stage.submit(assemble_chapter, idx, chapter_dir, jobs, cache, manifest)
+    return True
+
+
+class PendingChunks:
+    # fila única com os chunks que faltam no cache, de todos os capítulos
+    # (frase repetida no livro é sintetizada uma vez só); cada capítulo é
+    # montado assim que o último chunk dele fica pronto. Usada pelo pool de
+    # processos e pelo modo distribuído.
+    def __init__(self, plan, cache, manifest, encode_stage):
+        self.cache = cache
+        self.manifest = manifest
+        self.encode_stage = encode_stage
+        self.tasks = []      # ((capítulo, chunk), texto, chave)
+        self.missing = {}    # capítulo -> chaves ainda fora do cache
+        self.owners = {}     # chave -> capítulos que usam esse chunk
+        self.repeats = {}    # chave -> outras posições (capítulo, chunk) com o mesmo texto
+        self.failed = set()
+        self.chapters = {}
+        for idx, title, chapter_dir, jobs in plan:
+            self.chapters[idx] = (chapter_dir, jobs)
+            self.missing[idx] = set()
+            for i, text, key in jobs:
+                if key in self.owners:
+                    self.owners[key].add(idx)
+                    self.missing[idx].add(key)
+                    self.repeats.setdefault(key, []).append((idx, i))
+                    continue
+                if cache.contains(key):
+                    manifest.chunk_cached(idx, i)
+                    continue
+                self.owners[key] = {idx}
+                self.missing[idx].add(key)
+                self.tasks.append(((idx, i), text, key))
+        self.by_id = {task[0]: task for task in self.tasks}
+
+    def start(self):
+        # capítulos com tudo no cache (retomada) podem ser montados de imediato
+        for idx in [i for i, keys in self.missing.items() if not keys]:
+            self._finish(idx)
+
+    def _finish(self, idx):
+        if idx in self.failed:
+            print(f"INFO: Capítulo {idx} com chunks faltando. Rode novamente para continuar onde parou.")
+            self.manifest.mark_chapter(idx, FAILED, "chunks com falha")
+            return
+        # montagem/encode fora do laço de resultados: os workers seguem ocupados
+        chapter_dir, jobs = self.chapters[idx]
+        self.encode_stage.submit(assemble_chapter, idx, chapter_dir, jobs, self.cache, self.manifest)
+
+    def failure(self, task_id, error, final):
+        # final=False: o chunk ainda vai ser retentado
+        idx, i = task_id
+        _, text, key = self.by_id[task_id]
+        print(f"ERRO: falha ao gerar chunk {i+1} do capítulo {idx}: {error}")
+        metrics.event("synthesis", 0.0, chapter=idx, chunk=i, chars=len(text), error=error)
+        self.manifest.chunk_failed(idx, i, error)
+        if final:
+            self.failed.update(self.owners[key])
+            self._resolve(key)
+
+    def success(self, task_id, duration, audio_seconds):
+        # duration None: o chunk já estava no cache quando o worker pegou
+        idx, i = task_id
+        _, text, key = self.by_id[task_id]
+        if duration is None:
+            self.manifest.chunk_cached(idx, i)
+        else:
+            print(f"  ✔ Capítulo {idx}: chunk {i+1} gerado")
+            metrics.event("synthesis", duration, chapter=idx, chunk=i, chars=len(text), audio_seconds=audio_seconds)
+            self.manifest.chunk_done(idx, i, duration, audio_seconds)
+        for other_idx, other_i in self.repeats.get(key, ()):
+            self.manifest.chunk_cached(other_idx, other_i)
+        self._resolve(key)
+
+    def _resolve(self, key):
+        for owner in self.owners[key]:
+            self.missing[owner].discard(key)
+            if not self.missing[owner]:
+                self._finish(owner)
+
+
+def fail_tasks(pending, task_ids, error):
+    # chunks que não têm mais quem os sintetize (workers não carregaram o
+    # modelo): falha final, os capítulos deles ficam para a próxima execução
+    for task_id in task_ids:
+        pending.failure(task_id, error, True)
+
+
+def run_pool(pool, tasks, pending):
+    # roda as tarefas no pool, com rodadas de retentativa; pending recebe
+    # success()/failure() por chunk e resolve ids de volta em tarefas (by_id)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        retry = []
+        for task_id, error, duration, audio_seconds in pool.run(tasks):
+            if error:
+                final = attempt >= MAX_ATTEMPTS
+                pending.failure(task_id, error, final)
+                if not final:
+                    retry.append(task_id)
+            else:
+                pending.success(task_id, duration, audio_seconds)
+
+        if not retry:
+            break
+        delay = retry_delay(attempt)
+        print(f"INFO: {len(retry)} chunk(s) com falha; nova tentativa em {delay:.0f}s")
+        time.sleep(delay)
+        tasks = [pending.by_id[task_id] for task_id in retry]
+
+
+def synthesize_with_workers(plan, backend, options, workers, cache, manifest, encode_stage):
+    pending = PendingChunks(plan, cache, manifest, encode_stage)
+    tasks = pending.tasks
+    print(f"INFO: {len(tasks)} chunks pendentes distribuídos em {workers} workers")
+    pending.start()
+    if not tasks:
+        return
+
+    from synth_pool import SynthesisPool
+
+    batch_size = backend_batch_size(backend, options)
+
+    try:
+        pool = SynthesisPool(backend, options, workers, cache.path, cache.max_bytes, batch_size,
+                             trace=metrics.settings())
+    except RuntimeError as e:
+        print(f"ERRO: {e}")
+        fail_tasks(pending, [task_id for task_id, _, _ in tasks], str(e))
+        return
+    with pool:
+        run_pool(pool, tasks, pending)
+
+
+def synthesize_distributed(plan, backend, options, work_dir, local_workers, cache, manifest, encode_stage):
+    # coordenador: publica os chunks pendentes numa fila em arquivos
+    # (distributed.py) e importa os resultados dos workers para o cache;
+    # workers em outras máquinas só precisam enxergar work_dir
+    from distributed import WorkQueue
+
+    pending = PendingChunks(plan, cache, manifest, encode_stage)
+    pending.start()
+    if not pending.tasks:
+        return
+
+    queue = WorkQueue(work_dir)
+    queue.open(backend, options)
+    by_key = {}
+    for task_id, text, key in pending.tasks:
+        by_key[key] = task_id
+        queue.add(key, text)
+    print(f"INFO: {len(by_key)} chunks publicados em {queue.root}")
+    print(f"INFO: workers: python distributed.py {queue.root}")
+
+    attempts = {}
+    retry_at = {}
+    workers = queue.spawn_local(local_workers)
+    try:
+        while by_key:
+            queue.heartbeat()
+            queue.reap_leases()
+            # antes do poll: o que os workers gravaram antes de sair entra nesta volta
+            gone = local_workers > 0 and all(proc.poll() is not None for proc in workers)
+            for key, error, duration, audio_seconds, audio in queue.poll():
+                task_id = by_key.get(key)
+                if task_id is None:
+                    # resultado repetido (lease expirado e refeito por outro worker)
+                    queue.remove(key)
+                    continue
+                if error:
+                    attempts[key] = attempts.get(key, 0) + 1
+                    final = attempts[key] >= MAX_ATTEMPTS
+                    pending.failure(task_id, error, final)
+                    if final:
+                        queue.remove(key)
+                        del by_key[key]
+                    else:
+                        retry_at[key] = time.monotonic() + retry_delay(attempts[key])
+                    continue
+                sample_rate, pcm = audio
+                cache.put(key, sample_rate, pcm)
+                queue.remove(key)
+                del by_key[key]
+                pending.success(task_id, duration, audio_seconds)
+
+            if gone and by_key and not queue.leased():
+                # workers locais saíram (ex.: modelo não carregou) e nenhum
+                # outro pegou chunks: falha em vez de esperar para sempre
+                codes = ", ".join(str(proc.returncode) for proc in workers)
+                error = f"workers locais terminaram (códigos de saída: {codes}) sem nenhum outro worker na fila"
+                print(f"ERRO: {error}")
+                fail_tasks(pending, list(by_key.values()), error)
+                for key in by_key:
+                    queue.remove(key)
+                by_key.clear()
+                break
 
-# ==========================
-# TEXT CHUNKER
-# ==========================
-def chunk_text(text, size=150):
-    # Limite rígido: nunca retornar chunks maiores que 200 caracteres
-    HARD_LIMIT = 200
-    max_size = min(size, HARD_LIMIT)
-
-    sentences = re.split(r'(?<=[,.!?])\s+', text)
-    chunks = []
-    current = ""
-
-    def flush_current():
-        nonlocal current
-        if current.strip():
-            chunks.append(current.strip())
-            current = ""
-
-    for s in sentences:
-        s = s.strip()
-        if not s:
-            continue
+            now = time.monotonic()
+            for key in [k for k, t in retry_at.items() if t <= now]:
+                del retry_at[key]
+                queue.release(key)
+            time.sleep(queue.poll_interval)
+    finally:
+        queue.close()
+        for proc in workers:
+            proc.wait()
+
+
+def iter_plan(chapters, identity, manifest, chunk_size, output_dir=None, voice_map=None):
+    # prepara um capítulo por vez: diretório, chapter.txt e lista de chunks
+    for ch in chapters:
+        idx, title = ch.index, ch.title
+        safe_title = re.sub(r"[^\w]+", "_", title)[:40]
+        chapter_dir = Path(output_dir or OUTPUT_DIR) / f"{idx:02d}_{safe_title}"
+        chapter_dir.mkdir(parents=True, exist_ok=True)
 
-        # Se a sentença cabe inteira no chunk atual, tenta anexar
-        if current and len(current) + 1 + len(s) <= max_size:
-            current += " " + s
-            continue
+        content = ch.text()
+        chapter_hash = text_hash(content)
+        if voice_map is not None:
+            # mudar vozes/regras refaz o plano do capítulo (chunks inalterados vêm do cache)
+            chapter_hash = text_hash(chapter_hash + voice_map.fingerprint)
+        chapter_txt = chapter_dir / "chapter.txt"
+        # atualiza o texto do capítulo só quando ele muda
+        try:
+            unchanged = chapter_txt.read_text(encoding="utf-8") == content
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            chapter_txt.write_text(content, encoding="utf-8")
 
-        # Se a sentença inteira cabe sozinha, finaliza o chunk atual e inicia nova
-        if len(s) <= max_size:
-            if current:
-                flush_current()
-            current = s
+        # retomada pelo manifesto: capítulo concluído com o mesmo texto é pulado
+        chapter_mp3 = chapter_dir / "chapter.mp3"
+        state = manifest.chapter_state(idx)
+        if state is None and chapter_mp3.exists():
+            # saída de uma versão sem manifesto: adota o mp3 existente
+            manifest.sync_chapter(idx, title, chapter_dir, chapter_hash, [])
+            manifest.mark_chapter(idx, DONE)
+            state = (DONE, chapter_hash)
+        if state == (DONE, chapter_hash) and chapter_mp3.exists():
+            print(f"INFO: Capítulo {idx} já processado (pulei): {title}")
             continue
 
-        # Sentença maior que max_size: dividir por palavras
-        words = s.split()
-        for w in words:
-            if not w:
-                continue
-
-            # Se a palavra é maior que o limite, fatiar a palavra
-            if len(w) > max_size:
-                # primeiro, flush current se existir
-                if current:
-                    flush_current()
-                # fatiar a palavra em pedaços de max_size
-                for i in range(0, len(w), max_size):
-                    part = w[i:i+max_size]
-                    chunks.append(part)
-                continue
-
-            # Palavra cabe no chunk atual?
-            if current and len(current) + 1 + len(w) <= max_size:
-                current += " " + w
-            else:
-                # flush current e iniciar novo com a palavra
-                if current:
-                    flush_current()
-                current = w
+        with metrics.span("chunking", chapter=idx) as span:
+            jobs = chapter_jobs(chapter_texts(chapter_dir, content, chapter_hash, chunk_size, voice_map, title), identity)
+            span.set(chunks=len(jobs), chars=len(content))
+        manifest.sync_chapter(idx, title, chapter_dir, chapter_hash, jobs)
+        print(f"INFO: Capítulo {idx}: {title} ({len(jobs)} chunks)")
+        yield idx, title, chapter_dir, jobs
 
-    flush_current()
-    return chunks
+def workers_arg(value):
+    if value == "auto":
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"esperado um número ou 'auto': {value}") from None
 
-# ==========================
-# AUDIO HELPERS
-# ==========================
-def concat_wavs(wavs, output):
-    list_file = "wav_list.txt"
-    with open(list_file, "w") as f:
-        for w in wavs:
-            f.write(f"file '{os.path.abspath(w)}'\n")
-
-    subprocess.run([
-        "ffmpeg", "-y", "-f", "concat", "-safe", "0",
-        "-i", list_file, "-c", "copy", output
-    ], check=True)
-
-    os.remove(list_file)
-
-def wav_to_mp3(input_wav, output_mp3):
-    subprocess.run([
-        "ffmpeg", "-y",
-        "-i", input_wav,
-        "-filter:a", f"atempo={MP3_SPEED}",
-        "-ab", "24k",
-        output_mp3
-    ], check=True)
 
 # ==========================
 # MAIN PIPELINE
 # ==========================
-def main():
-    parser = argparse.ArgumentParser(description="Pipeline TTS: escolha backend 'piper' ou 'coqui'")
-    parser.add_argument("--backend", choices=["piper", "coqui"], default=DEFAULT_BACKEND, help="TTS backend to use")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline TTS: escolha o backend (piper, coqui, ...)")
+    backends = ", ".join(f"{name} = {BACKENDS[name]['help']}" for name in backend_choices())
+    parser.add_argument("--backend", choices=backend_choices(), default=DEFAULT_BACKEND, help=f"TTS backend to use ({backends})")
     parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Coqui TTS model name (used only when --backend coqui)")
     parser.add_argument("--language", default=DEFAULT_LANGUAGE, help="Language for Coqui TTS")
     parser.add_argument("--speaker-wav", default=DEFAULT_SPEAKER_WAV, help="Path to speaker wav for Coqui TTS (optional)")
-    args = parser.parse_args()
-
-    backend = args.backend
-    print(f"INFO: Backend selecionado: {backend}")
-
-    # Se usar Coqui, importar/instanciar TTS aqui (lazy import) — NÃO fazer isso quando usar Piper
-    tts = None
-    if backend == "coqui":
+    parser.add_argument("--piper-model", default=PIPER_MODEL, help="Path to Piper .onnx model (used only when --backend piper)")
+    parser.add_argument("--voices", default=VOICE_MAP_FILE, help="JSON voice map: extra voices of the backend and which chapters (title regex), dialogue lines or [voz=name]...[/voz] passages they read (voices.py)")
+    parser.add_argument("--chunk-size", default=str(CHUNK_SIZE), help="Chunk length in chars, or 'auto' to use the measured throughput profile of the backend/model (autotune.py)")
+    parser.add_argument("--retune", action="store_true", help="With --chunk-size auto / --workers auto, measure again even if a profile exists")
+    parser.add_argument("--workers", type=workers_arg, default=1, help="Number of synthesis processes (each one loads its own model), or 'auto' to measure the best processes x onnxruntime threads split for this host (piper only; other backends use 1, model_pool.py)")
+    parser.add_argument("--cache-db", default=CACHE_DB, help="SQLite file used as the per-chunk synthesis cache")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_MB, help="Cache size limit in MB (least recently used chunks are evicted)")
+    parser.add_argument("--coordinator", action="store_true", help="Publish pending chunks to a shared work directory for distributed workers (distributed.py)")
+    parser.add_argument("--work-dir", default=None, help="Shared work directory for --coordinator (default: OUTPUT_DIR/work)")
+    parser.add_argument("--local-workers", type=int, default=0, help="With --coordinator, also start N worker processes on this machine")
+    parser.add_argument("--status", action="store_true", help="Print progress/ETA from the job manifest and exit")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Write one JSON line per span (model load, chapters, chunks, encode) to this file")
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="Write Prometheus text-format metrics to this file")
+    args = parser.parse_args(argv)
+
+    # efeitos colaterais só aqui: library/server/stream/benchmark importam este módulo
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    print(f"INFO: Usando device: {device}")
+
+    manifest = JobManifest(Path(OUTPUT_DIR) / MANIFEST_FILE)
+    if args.status:
+        print(format_progress(manifest.progress()))
+        manifest.close()
+        return
+
+    metrics.configure(args.trace, args.metrics_file)
+    cache = None
+    try:
+        backend = args.backend
+        print(f"INFO: Backend selecionado: {backend}")
+
+        options = engine_options(args)
         try:
-            from TTS.api import TTS
-        except Exception as e:
-            print(f"ERRO: falha ao importar Coqui TTS: {e}")
+            voice_map, backend, options = apply_voices(args.voices, backend, options)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERRO: mapa de vozes inválido ({args.voices}): {e}")
             return
-        print("INFO: Inicializando Coqui TTS (pode demorar)...")
-        try:
-            tts = TTS(args.model_name, progress_bar=False).to(device)
-        except Exception as e:
-            print(f"ERRO: falha ao inicializar Coqui TTS: {e}")
-            return
-
-    with open(INPUT_TXT, "r", encoding="utf-8") as f:
-        text = f.read()
-
-    chapters = split_chapters(text)
-    print(f"INFO: {len(chapters)} capítulos detectados")
-
-    # tts = TTS(MODEL_NAME, progress_bar=False).to(device)
-
-    for idx, (title, content) in enumerate(chapters, start=1):
-        safe_title = re.sub(r"[^\w]+", "_", title)[:40]
-        chapter_dir = Path(OUTPUT_DIR) / f"{idx:02d}_{safe_title}"
-        chapter_dir.mkdir(parents=True, exist_ok=True)
-
-        chapter_txt = chapter_dir / "chapter.txt"
-        # sempre atualiza o texto do capítulo (útil se o código for reexecutado)
-        chapter_txt.write_text(content, encoding="utf-8")
-
-        chapter_mp3 = chapter_dir / "chapter.mp3"
-        if chapter_mp3.exists():
-            print(f"INFO: Capítulo {idx} já processado (pulei): {title}")
-            continue
-
-        chunks = chunk_text(content, CHUNK_SIZE)
-        print(f"INFO: Capítulo {idx}: {title} ({len(chunks)} chunks)")
-
-        # gerar chunks, pulando os já existentes
-        for i, chunk in enumerate(chunks):
-            wav_path = chapter_dir / f"chunk_{i:03d}.wav"
-
-            if wav_path.exists():
-                print(f"  - Chunk {i+1} já existe, pulando")
-                continue
-
-            if not isinstance(chunk, str):
-                print("Chunk inválido (não é string), pulando")
-                continue
-
-            chunk = chunk.strip()
-            if not chunk:
-                print("Chunk vazio, pulando")
-                continue
+        identity = engine_identity(backend, options)
+        cache = SynthesisCache(args.cache_db, args.cache_max_mb * 1024 * 1024)
+
+        # com --workers 1 o modelo é carregado aqui (lazy import por backend);
+        # com mais workers cada processo do pool carrega o seu. Com --workers
+        # auto o número só é conhecido depois da medição (abaixo).
+        workers = None if args.workers == "auto" else args.workers
+        engine = None
+        if workers is not None and workers <= 1 and not args.coordinator:
+            engine = load_engine(backend, options)
+            if engine is None:
+                return
+
+        # livro mapeado em memória: cada capítulo só é decodificado quando chega a vez dele
+        with Book(INPUT_TXT) as book:
+            with metrics.span("chapter_detection", bytes=len(book.buffer)) as span:
+                chapters = book.chapters()
+                span.set(chapters=len(chapters))
+            print(f"INFO: {len(chapters)} capítulos detectados")
 
             try:
-                print(f"  - Gerando chunk {i+1}/{len(chunks)} ({len(chunk)} chars)")
-
-                if backend == "piper":
-                    # chama o script Piper externo (mantido como antes)
-                    subprocess.run(["python", "Piper_Voicer/piper_voicer.py", "--text", str(chunk.replace(".", ",")), "--output", str(wav_path)], check=True)
-                else:
-                    # usa CoquiTTS (instância criada anteriormente)
-                    if tts is None:
-                        raise RuntimeError("Coqui TTS não inicializado")
-                    tts.tts_to_file(
-                        text=chunk.replace(".", ","),
-                        speaker_wav=args.speaker_wav,
-                        language=args.language,
-                        file_path=str(wav_path)
-                    )
-
-                print("    ✔ Chunk gerado com sucesso")
+                chunk_size = resolve_chunk_size(args.chunk_size, backend, options, identity, engine, chapters, args.retune)
+                if workers is None and not args.coordinator:
+                    workers, options = resolve_workers(backend, options, identity, chapters, chunk_size, args.retune)
             except Exception as e:
-                # Em caso de erro ao gerar um chunk, aborta o capítulo mas mantém os arquivos já gerados
-                print(f"ERRO: falha ao gerar chunk {i+1} do capítulo {idx}: {e}")
-                print("INFO: Interrompendo processamento deste capítulo. Rode novamente para continuar onde parou.")
-                break
-
-        # após tentativa de geração, concatena apenas os wavs existentes (em ordem)
-        existing_wavs = sorted(chapter_dir.glob("chunk_*.wav"))
-        if not existing_wavs:
-            print(f"WARN: Nenhum chunk disponível para concatenação no capítulo {idx}, pulando.")
-            continue
-
-        chapter_wav = chapter_dir / "chapter.wav"
-        try:
-            concat_wavs(existing_wavs, chapter_wav)
-        except Exception as e:
-            print(f"ERRO: falha ao concatenar wavs do capítulo {idx}: {e}")
-            print("INFO: Mantendo chunks para retomar depois. Pulando conversão para mp3 deste capítulo.")
-            continue
-
-        try:
-            wav_to_mp3(chapter_wav, chapter_mp3)
-        except Exception as e:
-            print(f"ERRO: falha ao converter para mp3 capítulo {idx}: {e}")
-            print("INFO: Mantendo wavs e chapter.wav para retomar depois.")
-            continue
-
-        # limpeza: remove apenas os chunk wavs e o chapter.wav após sucesso em mp3
-        try:
-            for w in existing_wavs:
-                try:
-                    w.unlink()
-                except Exception:
-                    pass
-            chapter_wav.unlink()
-        except Exception:
-            pass
-
-    print("✅ PIPELINE FINALIZADO")
+                print(f"ERRO: falha ao definir o tamanho de chunk / divisão dos workers: {e}")
+                return
+
+            if engine is None and not args.coordinator and workers <= 1:
+                engine = load_engine(backend, options)
+                if engine is None:
+                    return
+
+            # estágios: preparo do texto (thread, alguns capítulos à frente) ->
+            # síntese (este processo ou o pool) -> montagem/encode (threads)
+            dedup = DedupPlan()
+            plan = dedup.tap(iter_plan(chapters, identity, manifest, chunk_size, voice_map=voice_map))
+            with EncodeStage(ENCODE_WORKERS, ENCODE_QUEUE) as encode_stage:
+                if args.coordinator:
+                    work_dir = args.work_dir or Path(OUTPUT_DIR) / "work"
+                    synthesize_distributed(list(plan), backend, options, work_dir, args.local_workers,
+                                           cache, manifest, encode_stage)
+                elif workers > 1:
+                    synthesize_with_workers(list(plan), backend, options, workers, cache, manifest, encode_stage)
+                else:
+                    for idx, title, chapter_dir, jobs in prefetch(plan, PREP_AHEAD):
+                        synthesize_chapter(engine, idx, chapter_dir, jobs, cache, manifest, encode_stage)
+                        cache.evict()
+
+        cache.evict()
+        progress = manifest.progress()
+        print(format_progress(progress))
+        if dedup.chunks:
+            print(format_report(dedup.summary(), seconds_per_char(progress)))
+        print("✅ PIPELINE FINALIZADO")
+    finally:
+        # todos os caminhos de saída (inclusive os de erro) fecham o que abriram
+        if cache is not None:
+            cache.close()
+        manifest.close()
+        metrics.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,723 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+import pipeline
+from chapters import normalize_chapter_text, split_text_chapters
+from config import (
+    AUTOTUNE_MAX_CHARS,
+    CACHE_DB,
+    CACHE_MAX_MB,
+    CHUNK_PROFILE_FILE,
+    CHUNK_SIZE,
+    DEFAULT_BACKEND,
+    DEFAULT_LANGUAGE,
+    DEFAULT_MODEL_NAME,
+    DEFAULT_SPEAKER_WAV,
+    CHUNK_GAP_MS,
+    ENCODE_WORKERS,
+    MANIFEST_FILE,
+    MAX_ATTEMPTS,
+    METRICS_FILE,
+    MP3_SPEED,
+    NORMALIZE_DBFS,
+    PIPER_MODEL,
+    SERVER_HOST,
+    SERVER_JOBS_DIR,
+    SERVER_KEEP_JOBS,
+    SERVER_PORT,
+    SHORT_JOB_CHARS,
+    STREAM_LOOKAHEAD,
+    TRACE_FILE,
+)
+from audio import AudioChain
+from engines import backend_choices, engine_identity, make_engine
+from manifest import DONE, FAILED, JobManifest, text_hash
+from stream import stream_chunks, synthesize_chunk, wav_header
+from synth_cache import SynthesisCache
+
+# ==========================
+# SERVIDOR DE JOBS (HTTP local, asyncio)
+# ==========================
+# Mantém o modelo carregado e recebe textos de outros serviços:
+#
+#   POST   /jobs                        {"text": ..., "title": ..., "kind": "book"|"passage"}
+#                                       (ou text/plain com ?title=&kind=) -> {"id": ...}
+#   GET    /jobs                        lista dos jobs
+#   GET    /jobs/<id>                   estado do job e dos capítulos
+#   GET    /jobs/<id>/events            progresso em Server-Sent Events até o fim do job
+#   GET    /jobs/<id>/chapters/<n>.mp3  capítulo pronto
+#   DELETE /jobs/<id>                   cancela (chunks ainda na fila são descartados)
+#   POST   /stream?format=wav|pcm       áudio do texto em streaming (HTTP chunked, stream.py)
+#   GET    /health
+#
+# Livros passam pela mesma divisão em capítulos/chunks, normalização, cache
+# de síntese e montagem do pipeline.py; trechos curtos (até SHORT_JOB_CHARS,
+# ou kind=passage) viram um capítulo só. A síntese roda numa thread com o
+# engine carregado, consumindo uma fila de prioridade de lotes de chunks:
+# trechos curtos passam à frente dos livros entre um lote e outro. Os jobs
+# ficam em memória (os arquivos ficam em SERVER_JOBS_DIR/<id>): o texto sai
+# depois do planejamento, o manifesto fecha quando o job termina ou é
+# cancelado, e só os SERVER_KEEP_JOBS jobs terminados mais recentes ficam.
+#
+#   python server.py --backend piper
+#   python server.py --submit texto.txt --download saida/   # cliente local
+
+PASSAGE, BOOK = "passage", "book"
+PRIORITY = {PASSAGE: 0, BOOK: 1}
+FINAL = ("done", "failed", "cancelled")
+MAX_BODY = 64 * 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 409: "Conflict",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class Job:
+    def __init__(self, job_id, kind, title, text, root):
+        self.id = job_id
+        self.kind = kind
+        self.title = title
+        self.text = text
+        self.chars = len(text)
+        self.dir = Path(root) / job_id
+        self.status = "queued"
+        self.created = time.time()
+        self.chapters = {}
+        self.manifest = None
+        # chamadas nas threads de síntese/encode usando o manifesto
+        self.busy = 0
+        self.events = []
+        self._wake = asyncio.Event()
+
+    def emit(self, event, **data):
+        self.events.append({"event": event, "job": self.id, "ts": round(time.time(), 3), **data})
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    async def follow(self):
+        # histórico + eventos novos até o job terminar
+        pos = 0
+        while True:
+            while pos < len(self.events):
+                yield self.events[pos]
+                pos += 1
+            if self.status in FINAL:
+                return
+            await self._wake.wait()
+
+    def summary(self, detail=False) -> dict:
+        data = {
+            "id": self.id,
+            "kind": self.kind,
+            "title": self.title,
+            "status": self.status,
+            "created": self.created,
+            "chars": self.chars,
+            "chapters_done": sum(1 for ch in self.chapters.values() if ch["status"] == DONE),
+            "chapters": len(self.chapters),
+        }
+        if detail:
+            data["chapters"] = [
+                {
+                    "index": idx,
+                    "title": ch["title"],
+                    "status": ch["status"],
+                    "chunks": len(ch["jobs"]),
+                    "synthesized": ch["total"] - len(ch["pending"]),
+                    "to_synthesize": ch["total"],
+                    "url": f"/jobs/{self.id}/chapters/{idx}.mp3" if ch["status"] == DONE else None,
+                }
+                for idx, ch in sorted(self.chapters.items())
+            ]
+        return data
+
+
+class JobServer:
+    def __init__(self, backend, options, cache, chunk_size, jobs_dir=SERVER_JOBS_DIR, keep_jobs=SERVER_KEEP_JOBS):
+        self.backend = backend
+        self.options = options
+        self.identity = engine_identity(backend, options)
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.jobs_dir = Path(jobs_dir)
+        self.keep_jobs = keep_jobs
+        self.jobs = {}
+        self.engine = None
+        self.queue = None
+        self.seq = itertools.count()
+        # uma thread de síntese (um engine), uma de preparo, encode em paralelo
+        self.synth = ThreadPoolExecutor(1, thread_name_prefix="synth")
+        self.prep = ThreadPoolExecutor(1, thread_name_prefix="prep")
+        self.encode = ThreadPoolExecutor(ENCODE_WORKERS, thread_name_prefix="encode")
+        self.tasks = set()
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.PriorityQueue()
+        print(f"INFO: Carregando modelo TTS ({self.backend})...")
+        self.engine = await loop.run_in_executor(self.synth, self._load_engine)
+        self._spawn(self._synth_loop())
+
+    def _load_engine(self):
+        with metrics.span("model_load", backend=self.backend):
+            engine = make_engine(self.backend, self.options)
+        # aquecimento: o primeiro pedido não paga a inicialização da sessão
+        engine.synthesize_batch(["Pronto."])
+        return engine
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def close(self):
+        for executor in (self.synth, self.prep, self.encode):
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # --------------------------
+    # jobs
+    # --------------------------
+    def submit(self, text, kind=None, title=None) -> Job:
+        if kind not in (PASSAGE, BOOK):
+            kind = PASSAGE if len(text) <= SHORT_JOB_CHARS else BOOK
+        job = Job(uuid.uuid4().hex[:12], kind, title or ("Trecho" if kind == PASSAGE else "Livro"), text, self.jobs_dir)
+        self._evict()
+        self.jobs[job.id] = job
+        job.emit("queued", kind=kind, chars=len(text))
+        self._spawn(self._prepare(job))
+        return job
+
+    def cancel(self, job):
+        if job.status in FINAL:
+            return
+        job.status = "cancelled"
+        job.emit("cancelled")
+        self._release(job)
+
+    def _release(self, job):
+        # job terminado e nada dele rodando nas threads: fecha o manifesto
+        if job.status in FINAL and not job.busy and job.manifest is not None:
+            job.manifest.close()
+            job.manifest = None
+
+    def _evict(self):
+        # jobs terminados mais antigos saem da memória (os arquivos ficam)
+        finished = [job for job in self.jobs.values() if job.status in FINAL and job.manifest is None]
+        for job in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job.id]
+
+    def _plan(self, job):
+        # roda na thread de preparo: capítulos, chunks, chaves e o que falta no cache
+        job.dir.mkdir(parents=True, exist_ok=True)
+        manifest = JobManifest(job.dir / MANIFEST_FILE)
+        try:
+            return manifest, self._plan_chapters(job, manifest)
+        except Exception:
+            manifest.close()
+            raise
+
+    def _plan_chapters(self, job, manifest):
+        if job.kind == PASSAGE:
+            chapters = [{"index": 1, "title": job.title, "text": normalize_chapter_text(job.text)}]
+        else:
+            chapters = split_text_chapters(job.text) or [
+                {"index": 1, "title": job.title, "text": normalize_chapter_text(job.text)}
+            ]
+
+        planned = {}
+        for ch in chapters:
+            idx, title, content = ch["index"], ch["title"], ch["text"]
+            safe_title = re.sub(r"[^\w]+", "_", title)[:40]
+            chapter_dir = job.dir / f"{idx:02d}_{safe_title}"
+            chapter_dir.mkdir(parents=True, exist_ok=True)
+            (chapter_dir / "chapter.txt").write_text(content, encoding="utf-8")
+
+            texts = pipeline.chapter_texts(chapter_dir, content, text_hash(content), self.chunk_size)
+            jobs = pipeline.chapter_jobs(texts, self.identity)
+            manifest.sync_chapter(idx, title, chapter_dir, text_hash(content), jobs)
+
+            missing = []
+            repeats = {}
+            for i, text, key in jobs:
+                if key in repeats:
+                    repeats[key].append(i)
+                elif self.cache.contains(key):
+                    manifest.chunk_cached(idx, i)
+                else:
+                    repeats[key] = []
+                    missing.append((i, text, key))
+            planned[idx] = {
+                "title": title,
+                "dir": chapter_dir,
+                "jobs": jobs,
+                "missing": missing,
+                "repeats": repeats,
+                "pending": {key for _, _, key in missing},
+                "total": len(missing),
+                "status": "pending",
+            }
+        return planned
+
+    async def _prepare(self, job):
+        loop = asyncio.get_running_loop()
+        try:
+            job.manifest, job.chapters = await loop.run_in_executor(self.prep, self._plan, job)
+        except Exception as e:
+            print(f"ERRO: job {job.id}: falha ao preparar o texto: {e}")
+            if job.status not in FINAL:
+                job.status = "failed"
+                job.emit("failed", error=str(e))
+            return
+        finally:
+            # os chunks já estão nos capítulos (chapter.txt): o texto não é mais usado
+            job.text = None
+        if job.status == "cancelled":
+            self._release(job)
+            return
+
+        job.status = "running"
+        job.emit("planned", chapters=[
+            {"index": idx, "title": ch["title"], "chunks": len(ch["jobs"]), "to_synthesize": ch["total"]}
+            for idx, ch in sorted(job.chapters.items())
+        ])
+        batch_size = max(1, getattr(self.engine, "batch_size", 1))
+        for idx, ch in sorted(job.chapters.items()):
+            missing = ch.pop("missing")
+            if not missing:
+                self._spawn(self._assemble(job, idx))
+                continue
+            for start in range(0, len(missing), batch_size):
+                self._enqueue(job, idx, missing[start:start + batch_size], 1)
+
+    def _enqueue(self, job, idx, batch, attempt):
+        if job.status != "cancelled":
+            self.queue.put_nowait((PRIORITY[job.kind], next(self.seq), (job, idx, batch, attempt)))
+
+    # --------------------------
+    # síntese
+    # --------------------------
+    def _synthesize(self, job, idx, batch):
+        # roda na thread de síntese; devolve None ou a mensagem de erro
+        chapter = job.chapters[idx]
+        todo = [job_item for job_item in batch if not self.cache.contains(job_item[2])]
+        chars = sum(len(text) for _, text, _ in todo)
+        t0 = time.perf_counter()
+        try:
+            pcms = self.engine.synthesize_batch([text for _, text, _ in todo]) if todo else []
+        except Exception as e:
+            elapsed = time.perf_counter() - t0
+            for i, text, _ in todo:
+                metrics.event("synthesis", elapsed * len(text) / max(chars, 1),
+                              job=job.id, chapter=idx, chunk=i, chars=len(text), error=str(e))
+                job.manifest.chunk_failed(idx, i, e)
+            return str(e)
+        elapsed = time.perf_counter() - t0
+
+        for (i, text, key), pcm in zip(todo, pcms):
+            self.cache.put(key, self.engine.sample_rate, pcm)
+            duration = elapsed * len(text) / max(chars, 1)
+            audio_seconds = len(pcm) / 2 / self.engine.sample_rate
+            metrics.event("synthesis", duration, job=job.id, chapter=idx, chunk=i, chars=len(text),
+                          audio_seconds=audio_seconds, batch=len(todo))
+            job.manifest.chunk_done(idx, i, duration, audio_seconds)
+        synthesized = {key for _, _, key in todo}
+        for i, _, key in batch:
+            if key not in synthesized:
+                job.manifest.chunk_cached(idx, i)
+            for other in chapter["repeats"].get(key, ()):
+                job.manifest.chunk_cached(idx, other)
+        return None
+
+    async def _synth_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            _, _, (job, idx, batch, attempt) = await self.queue.get()
+            chapter = job.chapters[idx]
+            if job.status in FINAL or chapter["status"] == FAILED:
+                continue
+            job.busy += 1
+            try:
+                error = await loop.run_in_executor(self.synth, self._synthesize, job, idx, batch)
+            except Exception as e:
+                # erro fora do engine (cache, manifesto): trata como falha do lote
+                error = str(e)
+            finally:
+                job.busy -= 1
+            if job.status in FINAL:
+                self._release(job)
+                continue
+
+            if error:
+                if attempt < MAX_ATTEMPTS:
+                    delay = pipeline.retry_delay(attempt)
+                    job.emit("retry", chapter=idx, chunks=[i + 1 for i, _, _ in batch], attempt=attempt,
+                             delay=delay, error=error)
+                    loop.call_later(delay, self._enqueue, job, idx, batch, attempt + 1)
+                else:
+                    print(f"ERRO: job {job.id}: capítulo {idx} com chunks falhando: {error}")
+                    chapter["status"] = FAILED
+                    job.manifest.mark_chapter(idx, FAILED, error)
+                    job.emit("chapter_failed", chapter=idx, error=error)
+                    self._check_done(job)
+                continue
+
+            chapter["pending"].difference_update(key for _, _, key in batch)
+            job.emit("progress", chapter=idx, chunks=[i + 1 for i, _, _ in batch],
+                     synthesized=chapter["total"] - len(chapter["pending"]), total=chapter["total"])
+            if not chapter["pending"] and chapter["status"] == "pending":
+                self._spawn(self._assemble(job, idx))
+
+    async def _assemble(self, job, idx):
+        loop = asyncio.get_running_loop()
+        chapter = job.chapters[idx]
+        chapter["status"] = "encoding"
+        job.busy += 1
+        try:
+            ok = await loop.run_in_executor(self.encode, pipeline.assemble_chapter, idx, chapter["dir"],
+                                            chapter["jobs"], self.cache, job.manifest)
+        finally:
+            job.busy -= 1
+        # cache dentro de --cache-max-mb a cada capítulo montado, na thread de
+        # síntese (entre dois lotes), como o pipeline faz por capítulo
+        await loop.run_in_executor(self.synth, self.cache.evict)
+        if job.status in FINAL:
+            self._release(job)
+            return
+        chapter["status"] = DONE if ok else FAILED
+        if ok:
+            job.emit("chapter_done", chapter=idx, title=chapter["title"], url=f"/jobs/{job.id}/chapters/{idx}.mp3")
+        else:
+            job.emit("chapter_failed", chapter=idx, error="falha ao gerar o mp3")
+        self._check_done(job)
+
+    def _check_done(self, job):
+        if job.status in FINAL:
+            return
+        if any(ch["status"] not in (DONE, FAILED) for ch in job.chapters.values()):
+            return
+        job.status = "done" if all(ch["status"] == DONE for ch in job.chapters.values()) else "failed"
+        job.emit(job.status, seconds=round(time.time() - job.created, 3))
+        self._release(job)
+        print(f"INFO: job {job.id} ({job.kind}) {job.status}")
+
+    # --------------------------
+    # HTTP
+    # --------------------------
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            if not request.strip():
+                return
+            method, target, _ = request.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY:
+                await _send_json(writer, 413, {"error": "texto grande demais"})
+                return
+            body = await reader.readexactly(length) if length else b""
+            url = urlsplit(target)
+            await self.route(method.upper(), url.path.rstrip("/") or "/", parse_qs(url.query), headers, body, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            print(f"ERRO: requisição HTTP: {e}")
+            try:
+                await _send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, query, headers, body, writer):
+        if path in ("/", "/health"):
+            await _send_json(writer, 200, {
+                "backend": self.backend,
+                "chunk_size": self.chunk_size,
+                "jobs": len(self.jobs),
+                "queued_batches": self.queue.qsize(),
+            })
+            return
+
+        if path == "/stream" and method == "POST":
+            await self._stream(query, headers, body, writer)
+            return
+
+        if path == "/jobs":
+            if method == "POST":
+                await self._post_job(query, headers, body, writer)
+            else:
+                await _send_json(writer, 200, [job.summary() for job in self.jobs.values()])
+            return
+
+        m = re.fullmatch(r"/jobs/(\w+)(/events|/chapters/(\d+)\.mp3)?", path)
+        job = self.jobs.get(m.group(1)) if m else None
+        if job is None:
+            await _send_json(writer, 404, {"error": "não encontrado"})
+            return
+
+        if m.group(3):
+            await self._send_chapter(job, int(m.group(3)), writer)
+        elif m.group(2) == "/events":
+            await self._send_events(job, writer)
+        elif method == "DELETE":
+            self.cancel(job)
+            await _send_json(writer, 200, job.summary())
+        else:
+            await _send_json(writer, 200, job.summary(detail=True))
+
+    async def _payload(self, query, headers, body, writer):
+        # {"text": ...} em JSON, ou o texto puro com os campos na query string
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                data = json.loads(body.decode("utf-8"))
+            except ValueError as e:
+                await _send_json(writer, 400, {"error": f"JSON inválido: {e}"})
+                return None, None
+        else:
+            data = {"text": body.decode("utf-8", errors="replace")}
+        if not isinstance(data, dict):
+            await _send_json(writer, 400, {"error": "o JSON deve ser um objeto com o campo text"})
+            return None, None
+        data.update({k: v[0] for k, v in query.items() if k not in data})
+        for field in ("text", "title", "kind", "format"):
+            if data.get(field) is not None and not isinstance(data[field], str):
+                await _send_json(writer, 400, {"error": f"o campo {field} deve ser uma string"})
+                return None, None
+
+        text = (data.get("text") or "").strip()
+        if not text:
+            await _send_json(writer, 400, {"error": "texto vazio"})
+            return None, None
+        return text, data
+
+    async def _post_job(self, query, headers, body, writer):
+        text, data = await self._payload(query, headers, body, writer)
+        if text is None:
+            return
+        job = self.submit(text, data.get("kind"), data.get("title"))
+        print(f"INFO: job {job.id} recebido ({job.kind}, {len(text)} chars)")
+        await _send_json(writer, 202, {"id": job.id, "kind": job.kind, "url": f"/jobs/{job.id}",
+                                       "events": f"/jobs/{job.id}/events"})
+
+    async def _stream(self, query, headers, body, writer):
+        # síntese em ordem com STREAM_LOOKAHEAD chunks à frente, na mesma
+        # thread do engine: entra na fila da thread antes do próximo lote de livro
+        text, data = await self._payload(query, headers, body, writer)
+        if text is None:
+            return
+        fmt = data.get("format", "wav")
+        loop = asyncio.get_running_loop()
+        sample_rate = self.engine.sample_rate
+        chunks = iter(stream_chunks(text, self.chunk_size))
+        pending = collections.deque()
+
+        def ahead():
+            while len(pending) < STREAM_LOOKAHEAD:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                pending.append(loop.run_in_executor(self.synth, synthesize_chunk, self.engine, chunk,
+                                                    self.cache, self.identity))
+
+        ahead()
+        content_type = "audio/wav" if fmt == "wav" else f"audio/L16;rate={sample_rate};channels=1"
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n"
+            f"Cache-Control: no-cache\r\nConnection: close\r\n\r\n".encode("latin-1")
+        )
+        if fmt == "wav":
+            await _write_chunk(writer, wav_header(sample_rate))
+
+        chain = AudioChain(sample_rate, MP3_SPEED, CHUNK_GAP_MS, NORMALIZE_DBFS)
+        t0 = time.perf_counter()
+        try:
+            while pending:
+                pcm = await pending.popleft()
+                ahead()
+                out = await loop.run_in_executor(self.encode, chain.process_chunk, pcm, sample_rate)
+                await _write_chunk(writer, out)
+                if t0 is not None:
+                    metrics.event("first_audio", time.perf_counter() - t0, chars=len(text))
+                    t0 = None
+            await _write_chunk(writer, chain.flush())
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # cliente desconectou: chunks ainda não iniciados saem da fila da thread
+            for future in pending:
+                future.cancel()
+
+    async def _send_events(self, job, writer):
+        # SSE sem Content-Length: a resposta termina quando o job termina
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        async for event in job.follow():
+            writer.write(f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            await writer.drain()
+
+    async def _send_chapter(self, job, idx, writer):
+        chapter = job.chapters.get(idx)
+        if chapter is None:
+            await _send_json(writer, 404, {"error": "capítulo não encontrado"})
+            return
+        path = chapter["dir"] / "chapter.mp3"
+        if chapter["status"] != DONE or not path.exists():
+            await _send_json(writer, 409, {"error": f"capítulo ainda não está pronto ({chapter['status']})"})
+            return
+        writer.write(
+            f"HTTP/1.1 200 OK\r\nContent-Type: audio/mpeg\r\nContent-Length: {path.stat().st_size}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1")
+        )
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(64 * 1024)
+                if not block:
+                    break
+                writer.write(block)
+                await writer.drain()
+
+
+async def _send_json(writer, status, data):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+
+async def _write_chunk(writer, data: bytes):
+    # um pedaço de resposta com Transfer-Encoding: chunked
+    if data:
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+
+async def serve(server: JobServer, host, port):
+    await server.start()
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"INFO: Servidor de jobs em http://{host}:{port} (backend {server.backend})")
+    async with listener:
+        await listener.serve_forever()
+
+
+# --------------------------
+# cliente local
+# --------------------------
+def format_event(event: dict) -> str:
+    kind = event["event"]
+    if kind == "planned":
+        chunks = sum(ch["chunks"] for ch in event["chapters"])
+        return f"INFO: {len(event['chapters'])} capítulo(s), {chunks} chunks"
+    if kind == "progress":
+        return f"  - Capítulo {event['chapter']}: {event['synthesized']}/{event['total']} chunks"
+    if kind == "chapter_done":
+        return f"INFO: Capítulo {event['chapter']} pronto: {event['url']}"
+    if kind in ("chapter_failed", "retry", "failed"):
+        return f"ERRO: {kind} {json.dumps({k: v for k, v in event.items() if k not in ('event', 'job', 'ts')}, ensure_ascii=False)}"
+    return f"INFO: {kind}"
+
+
+def run_client(base_url, source, kind=None, title=None, download=None):
+    from urllib.request import Request, urlopen
+
+    text = sys.stdin.read() if source == "-" else Path(source).read_text(encoding="utf-8")
+    payload = json.dumps({"text": text, "kind": kind, "title": title}).encode("utf-8")
+    request = Request(f"{base_url}/jobs", data=payload, method="POST",
+                      headers={"Content-Type": "application/json"})
+    with urlopen(request) as resp:
+        job = json.load(resp)
+    print(f"INFO: job {job['id']} ({job['kind']})")
+
+    status = None
+    with urlopen(f"{base_url}{job['events']}") as resp:
+        for line in resp:
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            print(format_event(event))
+            status = event["event"]
+            if status == "chapter_done" and download:
+                target = Path(download) / f"{job['id']}_{event['chapter']:02d}.mp3"
+                target.parent.mkdir(parents=True, exist_ok=True)
+                with urlopen(f"{base_url}{event['url']}") as audio:
+                    target.write_bytes(audio.read())
+                print(f"INFO: salvo em {target}")
+    return status == "done"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP local de jobs de TTS (modelo carregado uma vez)")
+    parser.add_argument("--host", default=SERVER_HOST, help="Address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="Port to listen on")
+    parser.add_argument("--backend", choices=backend_choices(), default=DEFAULT_BACKEND, help="TTS backend to use")
+    parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Coqui TTS model name (used only when --backend coqui)")
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE, help="Language for Coqui TTS")
+    parser.add_argument("--speaker-wav", default=DEFAULT_SPEAKER_WAV, help="Path to speaker wav for Coqui TTS (optional)")
+    parser.add_argument("--piper-model", default=PIPER_MODEL, help="Path to Piper .onnx model (used only when --backend piper)")
+    parser.add_argument("--chunk-size", default=str(CHUNK_SIZE), help="Chunk length in chars, or 'auto' to use the profile measured by pipeline.py --chunk-size auto")
+    parser.add_argument("--jobs-dir", default=SERVER_JOBS_DIR, help="Directory where each job writes its chapters")
+    parser.add_argument("--keep-jobs", type=int, default=SERVER_KEEP_JOBS, help="Finished jobs kept in memory (oldest are dropped; their files stay in --jobs-dir)")
+    parser.add_argument("--cache-db", default=CACHE_DB, help="SQLite file used as the per-chunk synthesis cache")
+    parser.add_argument("--cache-max-mb", type=int, default=CACHE_MAX_MB, help="Cache size limit in MB")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Write one JSON line per span to this file")
+    parser.add_argument("--metrics-file", default=METRICS_FILE, help="Write Prometheus text-format metrics to this file")
+    parser.add_argument("--submit", metavar="FILE", help="Client mode: send FILE ('-' = stdin) to a running server and follow its progress")
+    parser.add_argument("--kind", choices=(BOOK, PASSAGE), help="Client mode: job kind (default: by text length)")
+    parser.add_argument("--title", help="Client mode: job title")
+    parser.add_argument("--download", metavar="DIR", help="Client mode: save finished chapter MP3s to DIR")
+    args = parser.parse_args(argv)
+
+    if args.submit:
+        ok = run_client(f"http://{args.host}:{args.port}", args.submit, args.kind, args.title, args.download)
+        sys.exit(0 if ok else 1)
+
+    options = pipeline.engine_options(args)
+    if args.chunk_size == "auto":
+        # sem livro para amostrar: usa o perfil já medido desta voz
+        import autotune
+
+        profile = autotune.load_profile(CHUNK_PROFILE_FILE, engine_identity(args.backend, options),
+                                        AUTOTUNE_MAX_CHARS.get(args.backend, pipeline.HARD_LIMIT))
+        if profile is None:
+            print("ERRO: sem perfil de chunk para esta voz; rode pipeline.py --chunk-size auto antes")
+            sys.exit(1)
+        chunk_size = profile["chunk_size"]
+    else:
+        chunk_size = min(int(args.chunk_size), pipeline.HARD_LIMIT)
+
+    metrics.configure(args.trace, args.metrics_file)
+    cache = SynthesisCache(args.cache_db, args.cache_max_mb * 1024 * 1024)
+    server = JobServer(args.backend, options, cache, chunk_size, args.jobs_dir, args.keep_jobs)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("INFO: Encerrando servidor")
+    finally:
+        server.close()
+        cache.close()
+        metrics.close()
+
+
+if __name__ == "__main__":
+    main()
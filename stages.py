@@ -0,0 +1,134 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from assembly import ChapterWriter
+
+# ==========================
+# ESTÁGIOS DO PIPELINE
+# ==========================
+# preparo de texto -> síntese -> montagem/encode, ligados por filas limitadas:
+#   - prefetch(): roda o preparo (decodificar capítulo, chunking, chaves,
+#     manifesto) numa thread, alguns capítulos à frente da síntese;
+#   - EncodeStage: pool de threads que alimentam os ffmpeg dos capítulos.
+#     A síntese só coloca PCM numa fila limitada e segue para o próximo
+#     chunk/capítulo; o encode do capítulo N termina enquanto o N+1 é
+#     sintetizado. Fila cheia = síntese espera (backpressure).
+
+_END = object()
+_ABORT = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def prefetch(iterable, size: int):
+    q = queue.Queue(maxsize=max(1, size))
+
+    def run():
+        try:
+            for item in iterable:
+                q.put(item)
+        except BaseException as e:
+            q.put(_Failure(e))
+        finally:
+            q.put(_END)
+
+    threading.Thread(target=run, name="prep", daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _END:
+            return
+        if isinstance(item, _Failure):
+            raise item.error
+        yield item
+
+
+class ChapterStream:
+    # fila de PCM de um capítulo, consumida por uma thread do EncodeStage
+    def __init__(self, stage, output_mp3, sample_rate, on_done, writer_options):
+        self.queue = queue.Queue(maxsize=stage.queue_size)
+        self.output_mp3 = output_mp3
+        self.sample_rate = sample_rate
+        self.on_done = on_done
+        self.writer_options = writer_options
+        self.future = stage.executor.submit(self._run)
+
+    def write(self, pcm: bytes):
+        # um item = um chunk inteiro (o AudioChain trata cada um separadamente)
+        self.queue.put(pcm)
+
+    def close(self):
+        self.queue.put(_END)
+
+    def abort(self):
+        self.queue.put(_ABORT)
+
+    def _run(self):
+        encoder = None
+        try:
+            encoder = ChapterWriter(self.output_mp3, self.sample_rate, **self.writer_options)
+            while True:
+                item = self.queue.get()
+                if item is _ABORT:
+                    encoder.abort()
+                    return False
+                if item is _END:
+                    encoder.close()
+                    self.on_done(True, None)
+                    return True
+                encoder.write_chunk(item)
+        except Exception as e:
+            if encoder is not None:
+                encoder.abort()
+            # esvazia a fila até o fim do capítulo para não travar a síntese
+            item = None
+            while item is not _END and item is not _ABORT:
+                item = self.queue.get()
+            self.on_done(False, e)
+            return False
+
+
+class EncodeStage:
+    def __init__(self, workers: int, queue_size: int):
+        self.queue_size = max(1, queue_size)
+        self.executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix="encode")
+        self.futures = []
+        self.streams = []
+
+    def open_chapter(self, output_mp3, sample_rate, on_done, **writer_options) -> ChapterStream:
+        stream = ChapterStream(self, output_mp3, sample_rate, on_done, writer_options)
+        self.futures.append(stream.future)
+        self.streams.append(stream)
+        return stream
+
+    def submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+    def wait(self):
+        for future in self.futures:
+            future.result()
+        self.futures = []
+        self.streams = []
+
+    def close(self):
+        self.wait()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # interrupção (erro/Ctrl-C): descarta os mp3 parciais em andamento
+            for stream in self.streams:
+                if not stream.future.done():
+                    stream.abort()
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        return False
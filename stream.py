@@ -0,0 +1,240 @@
+import argparse
+import itertools
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import metrics
+from audio import AudioChain
+from chunking import HARD_LIMIT, iter_chunk_spans
+from config import (
+    CACHE_DB,
+    CACHE_MAX_MB,
+    CHUNK_GAP_MS,
+    CHUNK_SIZE,
+    DEFAULT_BACKEND,
+    DEFAULT_LANGUAGE,
+    DEFAULT_MODEL_NAME,
+    DEFAULT_SPEAKER_WAV,
+    INPUT_TXT,
+    MP3_SPEED,
+    NORMALIZE_DBFS,
+    PIPER_MODEL,
+    STREAM_FIRST_CHUNK,
+    STREAM_LOOKAHEAD,
+)
+from engines import backend_choices
+from normalize import normalize_text
+from stages import prefetch
+from synth_cache import cache_key
+
+# ==========================
+# STREAMING (primeiro áudio em menos de um segundo)
+# ==========================
+# Para ouvir um capítulo ou testar parâmetros de voz sem renderizar nada:
+# os chunks são sintetizados em ordem numa thread, no máximo
+# STREAM_LOOKAHEAD à frente do que já foi escrito, e o áudio sai à medida
+# que fica pronto (PCM cru, WAV sem tamanho ou Ogg/Opus via ffmpeg). O
+# primeiro chunk é curto (STREAM_FIRST_CHUNK chars, cortado numa vírgula
+# quando dá) para o tempo até o primeiro áudio ser o de uma frase curta.
+# Chunks sintetizados vão para o cache de síntese e são reaproveitados pela
+# renderização completa (o restante do texto usa o mesmo tamanho de chunk).
+#
+#   python stream.py --chapter 3 | ffplay -autoexit -f s16le -ar 22050 -ac 1 -
+#   python stream.py --text "Olá, tudo bem?" --format wav | aplay
+#   python stream.py --chapter 1 --format ogg > previa.ogg
+#
+# O server.py expõe o mesmo fluxo em POST /stream (resposta HTTP chunked).
+
+FORMATS = ("pcm", "wav", "ogg")
+
+
+def stream_chunks(text, chunk_size, first_chunk=STREAM_FIRST_CHUNK):
+    # textos normalizados, em ordem. Só o primeiro chunk do pipeline é
+    # dividido (um pedaço curto + o resto dele); do segundo em diante os
+    # chunks são os mesmos da renderização completa, e o cache vale para os dois
+    spans = iter_chunk_spans(text, chunk_size, hard_limit=None)
+    first = next(spans, None)
+    if first is None:
+        return
+    head = list(itertools.islice(iter_chunk_spans(text, first_chunk, hard_limit=None,
+                                                  start=first[0], end=first[1]), 2))
+    if len(head) > 1:
+        head = [head[0], (head[1][0], first[1])]
+    for s, e in itertools.chain(head, spans):
+        chunk = normalize_text(text[s:e])
+        if chunk:
+            yield chunk
+
+
+def iter_pcm(engine, chunks, cache=None, identity=None, lookahead=STREAM_LOOKAHEAD):
+    # PCM de cada chunk, em ordem; a síntese corre numa thread (prefetch) até
+    # `lookahead` chunks à frente de quem consome
+    def produce():
+        for text in chunks:
+            yield text, synthesize_chunk(engine, text, cache, identity)
+
+    return prefetch(produce(), lookahead)
+
+
+def synthesize_chunk(engine, text, cache=None, identity=None) -> bytes:
+    key = cache_key(text, identity) if cache is not None else None
+    entry = cache.get(key) if key else None
+    if entry is not None and entry[0] == engine.sample_rate:
+        return entry[1]
+    t0 = time.perf_counter()
+    pcm = engine.synthesize_batch([text])[0]
+    metrics.event("synthesis", time.perf_counter() - t0, chars=len(text),
+                  audio_seconds=len(pcm) / 2 / engine.sample_rate, stream=True)
+    if key:
+        cache.put(key, engine.sample_rate, pcm)
+    return pcm
+
+
+def wav_header(sample_rate: int) -> bytes:
+    # WAV de tamanho desconhecido (0xFFFFFFFF): players leem até o fim do fluxo
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+class OggSink:
+    # PCM -> ffmpeg (Opus) -> arquivo/pipe de saída, sem passar por este processo
+    def __init__(self, out, sample_rate: int, bitrate="32k"):
+        self.proc = subprocess.Popen(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error",
+             "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+             "-c:a", "libopus", "-b:a", bitrate, "-application", "voip",
+             "-page_duration", "20000", "-flush_packets", "1", "-f", "ogg", "pipe:1"],
+            stdin=subprocess.PIPE, stdout=out,
+        )
+
+    def write(self, pcm: bytes):
+        self.proc.stdin.write(pcm)
+        self.proc.stdin.flush()
+
+    def close(self):
+        self.proc.stdin.close()
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg terminou com código {self.proc.returncode}")
+
+
+class RawSink:
+    def __init__(self, out, sample_rate: int, wav=False):
+        self.out = out
+        if wav:
+            self.write(wav_header(sample_rate))
+
+    def write(self, data: bytes):
+        self.out.write(data)
+        self.out.flush()
+
+    def close(self):
+        self.out.flush()
+
+
+def stream(engine, text, sink, chunk_size, cache=None, identity=None, chain=None):
+    # escreve o áudio no sink à medida que os chunks ficam prontos; devolve
+    # (segundos até o primeiro áudio, segundos de áudio, chunks)
+    chain = chain or AudioChain(engine.sample_rate)
+    t0 = time.perf_counter()
+    first_audio = None
+    audio_seconds = 0.0
+    n = 0
+    for _, pcm in iter_pcm(engine, stream_chunks(text, chunk_size), cache, identity):
+        out = chain.process_chunk(pcm, engine.sample_rate)
+        sink.write(out)
+        n += 1
+        audio_seconds += len(out) / 2 / engine.sample_rate
+        if first_audio is None:
+            first_audio = time.perf_counter() - t0
+            metrics.event("first_audio", first_audio, chars=len(text))
+    tail = chain.flush()
+    if tail:
+        sink.write(tail)
+    sink.close()
+    return first_audio, audio_seconds, n
+
+
+def _claim_stdout():
+    # áudio vai para o stdout original; qualquer print (nosso, do espeak,
+    # do onnxruntime) passa a ir para o stderr e não corrompe o fluxo
+    sys.stdout.flush()
+    audio = os.fdopen(os.dup(sys.stdout.fileno()), "wb", buffering=0)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return audio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sintetiza e toca/escreve o áudio em streaming, chunk a chunk")
+    parser.add_argument("--text", help="Text to speak (default: read --file)")
+    parser.add_argument("--file", default=INPUT_TXT, help="Book file used with --chapter (or streamed whole)")
+    parser.add_argument("--chapter", type=int, help="Stream only this chapter of --file (as numbered by pipeline.py)")
+    parser.add_argument("--format", choices=FORMATS, default="pcm", help="pcm = raw s16le mono; wav = streaming WAV header + PCM; ogg = Ogg/Opus via ffmpeg")
+    parser.add_argument("--output", default="-", help="Output file ('-' = stdout)")
+    parser.add_argument("--backend", choices=backend_choices(), default=DEFAULT_BACKEND, help="TTS backend to use")
+    parser.add_argument("--model-name", default=DEFAULT_MODEL_NAME, help="Coqui TTS model name (used only when --backend coqui)")
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE, help="Language for Coqui TTS")
+    parser.add_argument("--speaker-wav", default=DEFAULT_SPEAKER_WAV, help="Path to speaker wav for Coqui TTS (optional)")
+    parser.add_argument("--piper-model", default=PIPER_MODEL, help="Path to Piper .onnx model (used only when --backend piper)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE if str(CHUNK_SIZE).isdigit() else HARD_LIMIT, help="Chunk length in chars after the first one")
+    parser.add_argument("--cache-db", default=CACHE_DB, help="SQLite synthesis cache ('' disables)")
+    args = parser.parse_args(argv)
+
+    out = _claim_stdout() if args.output == "-" else open(args.output, "wb")
+
+    import pipeline
+    from engines import engine_identity, make_engine
+    from ingest import Book
+    from synth_cache import SynthesisCache
+
+    if args.text is not None:
+        text = args.text
+    else:
+        with Book(args.file) as book:
+            chapters = book.chapters()
+            if args.chapter is None:
+                text = "\n\n".join(ch.text() for ch in chapters)
+            else:
+                match = [ch for ch in chapters if ch.index == args.chapter]
+                if not match:
+                    print(f"ERRO: capítulo {args.chapter} não existe ({len(chapters)} capítulos)", file=sys.stderr)
+                    sys.exit(1)
+                text = match[0].text()
+                print(f"INFO: Capítulo {args.chapter}: {match[0].title}", file=sys.stderr)
+
+    options = pipeline.engine_options(args)
+    identity = engine_identity(args.backend, options)
+    cache = SynthesisCache(args.cache_db, CACHE_MAX_MB * 1024 * 1024) if args.cache_db else None
+
+    t0 = time.perf_counter()
+    engine = make_engine(args.backend, options)
+    print(f"INFO: Modelo carregado em {time.perf_counter() - t0:.2f}s; "
+          f"saída {args.format} {engine.sample_rate} Hz mono", file=sys.stderr)
+
+    if args.format == "ogg":
+        sink = OggSink(out, engine.sample_rate)
+    else:
+        sink = RawSink(out, engine.sample_rate, wav=args.format == "wav")
+
+    chain = AudioChain(engine.sample_rate, MP3_SPEED, CHUNK_GAP_MS, NORMALIZE_DBFS)
+    try:
+        first, audio_seconds, n = stream(engine, text, sink, min(args.chunk_size, HARD_LIMIT),
+                                         cache, identity, chain)
+    except BrokenPipeError:
+        # player fechado antes do fim
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+        print("INFO: saída fechada, interrompendo", file=sys.stderr)
+        return
+    finally:
+        if cache is not None:
+            cache.close()
+    if first is not None:
+        print(f"INFO: primeiro áudio em {first * 1000:.0f} ms; {n} chunks, {audio_seconds:.1f}s de áudio",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# ==========================
+# CACHE DE SÍNTESE (endereçado por conteúdo)
+# ==========================
+# Cada chunk sintetizado é guardado num único arquivo SQLite, indexado pelo
+# hash do texto normalizado + identidade da voz (backend, modelo, speaker,
+# parâmetros de síntese). Reexecuções, edições e frases repetidas reaproveitam
+# o áudio, e mudanças na divisão em chunks nunca trazem áudio de outro trecho.
+# O tamanho total é limitado com remoção LRU.
+
+
+def normalize_chunk(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(text: str, identity: dict) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps(identity, sort_keys=True).encode("utf-8"))
+    h.update(b"\0")
+    h.update(normalize_chunk(text).encode("utf-8"))
+    return h.hexdigest()
+
+
+class SynthesisCache:
+    def __init__(self, path, max_bytes: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        # vários workers podem gravar ao mesmo tempo: WAL + timeout de lock
+        # conexão compartilhada entre as threads do pipeline, serializada pelo lock
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                key TEXT PRIMARY KEY,
+                sample_rate INTEGER NOT NULL,
+                pcm BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS chunks_lru ON chunks(last_used)")
+        self.db.commit()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT sample_rate, pcm FROM chunks WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE chunks SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            return row[0], row[1]
+
+    def contains(self, key: str) -> bool:
+        with self.lock:
+            row = self.db.execute("SELECT 1 FROM chunks WHERE key = ?", (key,)).fetchone()
+            return row is not None
+
+    def put(self, key: str, sample_rate: int, pcm: bytes):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO chunks (key, sample_rate, pcm, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, sample_rate, pcm, len(pcm), time.time())
+            )
+            self.db.commit()
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM chunks").fetchone()[0]
+
+    def evict(self) -> int:
+        # remove os chunks menos usados até caber em max_bytes
+        with self.lock:
+            excess = self.total_bytes() - self.max_bytes
+            if excess <= 0:
+                return 0
+
+            freed = 0
+            rows = self.db.execute("SELECT key, size FROM chunks ORDER BY last_used ASC")
+            victims = []
+            for key, size in rows:
+                if freed >= excess:
+                    break
+                victims.append((key,))
+                freed += size
+            self.db.executemany("DELETE FROM chunks WHERE key = ?", victims)
+            self.db.commit()
+            self.db.execute("PRAGMA incremental_vacuum")
+            return len(victims)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+class PhonemeCache:
+    # fonemas (espeak) por sentença normalizada + voz, para o Piper: frases
+    # repetidas e reexecuções (inclusive com outros parâmetros de síntese,
+    # que mudam a chave do áudio mas não os fonemas) não chamam o espeak.
+    # Dicionário LRU em memória na frente de um SQLite compartilhado.
+    def __init__(self, path, memory_items: int = 50000):
+        from collections import OrderedDict
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory = OrderedDict()
+        self.memory_items = memory_items
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS phonemes (key TEXT PRIMARY KEY, phonemes TEXT NOT NULL)")
+        self.db.commit()
+
+    @staticmethod
+    def key(voice: str, sentence: str) -> str:
+        return hashlib.sha1(f"{voice}\0{sentence}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, phonemes):
+        self.memory[key] = phonemes
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        with self.lock:
+            phonemes = self.memory.get(key)
+            if phonemes is not None:
+                self.memory.move_to_end(key)
+                return phonemes
+            row = self.db.execute("SELECT phonemes FROM phonemes WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            phonemes = json.loads(row[0])
+            self._remember(key, phonemes)
+            return phonemes
+
+    def put(self, key: str, phonemes):
+        with self.lock:
+            self._remember(key, phonemes)
+            self.db.execute(
+                "INSERT OR REPLACE INTO phonemes (key, phonemes) VALUES (?, ?)",
+                (key, json.dumps(phonemes, ensure_ascii=False))
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
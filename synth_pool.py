@@ -0,0 +1,96 @@
+import multiprocessing as mp
+import time
+
+import metrics
+from model_pool import ModelPool, with_threads
+from synth_cache import SynthesisCache
+
+# ==========================
+# POOL DE SÍNTESE (multi-processo)
+# ==========================
+# Cada worker carrega o modelo uma única vez (initializer, num ModelPool) e
+# consome chunks de todos os capítulos a partir da fila compartilhada do
+# Pool. O áudio vai para o cache de síntese (SQLite compartilhado), de onde
+# o processo principal monta cada capítulo; um worker morto nunca deixa um
+# chunk pela metade.
+
+_engine = None
+_cache = None
+
+
+def _init_worker(backend, options, cache_path, cache_max_bytes, trace, ready, warm=False):
+    global _engine, _cache
+    # os workers só escrevem no trace (carga do modelo); a síntese de cada
+    # chunk é registrada no processo principal a partir dos resultados
+    metrics.configure(**trace)
+    # o erro de carga volta para o processo principal em vez de o Pool
+    # recriar o worker para sempre; com warm, a primeira chamada da sessão
+    # também acontece aqui, em cada worker
+    try:
+        _engine = ModelPool(backend, options).engine()
+        _cache = SynthesisCache(cache_path, cache_max_bytes)
+        if warm:
+            _engine.synthesize_batch(["Aquecimento."])
+    except Exception as e:
+        ready.put(str(e) or type(e).__name__)
+        raise
+    ready.put(None)
+
+
+def _synthesize_batch(batch):
+    # batch: lista de (key, texto, chave_do_cache) sintetizada numa chamada só.
+    # Retorna (key, erro, segundos_de_síntese, segundos_de_áudio) por item.
+    todo = [task for task in batch if not _cache.contains(task[2])]
+    try:
+        timings = {}
+        if todo:
+            t0 = time.perf_counter()
+            pcms = _engine.synthesize_batch([text for _, text, _ in todo])
+            elapsed = time.perf_counter() - t0
+            chars = sum(len(text) for _, text, _ in todo) or 1
+            for (key, text, chunk_key), pcm in zip(todo, pcms):
+                _cache.put(chunk_key, _engine.sample_rate, pcm)
+                timings[key] = (elapsed * len(text) / chars, len(pcm) / 2 / _engine.sample_rate)
+        return [(key, None, *timings.get(key, (None, None))) for key, _, _ in batch]
+    except Exception as e:
+        return [(key, str(e), None, None) for key, _, _ in batch]
+
+
+class SynthesisPool:
+    # "spawn": onnxruntime/torch não são seguros após fork. Só retorna depois
+    # que todos os workers carregaram (e, com warm=True, aqueceram) o modelo
+    def __init__(self, backend, options, workers, cache_path, cache_max_bytes, batch_size=1, trace=None, warm=False):
+        self.batch_size = batch_size
+        # threads onnxruntime por sessão: núcleos divididos entre os workers
+        options = with_threads(options, workers)
+        ctx = mp.get_context("spawn")
+        ready = ctx.SimpleQueue()
+        initargs = (backend, options, cache_path, cache_max_bytes, trace or {}, ready, warm)
+        self.pool = ctx.Pool(workers, initializer=_init_worker, initargs=initargs)
+        for _ in range(workers):
+            error = ready.get()
+            if error is not None:
+                self.pool.terminate()
+                raise RuntimeError(f"falha ao carregar o modelo no worker: {error}")
+
+    def run(self, tasks):
+        # tasks: lista de (key, texto, chave_do_cache). Gera os resultados na
+        # ordem em que os chunks terminam; o pool continua vivo para novas
+        # rodadas (retentativas) sem recarregar os modelos.
+        batches = [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+        for results in self.pool.imap_unordered(_synthesize_batch, batches):
+            yield from results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.terminate()
+        return False
@@ -0,0 +1,27 @@
+from pathlib import Path
+
+import pytest
+
+import assembly
+
+
+class RawEncoder:
+    # no lugar do ffmpeg: o "mp3" do capítulo é o PCM cru que chegou
+    def __init__(self, output_mp3, sample_rate, speed=1.0, bitrate="24k"):
+        self.output = Path(output_mp3)
+        self.chunks = []
+
+    def write(self, pcm):
+        self.chunks.append(pcm)
+
+    def close(self):
+        self.output.write_bytes(b"".join(self.chunks))
+
+    def abort(self):
+        pass
+
+
+@pytest.fixture
+def raw_encoder(monkeypatch):
+    monkeypatch.setattr(assembly, "ChapterEncoder", RawEncoder)
+    return RawEncoder
@@ -0,0 +1,40 @@
+import io
+
+import assembly
+from assembly import ChapterEncoder
+
+
+class FakeFfmpeg:
+    # grava o PCM recebido no arquivo de saída (último argumento), como o ffmpeg faria
+    def __init__(self, args, stdin=None):
+        self.path = args[-1]
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+
+    def wait(self):
+        with open(self.path, "wb") as f:
+            f.write(self.stdin.getvalue())
+        return 0
+
+    def kill(self):
+        pass
+
+
+def test_abort_keeps_other_writer_part(tmp_path, monkeypatch):
+    monkeypatch.setattr(assembly.subprocess, "Popen", FakeFfmpeg)
+    output = tmp_path / "chapter.mp3"
+
+    stream = ChapterEncoder(output, 22050)
+    retry = ChapterEncoder(output, 22050)
+    assert stream.tmp != retry.tmp
+    retry.write(b"\x01\x00" * 10)
+
+    # o stream com falha é abortado depois que a remontagem começou
+    stream.abort()
+    assert not stream.tmp.exists()
+    assert retry.tmp.exists()
+
+    retry.close()
+    assert output.read_bytes() == b"\x01\x00" * 10
+    assert not list(tmp_path.glob("*.part"))
+
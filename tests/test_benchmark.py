@@ -0,0 +1,20 @@
+import pytest
+
+import metrics
+import pipeline
+from benchmark import book_corpus, run_backend
+
+
+def test_run_backend_restores_pipeline(raw_encoder):
+    saved = pipeline.INPUT_TXT, pipeline.OUTPUT_DIR
+    run = run_backend("null", book_corpus(2000, 1), 1)
+    assert run["chunks"] and run["chunks_failed"] == 0
+    assert run["stages"]
+    assert (pipeline.INPUT_TXT, pipeline.OUTPUT_DIR) == saved
+    assert metrics.summary() == {}
+
+    # erro no meio da execução: mesma limpeza
+    with pytest.raises(SystemExit):
+        run_backend("nao_existe", "Texto.", 1)
+    assert (pipeline.INPUT_TXT, pipeline.OUTPUT_DIR) == saved
+    assert metrics.summary() == {}
@@ -0,0 +1,62 @@
+import pipeline
+from benchmark import book_corpus
+from chunk_store import DATA_FILE, INDEX_FILE, ChunkStore, remove_store
+from config import OUTPUT_DIR
+from synth_cache import SynthesisCache
+
+
+def test_append_get_and_reload(tmp_path):
+    with ChunkStore(tmp_path) as store:
+        store.append("a", 22050, b"\x01\x00" * 100)
+        store.append("b", 22050, b"")
+        store.append("a", 22050, b"\x02\x00" * 50)
+        assert store.get("a") == (22050, b"\x02\x00" * 50)
+
+    with ChunkStore(tmp_path) as store:
+        assert len(store) == 2
+        assert store.get("b") == (22050, b"")
+        assert store.get("c") is None
+        # a primeira gravação de "a" fica como espaço morto
+        assert store.live_bytes() == 100
+        assert store.data_bytes() == 300
+
+
+def test_truncated_index_is_ignored(tmp_path):
+    with ChunkStore(tmp_path) as store:
+        store.append("a", 22050, b"\x01\x00" * 100)
+    with open(tmp_path / INDEX_FILE, "a", encoding="ascii") as f:
+        f.write("b 200 100 pcm 22050\nc 0 1")
+    with ChunkStore(tmp_path) as store:
+        assert list(store.index) == ["a"]
+
+
+def test_lossy_block_only_without_cache(tmp_path):
+    # bloco opus no índice: a montagem usa o PCM do cache enquanto ele existe
+    pcm = b"\x03\x00" * 100
+    with ChunkStore(tmp_path) as store:
+        store.append("k", 24000, pcm)
+    (tmp_path / INDEX_FILE).write_text(f"k 0 {len(pcm)} opus 24000\n", encoding="ascii")
+
+    cache = SynthesisCache(tmp_path / "cache.sqlite", 1 << 30)
+    try:
+        with ChunkStore(tmp_path) as store:
+            assert store.get("k", lossless=True) is None
+            cache.put("k", 24000, b"\x04\x00" * 100)
+            assert pipeline.chunk_audio("k", store, cache) == (24000, b"\x04\x00" * 100)
+    finally:
+        cache.close()
+
+
+def test_store_removed_when_chapter_done(tmp_path, monkeypatch, raw_encoder):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "texto.txt").write_text(book_corpus(4000, 2), encoding="utf-8")
+    pipeline.main(["--backend", "null", "--cache-db", str(tmp_path / "cache.sqlite")])
+
+    chapters = [d for d in (tmp_path / OUTPUT_DIR).iterdir() if d.is_dir()]
+    assert chapters
+    for chapter in chapters:
+        assert (chapter / "chapter.mp3").exists()
+        assert not (chapter / DATA_FILE).exists() and not (chapter / INDEX_FILE).exists()
+
+    # sem store no capítulo: nada a fazer
+    remove_store(chapters[0])
@@ -0,0 +1,89 @@
+import pytest
+
+from chunking import HARD_LIMIT, align_chunk_spans, chunk_text, iter_chunk_spans, synthetic_text
+
+# as duas estratégias do projeto: pipeline.py (empacota até o limite) e
+# main.py (só junta peças curtas, sem HARD_LIMIT)
+MODES = [
+    pytest.param(dict(size=150), min(150, HARD_LIMIT), id="pipeline"),
+    pytest.param(dict(size=800, hard_limit=None, min_size=50, separators=".,"), 800, id="main"),
+]
+
+
+def check_spans(text, spans, limit):
+    # limites respeitados, ordem crescente e só espaço em branco fica de fora
+    pos = 0
+    for s, e in spans:
+        assert 0 < e - s <= limit, (s, e)
+        assert s >= pos, (pos, s)
+        assert not text[pos:s].strip(), text[pos:s][:80]
+        pos = e
+    assert not text[pos:].strip()
+
+
+@pytest.fixture(scope="module")
+def big_text():
+    return synthetic_text(4 * 1024 * 1024)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("options, limit", MODES)
+def test_spans_properties(seed, options, limit):
+    text = synthetic_text(20_000, seed)
+    check_spans(text, list(iter_chunk_spans(text, **options)), limit)
+
+
+@pytest.mark.parametrize("text", ["", "   \n\n ", "x" * 1000, "Sim.", "a, b. c! d? " * 50])
+@pytest.mark.parametrize("options, limit", MODES)
+def test_spans_edge_cases(text, options, limit):
+    check_spans(text, list(iter_chunk_spans(text, **options)), limit)
+
+
+def test_spans_window():
+    # start/end (usados por voices.py e stream.py): nada sai da janela
+    text = synthetic_text(20_000, 7)
+    start, end = 5_000, 12_000
+    spans = list(iter_chunk_spans(text, 150, start=start, end=end))
+    assert all(start <= s < e <= end for s, e in spans)
+    window = text[start:end]
+    check_spans(window, [(s - start, e - start) for s, e in spans], HARD_LIMIT)
+
+
+def test_align_keeps_unedited_chunks():
+    text = synthetic_text(200_000, 3)
+    previous = chunk_text(text, 150)
+    edited = text
+    for k in range(1, 11):
+        at = edited.find(" ", len(edited) * k // 11)
+        edited = edited[:at] + " palavra nova" + edited[at:]
+
+    spans = list(align_chunk_spans(edited, previous, 150))
+    check_spans(edited, spans, HARD_LIMIT)
+    old = set(previous)
+    kept = sum(1 for s, e in spans if edited[s:e] in old)
+    fresh = sum(1 for c in chunk_text(edited, 150) if c in old)
+    # cada edição toca no máximo os chunks vizinhos dela
+    assert kept >= len(previous) - 3 * 10
+    assert kept > fresh
+
+
+def test_align_unchanged_text_is_identity():
+    text = synthetic_text(50_000, 5)
+    spans = list(iter_chunk_spans(text, 150))
+    previous = [text[s:e] for s, e in spans]
+    assert list(align_chunk_spans(text, previous, 150)) == spans
+
+
+@pytest.mark.parametrize("options, limit", MODES)
+def test_benchmark_chunking(benchmark, big_text, options, limit):
+    spans = benchmark(lambda: list(iter_chunk_spans(big_text, **options)))
+    check_spans(big_text, spans, limit)
+    benchmark.extra_info["chunks"] = len(spans)
+    benchmark.extra_info["mchars_per_s"] = round(len(big_text) / benchmark.stats["mean"] / 1e6, 1)
+
+
+def test_benchmark_align(benchmark, big_text):
+    previous = chunk_text(big_text, 150)
+    edited = big_text.replace(" tecnologia ", " tecnologia nova ", 10)
+    spans = benchmark(lambda: list(align_chunk_spans(edited, previous, 150)))
+    check_spans(edited, spans, HARD_LIMIT)
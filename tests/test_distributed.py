@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+import distributed
+import pipeline
+from benchmark import book_corpus
+from config import LEASE_SECONDS, MANIFEST_FILE, OUTPUT_DIR
+from manifest import JobManifest
+from synth_cache import SynthesisCache
+
+# Coordenador (pipeline.py --coordinator) com workers locais no backend null.
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch, raw_encoder):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "texto.txt").write_text(book_corpus(6000, 3), encoding="utf-8")
+    return tmp_path
+
+
+def run_coordinator(root, local_workers=2):
+    pipeline.main(["--backend", "null", "--coordinator", "--work-dir", str(root / "work"),
+                   "--local-workers", str(local_workers), "--cache-db", str(root / "cache.sqlite")])
+
+
+def check_done(root):
+    manifest = JobManifest(root / OUTPUT_DIR / MANIFEST_FILE)
+    try:
+        progress = manifest.progress()
+    finally:
+        manifest.close()
+    assert progress["chunks"] > 0
+    assert progress["chunks_done"] == progress["chunks"]
+    assert progress["chunks_failed"] == 0
+    assert progress["chapters_done"] == progress["chapters"] == 3
+    for mp3 in (root / OUTPUT_DIR).glob("*/chapter.mp3"):
+        assert mp3.stat().st_size > 0
+
+    work = root / "work"
+    assert (work / "STOP").exists()
+    assert not list((work / "tasks").iterdir())
+    assert not list((work / "leases").iterdir())
+    return progress
+
+
+def test_coordinator_local_workers(book):
+    run_coordinator(book)
+    progress = check_done(book)
+
+    # segunda execução: tudo vem do cache, nada é publicado
+    run_coordinator(book)
+    assert check_done(book) == progress
+
+
+def test_coordinator_expired_lease(book, monkeypatch):
+    # o primeiro chunk publicado já tem o lease de um worker que morreu
+    stale = []
+    add = distributed.WorkQueue.add
+
+    def add_with_dead_lease(queue, key, text):
+        add(queue, key, text)
+        if not stale:
+            lease = queue.leases / key
+            lease.write_text('{"worker": "morto"}', encoding="utf-8")
+            old = time.time() - 2 * LEASE_SECONDS
+            os.utime(lease, (old, old))
+            stale.append(key)
+
+    monkeypatch.setattr(distributed.WorkQueue, "add", add_with_dead_lease)
+    run_coordinator(book)
+    check_done(book)
+
+    cache = SynthesisCache(book / "cache.sqlite", 1 << 30)
+    try:
+        assert cache.contains(stale[0])
+    finally:
+        cache.close()
+
+
+def test_coordinator_fails_when_local_workers_exit(book):
+    # o modelo não carrega em nenhum worker: o coordenador não fica esperando
+    pipeline.main(["--backend", "piper", "--piper-model", "nao_existe.onnx", "--coordinator",
+                   "--work-dir", str(book / "work"), "--local-workers", "2",
+                   "--cache-db", str(book / "cache.sqlite")])
+
+    manifest = JobManifest(book / OUTPUT_DIR / MANIFEST_FILE)
+    try:
+        progress = manifest.progress()
+    finally:
+        manifest.close()
+    assert progress["chunks_failed"] > 0
+    assert progress["chunks_done"] == progress["chapters_done"] == 0
+    assert not list((book / "work" / "tasks").iterdir())
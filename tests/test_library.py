@@ -0,0 +1,36 @@
+import re
+import sqlite3
+
+import library
+from benchmark import book_corpus
+from config import MANIFEST_FILE
+
+
+def chunk_rows(book_dir):
+    with sqlite3.connect(book_dir / MANIFEST_FILE) as db:
+        return db.execute("SELECT text_hash, status, duration FROM chunks").fetchall()
+
+
+def test_repeats_across_books_synthesized_once(tmp_path, raw_encoder, capsys):
+    books = tmp_path / "livros"
+    books.mkdir()
+    text = book_corpus(3000, 2)
+    (books / "a.txt").write_text(text, encoding="utf-8")
+    (books / "b.txt").write_text(text, encoding="utf-8")
+
+    library.main([str(books), "--backend", "null", "--workers", "2", "--output-root", str(tmp_path / "out"),
+                  "--cache-db", str(tmp_path / "cache.sqlite")])
+
+    rows = chunk_rows(tmp_path / "out" / "a") + chunk_rows(tmp_path / "out" / "b")
+    assert rows and all(status == "done" for _, status, _ in rows)
+    # um chunk sintetizado (com tempo de síntese) por texto distinto na biblioteca
+    synthesized = [h for h, _, duration in rows if duration is not None]
+    assert sorted(synthesized) == sorted({h for h, _, _ in rows})
+    assert all(duration is None for _, _, duration in chunk_rows(tmp_path / "out" / "b"))
+
+    # o relatório de dedup só conta como economia o que de fato não foi sintetizado
+    report = re.search(r"Dedup: (\d+) chunks, (\d+) únicos", capsys.readouterr().out)
+    assert report and int(report.group(1)) == len(rows) and int(report.group(2)) == len(synthesized)
+    for name in ("a", "b"):
+        assert sorted(p.parent.name for p in (tmp_path / "out" / name).glob("*/chapter.mp3"))
+
@@ -0,0 +1,15 @@
+import pytest
+
+import metrics
+
+
+@pytest.mark.parametrize("q, expected", [(0, 1), (10, 1), (50, 5), (90, 9), (95, 10), (99, 10), (100, 10)])
+def test_percentile_nearest_rank(q, expected):
+    assert metrics.percentile(list(range(1, 11)), q) == expected
+
+
+def test_percentile_small_lists():
+    assert metrics.percentile([], 50) == 0.0
+    assert metrics.percentile([7.0], 99) == 7.0
+    assert metrics.percentile([1, 2], 50) == 1
+    assert metrics.percentile([1, 2, 3, 4], 75) == 3
@@ -0,0 +1,43 @@
+import pytest
+
+from normalize import normalize_text, number_words, ordinal_words, roman_value
+
+
+@pytest.mark.parametrize("n, words", [
+    (0, "zero"), (21, "vinte e um"), (100, "cem"), (101, "cento e um"),
+    (1000, "mil"), (2024, "dois mil e vinte e quatro"), (1_000_000, "um milhão"),
+])
+def test_number_words(n, words):
+    assert number_words(n) == words
+
+
+def test_ordinal_words():
+    assert ordinal_words(2) == "segundo"
+    assert ordinal_words(1, feminine=True) == "primeira"
+
+
+@pytest.mark.parametrize("numeral, value", [("IV", 4), ("IX", 9), ("XIV", 14), ("MCMLXXXIV", 1984)])
+def test_roman_value(numeral, value):
+    assert roman_value(numeral) == value
+
+
+@pytest.mark.parametrize("text, spoken", [
+    ("Dom Pedro II governou.", "Dom Pedro segundo governou"),
+    ("Luís XIV era rei.", "Luís catorze era rei"),
+    ("Dona Maria I reinou.", "Dona Maria primeira reinou"),
+    ("Isabel II e Vitória III.", "Isabel segunda e Vitória terceira"),
+    ("Garcia II da Galiza.", "Garcia segundo da Galiza"),
+    ("No século XX tudo mudou.", "No século vinte tudo mudou"),
+    ("O Dr. Silva chegou.", "O Doutor Silva chegou"),
+])
+def test_roman_and_abbreviations(text, spoken):
+    assert normalize_text(text) == spoken
+
+
+@pytest.mark.parametrize("text, spoken", [
+    ("Mas I think so.", "Mas I think so"),
+    ("E V de vitória.", "E V de vitória"),
+])
+def test_roman_name_false_positives(text, spoken):
+    # palavra funcional no início da sentença não é nome próprio
+    assert normalize_text(text) == spoken
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from benchmark import book_corpus
+from server import FINAL, JobServer
+from synth_cache import SynthesisCache
+
+# Servidor de jobs no próprio processo, backend null, mp3 como PCM cru.
+
+
+@pytest.fixture
+def server(tmp_path, raw_encoder):
+    cache = SynthesisCache(tmp_path / "cache.sqlite", 1 << 30)
+    server = JobServer("null", {}, cache, 150, tmp_path / "jobs")
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        listener = loop.run_until_complete(asyncio.start_server(server.handle, "127.0.0.1", 0))
+        server.url = f"http://127.0.0.1:{listener.sockets[0].getsockname()[1]}"
+        ready.set()
+        loop.run_forever()
+        listener.close()
+        for task in list(server.tasks):
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*server.tasks, listener.wait_closed(), return_exceptions=True))
+        loop.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(30)
+    yield server
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(30)
+    server.close()
+    cache.close()
+
+
+def request(server, method, path, body=None, content_type="application/json"):
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode("utf-8")
+    req = Request(server.url + path, data=data, method=method, headers={"Content-Type": content_type})
+    try:
+        with urlopen(req, timeout=30) as resp:
+            return resp.status, resp.read()
+    except HTTPError as e:
+        return e.code, e.read()
+
+
+def read_events(server, job_id):
+    events = []
+    with urlopen(f"{server.url}/jobs/{job_id}/events", timeout=60) as resp:
+        for line in resp:
+            line = line.decode("utf-8").strip()
+            if line.startswith("data: "):
+                events.append(json.loads(line[6:]))
+    return events
+
+
+def wait_released(job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while job.manifest is not None or job.busy:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_job_events_and_download(server):
+    status, body = request(server, "POST", "/jobs", {"text": book_corpus(3000, 2), "kind": "book"})
+    assert status == 202
+    job_id = json.loads(body)["id"]
+
+    events = read_events(server, job_id)
+    kinds = [event["event"] for event in events]
+    assert kinds[0] == "queued" and kinds[1] == "planned" and kinds[-1] == "done"
+    assert "progress" in kinds
+    urls = [event["url"] for event in events if event["event"] == "chapter_done"]
+    assert urls and len(urls) == len(events[1]["chapters"])
+    for url in urls:
+        status, audio = request(server, "GET", url)
+        assert status == 200 and len(audio) > 0
+
+    status, body = request(server, "GET", f"/jobs/{job_id}")
+    assert json.loads(body)["status"] == "done"
+    job = server.jobs[job_id]
+    wait_released(job)
+    assert job.text is None
+
+
+@pytest.mark.parametrize("body, content_type", [
+    (b'{"text": 5}', "application/json"),
+    (b'["texto"]', "application/json"),
+    (b'{"text": "Oi.", "title": ["x"]}', "application/json"),
+    (b"{texto", "application/json"),
+    (b'{"text": "   "}', "application/json"),
+    (b"", "text/plain"),
+])
+def test_bad_payload(server, body, content_type):
+    for path in ("/jobs", "/stream"):
+        status, reply = request(server, "POST", path, body, content_type)
+        assert status == 400
+        assert "error" in json.loads(reply)
+    assert not server.jobs
+
+
+def test_cancel_closes_manifest(server):
+    status, body = request(server, "POST", "/jobs", {"text": book_corpus(60000, 4), "kind": "book"})
+    job_id = json.loads(body)["id"]
+    status, body = request(server, "DELETE", f"/jobs/{job_id}")
+    assert status == 200 and json.loads(body)["status"] == "cancelled"
+    assert read_events(server, job_id)[-1]["event"] == "cancelled"
+    wait_released(server.jobs[job_id])
+
+
+def test_old_jobs_evicted(server):
+    server.keep_jobs = 1
+    ids = []
+    for i in range(3):
+        status, body = request(server, "POST", "/jobs", {"text": f"Trecho número {i}.", "kind": "passage"})
+        ids.append(json.loads(body)["id"])
+        read_events(server, ids[-1])
+        wait_released(server.jobs[ids[-1]])
+
+    assert request(server, "GET", f"/jobs/{ids[0]}")[0] == 404
+    assert all(server.jobs[job_id].status in FINAL for job_id in ids[1:])
+
+
+def test_cache_limit_enforced(server):
+    server.cache.max_bytes = 2_000_000
+    status, body = request(server, "POST", "/jobs", {"text": book_corpus(3000, 2), "kind": "book"})
+    job_id = json.loads(body)["id"]
+    assert read_events(server, job_id)[-1]["event"] == "done"
+    wait_released(server.jobs[job_id])
+    assert 0 < server.cache.total_bytes() <= server.cache.max_bytes
@@ -0,0 +1,37 @@
+import pytest
+
+import pipeline
+from benchmark import book_corpus
+from config import MANIFEST_FILE, OUTPUT_DIR
+from manifest import JobManifest
+from synth_pool import SynthesisPool
+
+
+def test_pool_runs_tasks(tmp_path):
+    with SynthesisPool("null", {}, 2, tmp_path / "cache.sqlite", 1 << 30) as pool:
+        results = list(pool.run([(i, f"Frase número {i}.", f"k{i}") for i in range(6)]))
+    assert sorted(key for key, _, _, _ in results) == list(range(6))
+    assert all(error is None for _, error, _, _ in results)
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_worker_load_error_is_raised(tmp_path, warm):
+    # sem o erro de volta, o Pool recriaria o worker para sempre
+    with pytest.raises(RuntimeError, match="falha ao carregar o modelo"):
+        SynthesisPool("voices", {}, 2, tmp_path / "cache.sqlite", 1 << 30, warm=warm)
+
+
+def test_pipeline_fails_chunks_when_workers_do_not_load(tmp_path, monkeypatch, raw_encoder):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "texto.txt").write_text(book_corpus(2000, 2), encoding="utf-8")
+    pipeline.main(["--backend", "piper", "--piper-model", "nao_existe.onnx", "--workers", "2",
+                   "--cache-db", str(tmp_path / "cache.sqlite")])
+
+    manifest = JobManifest(tmp_path / OUTPUT_DIR / MANIFEST_FILE)
+    try:
+        progress = manifest.progress()
+    finally:
+        manifest.close()
+    assert progress["chunks"] > 0
+    assert progress["chunks_failed"] == progress["chunks"]
+    assert progress["chapters_done"] == 0
@@ -0,0 +1,73 @@
+import copy
+
+import pytest
+
+import engines
+from engines import backend_choices, make_engine, register_backend
+from model_pool import ModelPool
+from voices import VoiceEngine, VoiceMap, split_tag
+
+
+class SpeakerEngine:
+    # engine com modelo "pesado" compartilhável entre speakers, como o CoquiEngine
+    loads = 0
+    sample_rate = 22050
+    batch_size = 1
+
+    def __init__(self, options):
+        SpeakerEngine.loads += 1
+        self.speaker_wav = options.get("speaker_wav")
+
+    def with_speaker(self, speaker_wav, language=None):
+        engine = copy.copy(self)
+        engine.speaker_wav = speaker_wav
+        return engine
+
+    def synthesize_batch(self, texts):
+        return [self.speaker_wav.encode("ascii") for _ in texts]
+
+
+@pytest.fixture
+def speaker_backend(monkeypatch):
+    monkeypatch.setattr(engines, "BACKENDS", dict(engines.BACKENDS))
+    monkeypatch.setattr(SpeakerEngine, "loads", 0)
+    register_backend("speaker", SpeakerEngine,
+                     lambda options: {"backend": "speaker", "speaker_wav": options.get("speaker_wav")})
+    return "speaker"
+
+
+def test_invalid_voice_names():
+    for name in ("Dona Ana", "ana!", "", "a:b"):
+        with pytest.raises(ValueError, match="nome de voz inválido"):
+            VoiceMap({name: {}})
+    VoiceMap({"dona_ana": {}, "velho-2": {}, "narração": {}})
+
+
+def test_voices_backend_is_internal():
+    assert "voices" not in backend_choices()
+    assert "null" in backend_choices()
+    with pytest.raises(ValueError, match="--voices"):
+        make_engine("voices", {})
+
+
+def test_speakers_share_one_model(speaker_backend):
+    voices = {"ana": {"speaker_wav": "ana.wav"}, "velho": {"speaker_wav": "velho.wav"}}
+    pool = ModelPool(speaker_backend, {"speaker_wav": "padrao.wav"}, voices).warm()
+    assert SpeakerEngine.loads == 1
+    assert [pool.engine(v).speaker_wav for v in (None, "ana", "velho")] == ["padrao.wav", "ana.wav", "velho.wav"]
+
+    # outro modelo: carga própria
+    pool = ModelPool(speaker_backend, {"speaker_wav": "padrao.wav"}, {"outro": {"model_name": "b"}}).warm()
+    assert SpeakerEngine.loads == 3
+
+
+def test_voice_engine_routes_tags(speaker_backend):
+    options = {"speaker_wav": "p.wav"}
+    voice_map = VoiceMap({"ana": {"speaker_wav": "ana.wav"}}, dialogue="ana").bind(speaker_backend, options)
+    engine = make_engine("voices", voice_map.engine_options(speaker_backend, options))
+    assert isinstance(engine, VoiceEngine)
+
+    texts = [voice_map.tag("ana", "— Oi."), voice_map.tag(None, "Ela disse.")]
+    assert split_tag(texts[0]) == ("ana", "— Oi.")
+    assert engine.synthesize_batch(texts) == [b"ana.wav", b"p.wav"]
+    assert SpeakerEngine.loads == 1
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+from audio import float_to_pcm, pcm_to_float, resample
+from model_pool import ModelPool
+
+# ==========================
+# VÁRIAS VOZES (capítulos e personagens)
+# ==========================
+# Um arquivo JSON diz quais vozes existem (opções que mudam em cima das do
+# backend: modelo Piper, speaker_wav do Coqui, velocidade...) e quem fala o
+# quê:
+#
+#   {
+#     "voices": {"ana": {"piper_model": "Piper_Voicer/pt_BR-ana.onnx"},
+#                "velho": {"piper_model": "Piper_Voicer/pt_BR-velho.onnx", "piper_speed": 1.0}},
+#     "chapters": [{"title": "(?i)^pr[óo]logo", "voice": "ana"}],
+#     "dialogue": "velho",
+#     "markup": true
+#   }
+#
+#   chapters  regex no título do capítulo -> voz do capítulo inteiro (a
+#             primeira que casar; sem regra, a voz padrão do backend)
+#   dialogue  voz das falas: linhas que começam com travessão (— ou –)
+#   markup    trechos marcados no texto, [voz=ana]...[/voz], vão para a voz
+#             indicada (as marcas não são lidas)
+#
+# Cada trecho de voz é dividido em chunks à parte (um chunk nunca mistura
+# vozes) e o texto do chunk ganha uma marca [[voz:nome:hash]] na frente. O
+# backend "voices" (engines.py) tira a marca, agrupa os textos de cada lote
+# por voz (uma chamada por voz) e usa as vozes já carregadas num ModelPool:
+# todas ficam quentes ao mesmo tempo, em cada worker, e trocar de voz entre
+# chunks não recarrega nada. O hash da marca é a identidade da voz, então
+# chunks da voz padrão (sem marca) têm a mesma chave de cache de uma
+# execução sem vozes, e mudar uma voz só refaz os chunks dela.
+#
+#   python pipeline.py --voices vozes.json
+#   python voices.py vozes.json [livro.txt]   # mostra quem fala o quê, sem sintetizar
+
+NAME = re.compile(r"[\w-]+")
+TAG = re.compile(r"^\[\[voz:([\w-]+):[0-9a-f]+\]\] ")
+MARKUP = re.compile(r"\[voz=([\w-]+)\](.*?)\[/voz\]", re.S)
+DIALOGUE = ("—", "–")
+
+
+def split_tag(text: str):
+    # (voz ou None, texto sem a marca)
+    match = TAG.match(text)
+    if match is None:
+        return None, text
+    return match.group(1), text[match.end():]
+
+
+class VoiceMap:
+    def __init__(self, voices=None, chapters=(), dialogue=None, markup=True):
+        self.voices = dict(voices or {})
+        self.rules = [(rule["title"], rule["voice"]) for rule in chapters]
+        self.patterns = [(re.compile(title), voice) for title, voice in self.rules]
+        self.dialogue = dialogue
+        self.markup = markup
+        self.tags = {}
+        # o nome vai na marca [[voz:nome:hash]]: fora de [\w-] a marca não casa
+        # com TAG e seria lida em voz alta junto com o texto
+        for name in self.voices:
+            if not NAME.fullmatch(name):
+                raise ValueError(f"nome de voz inválido: {name!r} (use letras, números, _ ou -)")
+        for name in [voice for _, voice in self.rules] + ([dialogue] if dialogue else []):
+            if name not in self.voices:
+                raise ValueError(f"voz não declarada em 'voices': {name}")
+        self._warned = set()
+
+    @classmethod
+    def load(cls, path):
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        return cls(data.get("voices"), data.get("chapters", ()), data.get("dialogue"), data.get("markup", True))
+
+    def bind(self, backend, options):
+        # marca de cada voz, com a identidade dela (tudo que altera o áudio)
+        from engines import engine_identity
+
+        pool = ModelPool(backend, options, self.voices)
+        for name in self.voices:
+            identity = json.dumps(engine_identity(backend, pool.options_for(name)), sort_keys=True)
+            self.tags[name] = f"[[voz:{name}:{hashlib.sha1(identity.encode('utf-8')).hexdigest()[:10]}]] "
+        return self
+
+    def engine_options(self, backend, options) -> dict:
+        # opções do backend "voices" (serializáveis, vão para os workers)
+        return dict(options, voice_backend=backend, voices=self.voices)
+
+    @property
+    def fingerprint(self) -> str:
+        data = {"rules": self.rules, "dialogue": self.dialogue, "markup": self.markup, "tags": self.tags}
+        return hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def tag(self, voice, text: str) -> str:
+        return self.tags[voice] + text if voice else text
+
+    def chapter_voice(self, title):
+        for pattern, voice in self.patterns:
+            if pattern.search(title or ""):
+                return voice
+        return None
+
+    def _known(self, voice, fallback):
+        if voice in self.voices:
+            return voice
+        if voice not in self._warned:
+            self._warned.add(voice)
+            print(f"WARN: voz não declarada na marcação: {voice} (usando a do capítulo)")
+        return fallback
+
+    def _dialogue(self, content, start, end, voice):
+        if not self.dialogue:
+            yield voice, start, end
+            return
+        for line in re.finditer(r"[^\n]*\n?", content[start:end]):
+            if line.start() == line.end():
+                continue
+            spoken = line.group().lstrip().startswith(DIALOGUE)
+            yield self.dialogue if spoken else voice, start + line.start(), start + line.end()
+
+    def segments(self, content: str, title=None):
+        # (voz ou None, início, fim) cobrindo o capítulo, trechos vizinhos da
+        # mesma voz juntos; as marcas [voz=...] ficam de fora
+        base = self.chapter_voice(title)
+        pieces = []
+        pos = 0
+        for match in MARKUP.finditer(content) if self.markup else ():
+            pieces.extend(self._dialogue(content, pos, match.start(), base))
+            pieces.append((self._known(match.group(1), base), match.start(2), match.end(2)))
+            pos = match.end()
+        pieces.extend(self._dialogue(content, pos, len(content), base))
+
+        merged = []
+        for voice, start, end in pieces:
+            if start >= end:
+                continue
+            if merged and merged[-1][0] == voice and merged[-1][2] == start:
+                merged[-1] = (voice, merged[-1][1], end)
+            else:
+                merged.append((voice, start, end))
+        return merged
+
+
+class VoiceEngine:
+    # interface de engine (sample_rate, batch_size, synthesize_batch) sobre
+    # várias vozes carregadas; o áudio sai na taxa da voz padrão
+    def __init__(self, backend, options, voices):
+        self.pool = ModelPool(backend, options, voices).warm()
+        default = self.pool.engine()
+        self.batch_size = default.batch_size
+        self._sample_rate = default.sample_rate
+
+    @property
+    def sample_rate(self) -> int:
+        return self._sample_rate
+
+    def synthesize_batch(self, texts):
+        groups = {}
+        for i, text in enumerate(texts):
+            voice, text = split_tag(text)
+            groups.setdefault(voice, []).append((i, text))
+
+        out = [None] * len(texts)
+        for voice, items in groups.items():
+            engine = self.pool.engine(voice)
+            pcms = engine.synthesize_batch([text for _, text in items])
+            for (i, _), pcm in zip(items, pcms):
+                if engine.sample_rate != self._sample_rate:
+                    pcm = float_to_pcm(resample(pcm_to_float(pcm), engine.sample_rate, self._sample_rate))
+                out[i] = pcm
+        return out
+
+    def synthesize(self, text):
+        yield self.synthesize_batch([text])[0]
+
+    def synthesize_wav(self, text, output):
+        import wave
+
+        with wave.open(str(output), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.synthesize_batch([text])[0])
+
+
+if __name__ == "__main__":
+    from config import INPUT_TXT
+    from ingest import Book
+
+    voice_map = VoiceMap.load(sys.argv[1])
+    with Book(sys.argv[2] if len(sys.argv) > 2 else INPUT_TXT) as book:
+        for ch in book.chapters():
+            content = ch.text()
+            chars = {}
+            for voice, start, end in voice_map.segments(content, ch.title):
+                chars[voice or "padrão"] = chars.get(voice or "padrão", 0) + end - start
+            print(f"{ch.index:>3} {ch.title[:40]:<40} " + ", ".join(f"{v}: {n}" for v, n in chars.items()))